@@ -0,0 +1,90 @@
+#cython: language_level=3
+# Declares the fused types for the supported precisions of the dynamic
+# programming matrices and shared inline helpers, which are cimported by
+# the dynamic programming modules.
+
+# Copyright (C) 2019-2021
+# Benjamin Paaßen
+# AG Machine Learning
+# Bielefeld University
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# the supported precisions for the dynamic programming matrices
+ctypedef fused real_t:
+    float
+    double
+
+ctypedef fused int_t:
+    short
+    int
+    long long
+
+cdef inline real_t min3(real_t a, real_t b, real_t c) noexcept nogil:
+    """ Computes the minimum of three numbers.
+
+    Parameters
+    ----------
+    a: float or double
+        a number
+    b: float or double
+        another number
+    c: float or double
+        yet another number
+
+    Returns
+    -------
+    min3: float or double
+        min({a, b, c})
+
+    """
+    if(a < b):
+        if(a < c):
+            return a
+        else:
+            return c
+    else:
+        if(b < c):
+            return b
+        else:
+            return c
+
+cdef inline int_t min3_int(int_t a, int_t b, int_t c) noexcept nogil:
+    """ Computes the minimum of three integers.
+
+    Parameters
+    ----------
+    a: short, int, or long long
+        a number
+    b: short, int, or long long
+        another number
+    c: short, int, or long long
+        yet another number
+
+    Returns
+    -------
+    min3: short, int, or long long
+        min({a, b, c})
+
+    """
+    if(a < b):
+        if(a < c):
+            return a
+        else:
+            return c
+    else:
+        if(b < c):
+            return b
+        else:
+            return c
@@ -0,0 +1,55 @@
+"""
+Provides the supported numpy dtypes for the dynamic programming matrices
+and helpers to validate dtypes and cutoffs.
+
+"""
+
+# Copyright (C) 2019-2021
+# Benjamin Paaßen
+# AG Machine Learning
+# Bielefeld University
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+__author__ = "Benjamin Paaßen"
+__copyright__ = "Copyright (C) 2019-2021, Benjamin Paaßen"
+__license__ = "GPLv3"
+__maintainer__ = "Benjamin Paaßen"
+__email__ = "bpaassen@techfak.uni-bielefeld.de"
+
+# the dtypes corresponding to the fused types real_t and int_t in _fused.pxd
+REAL_DTYPES = [np.dtype(np.float32), np.dtype(np.float64)]
+INT_DTYPES = [np.dtype(np.int16), np.dtype(np.int32), np.dtype(np.int64)]
+
+
+def check_dtype(dtype, allowed, bound=0):
+    """ Returns the given dtype as numpy dtype and raises a ValueError if
+    it is not in the allowed list or if it can not represent the given
+    bound on the distance.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in allowed:
+        raise ValueError('Unsupported dtype %s; expected one of %s' % (str(dtype), ', '.join(str(t) for t in allowed)))
+    if dtype.kind == 'i' and bound > np.iinfo(dtype).max:
+        raise ValueError('The distance may be up to %d, which does not fit into %s' % (bound, str(dtype)))
+    return dtype
+
+
+def as_cutoff(cutoff):
+    """ Returns the given cutoff as float, where None means infinity. """
+    if cutoff is None:
+        return np.inf
+    return float(cutoff)
@@ -25,6 +25,10 @@ import heapq
 import random
 from collections.abc import Callable
 import numpy as np
+from libc.math cimport INFINITY
+from libc.stdlib cimport malloc, free
+from cython.parallel import prange, parallel
+cimport cython
 from edist.alignment import Alignment
 
 __author__ = 'Benjamin Paaßen'
@@ -184,6 +188,11 @@ class Grammar:
         A mapping of nonterminal symbols to RuleEntries. Refer to
         The documentation above for more details on RuleEntries.
         Defaults to an empty map.
+    _cache: dictionary
+        Memoized results of adjacency_lists, inverse_adjacency_lists,
+        compile, and validate. The cache is cleared whenever a rule is
+        appended via append_replacement, append_deletion, or
+        append_insertion.
 
     """
     def __init__(self, start, accepting, nonterminals = None, reps = None, dels = None, inss = None, rules = None):
@@ -209,6 +218,7 @@ class Grammar:
             self._rules = {}
         else:
             self._rules = rules
+        self._cache = {}
         self._initialize_rule_entry(start)
         for nont in accepting:
             self._initialize_rule_entry(nont)
@@ -254,6 +264,7 @@ class Grammar:
         self._initialize_rule_entry(source)
         self._initialize_rule_entry(target)
         self._rules[source]._reps.append((operation, target))
+        self._cache.clear()
 
     def append_deletion(self, source, target, operation):
         """ Appends a rule to this grammar for a deletion operation,
@@ -276,6 +287,7 @@ class Grammar:
         self._initialize_rule_entry(source)
         self._initialize_rule_entry(target)
         self._rules[source]._dels.append((operation, target))
+        self._cache.clear()
 
     def append_insertion(self, source, target, operation):
         """ Appends a rule to this grammar for a deletion operation,
@@ -299,6 +311,7 @@ class Grammar:
         self._initialize_rule_entry(source)
         self._initialize_rule_entry(target)
         self._rules[source]._inss.append((operation, target))
+        self._cache.clear()
 
     def size(self):
         """ Returns the number of nonterminals in this grammar.
@@ -349,16 +362,18 @@ class Grammar:
             If any of the operations of this grammar is not supported by the
             given algebra.
 
+        Notes
+        -----
+        The last successfully validated algebra is memoized by identity,
+        such that repeated calls with the same algebra object are free.
+        If you remove operations from an already validated algebra, call
+        this method with a fresh algebra object instead.
+
         """
-        for rep_op in self._reps:
-            if(rep_op not in deltas):
-                raise ValueError('costs for the ' + rep_op + ' operation are undefined!')
-        for del_op in self._dels:
-            if(del_op not in deltas):
-                raise ValueError('costs for the ' + del_op + ' operation are undefined!')
-        for ins_op in self._inss:
-            if(ins_op not in deltas):
-                raise ValueError('costs for the ' + ins_op + ' operation are undefined!')
+        if self._cache.get('validated') is deltas:
+            return
+        _validate_operations(self._reps, self._dels, self._inss, deltas)
+        self._cache['validated'] = deltas
 
     def adjacency_lists(self):
         """ Returns the adjacency list format of this grammar.
@@ -388,7 +403,18 @@ class Grammar:
             right-hand-sides are represented as tuples of operation indices and
             nonterminal indices.
 
+        Notes
+        -----
+        The result is memoized until the next rule is appended, so callers
+        must not modify the returned lists.
+
         """
+        if 'adjacency_lists' not in self._cache:
+            self._cache['adjacency_lists'] = self._adjacency_lists()
+        return self._cache['adjacency_lists']
+
+    def _adjacency_lists(self):
+        """ Internal function; call adjacency_lists instead. """
         # first, create maps from string to index representations
         nont_map = string_to_index_map(self._nonterminals)
         reps_map = string_to_index_map(self._reps)
@@ -410,6 +436,148 @@ class Grammar:
             ins_adj.append(string_to_index_tuple_list(rule_entry._inss, inss_map, nont_map))
         return start_idx, accpt_idxs, rep_adj, del_adj, ins_adj
 
+    def compile(self, reduce = False):
+        """ Compiles this grammar into contiguous integer rule tables, which
+        can be processed by the ADP kernel without any Python objects.
+
+        Parameters
+        ----------
+        reduce: bool (default = False)
+            If True, the grammar is reduced via Grammar.reduce before
+            compilation. This does not change the edit distance, but may
+            change the number of co-optimal backtraces.
+
+        Returns
+        -------
+        compiled: class adp.CompiledGrammar
+            The compiled form of this grammar. Note that later changes to
+            this grammar are not reflected in the compiled form. However,
+            the compiled form is memoized until the next rule is appended,
+            such that this method returns a fresh compiled form after
+            changes.
+
+        """
+        if reduce:
+            if 'compiled_reduced' not in self._cache:
+                reduced, _ = self.reduce()
+                self._cache['compiled_reduced'] = reduced.compile()
+            return self._cache['compiled_reduced']
+        if 'compiled' not in self._cache:
+            start_idx, accpt_idxs, rep_adj, del_adj, ins_adj = self.adjacency_lists()
+            self._cache['compiled'] = CompiledGrammar(list(self._nonterminals),
+                list(self._reps), list(self._dels), list(self._inss),
+                start_idx, accpt_idxs, rep_adj, del_adj, ins_adj)
+        return self._cache['compiled']
+
+    def reduce(self):
+        """ Returns an equivalent grammar with as few nonterminals as
+        possible.
+
+        In particular, we first remove all nonterminals which can not be
+        reached from the starting nonterminal and all nonterminals from
+        which no accepting nonterminal can be reached, because the latter
+        have infinite edit distance for all inputs. Then, we merge
+        equivalent nonterminals, i.e. nonterminals which are either both
+        accepting or both not accepting and which permit the same
+        operations into the same (merged) nonterminals. We find these
+        via partition refinement, as in the minimization of finite
+        automata. Each merged nonterminal is named after its first member
+        in self._nonterminals, except for the starting nonterminal, which
+        always keeps its name.
+
+        The edit distance according to the reduced grammar is the same as
+        for this grammar, but the dynamic programming tensor only has
+        reduced.size() instead of self.size() layers.
+
+        Returns
+        -------
+        reduced: class adp.Grammar
+            The reduced grammar with the same operations as this grammar.
+        nont_map: dictionary
+            A mapping from each nonterminal of this grammar to the
+            nonterminal of the reduced grammar it was merged into, or to None
+            if it was removed. The number of removed nonterminals is thus
+            self.size() - reduced.size().
+
+        """
+        start_idx, accpt_idxs, rep_adj, del_adj, ins_adj = self.adjacency_lists()
+        adjs = (rep_adj, del_adj, ins_adj)
+        R = len(self._nonterminals)
+        # find all nonterminals that are reachable from the start
+        reachable = np.zeros(R, dtype=bool)
+        reachable[start_idx] = True
+        stk = [start_idx]
+        while stk:
+            r = stk.pop()
+            for adj in adjs:
+                for (_, s) in adj[r]:
+                    if not reachable[s]:
+                        reachable[s] = True
+                        stk.append(s)
+        # find all nonterminals from which an accepting one is reachable
+        _, _, inv_rep_adj, inv_del_adj, inv_ins_adj = self.inverse_adjacency_lists()
+        productive = np.zeros(R, dtype=bool)
+        productive[accpt_idxs] = True
+        stk = list(accpt_idxs)
+        while stk:
+            s = stk.pop()
+            for inv_adj in (inv_rep_adj, inv_del_adj, inv_ins_adj):
+                for (_, r) in inv_adj[s]:
+                    if not productive[r]:
+                        productive[r] = True
+                        stk.append(r)
+        # the start is always kept to preserve the interface
+        alive = np.logical_and(reachable, productive)
+        alive[start_idx] = True
+        alive_idxs = np.where(alive)[0].tolist()
+        # initialize the partition by accepting status
+        accepting = np.zeros(R, dtype=bool)
+        accepting[accpt_idxs] = True
+        cls = np.full(R, -1, dtype=int)
+        for r in alive_idxs:
+            cls[r] = int(accepting[r])
+        num_classes = 0
+        # refine the partition until it is stable, where the signature of
+        # each nonterminal is the set of its rules in terms of classes
+        while True:
+            signatures = {}
+            new_cls = np.full(R, -1, dtype=int)
+            for r in alive_idxs:
+                sig = (cls[r], tuple(frozenset((k, cls[s]) for (k, s) in adj[r] if alive[s]) for adj in adjs))
+                new_cls[r] = signatures.setdefault(sig, len(signatures))
+            if len(signatures) == num_classes:
+                break
+            num_classes = len(signatures)
+            cls = new_cls
+        # name each class after its first member (or the start)
+        names = {cls[start_idx] : self._start}
+        for r in alive_idxs:
+            names.setdefault(cls[r], self._nonterminals[r])
+        # construct the reduced grammar
+        reduced = Grammar(self._start, [], [], list(self._reps), list(self._dels), list(self._inss))
+        for r in alive_idxs:
+            reduced._initialize_rule_entry(names[cls[r]])
+        for r in accpt_idxs:
+            if alive[r] and names[cls[r]] not in reduced._accepting:
+                reduced._accepting.append(names[cls[r]])
+        done = set()
+        for r in alive_idxs:
+            if cls[r] in done:
+                continue
+            done.add(cls[r])
+            rule_entry = reduced._rules[names[cls[r]]]
+            for (adj, ops, rules) in ((rep_adj, self._reps, rule_entry._reps),
+                                      (del_adj, self._dels, rule_entry._dels),
+                                      (ins_adj, self._inss, rule_entry._inss)):
+                for (k, s) in adj[r]:
+                    rule = (ops[k], names[cls[s]]) if alive[s] else None
+                    if rule is not None and rule not in rules:
+                        rules.append(rule)
+        nont_map = {}
+        for r in range(R):
+            nont_map[self._nonterminals[r]] = names[cls[r]] if alive[r] else None
+        return reduced, nont_map
+
     def inverse_adjacency_lists(self):
         """ Returns the inverse adjacency list format of this grammar.
 
@@ -438,7 +606,18 @@ class Grammar:
             (`A`, `ins`) is represented as a tuple tuples of operation index
             and nonterminal index.
 
+        Notes
+        -----
+        The result is memoized until the next rule is appended, so callers
+        must not modify the returned lists.
+
         """
+        if 'inverse_adjacency_lists' not in self._cache:
+            self._cache['inverse_adjacency_lists'] = self._inverse_adjacency_lists()
+        return self._cache['inverse_adjacency_lists']
+
+    def _inverse_adjacency_lists(self):
+        """ Internal function; call inverse_adjacency_lists instead. """
         # first, create maps from string to index representations
         nont_map = string_to_index_map(self._nonterminals)
         reps_map = string_to_index_map(self._reps)
@@ -467,7 +646,120 @@ class Grammar:
                 ins_adj[nont_map[B]].append((inss_map[delta], nont_map[A]))
         return start_idx, accpt_idxs, rep_adj, del_adj, ins_adj
 
-def edit_distance(x, y, grammar, deltas):
+def _validate_operations(reps, dels, inss, deltas):
+    """ Ensures that the given algebra deltas defines costs for all given
+    replacement, deletion, and insertion operations.
+    """
+    for rep_op in reps:
+        if(rep_op not in deltas):
+            raise ValueError('costs for the ' + rep_op + ' operation are undefined!')
+    for del_op in dels:
+        if(del_op not in deltas):
+            raise ValueError('costs for the ' + del_op + ' operation are undefined!')
+    for ins_op in inss:
+        if(ins_op not in deltas):
+            raise ValueError('costs for the ' + ins_op + ' operation are undefined!')
+
+def _compile_adjacency(adj):
+    """ Converts an adjacency list of (operation, nonterminal) tuples to
+    compressed sparse row format, i.e. a pointer array, an operation array,
+    and a nonterminal array.
+    """
+    ptr = np.zeros(len(adj) + 1, dtype=np.int64)
+    for r in range(len(adj)):
+        ptr[r+1] = ptr[r] + len(adj[r])
+    ops = np.zeros(ptr[-1], dtype=np.int64)
+    nonts = np.zeros(ptr[-1], dtype=np.int64)
+    cdef int t = 0
+    for r in range(len(adj)):
+        for (k, s) in adj[r]:
+            ops[t] = k
+            nonts[t] = s
+            t += 1
+    return ptr, ops, nonts
+
+class CompiledGrammar:
+    """ Models an ADP grammar in compiled form, where all rules are stored in
+    contiguous integer arrays in compressed sparse row format. In particular,
+    the replacement rules `A` -> `rep` `B` for the `r`-th nonterminal `A`
+    are given by the operation indices
+    _rep_ops[_rep_ptr[r]:_rep_ptr[r+1]] and the nonterminal indices
+    _rep_nonts[_rep_ptr[r]:_rep_ptr[r+1]], and analogously for deletions and
+    insertions.
+
+    A compiled grammar can be used in place of a Grammar object for
+    edit_distance. Use Grammar.compile() to obtain it.
+
+    Attributes
+    ----------
+    _nonterminals: list
+        The list of nonterminals of the original grammar.
+    _reps: list
+        The names of replacement operations.
+    _dels: list
+        The names of deletion operations.
+    _inss: list
+        The names of insertion operations.
+    _start: int
+        The index of the starting nonterminal.
+    _accepting: int array
+        The indices of all accepting nonterminals.
+    _rep_ptr: int array
+        A R+1 element pointer array into _rep_ops and _rep_nonts.
+    _rep_ops: int array
+        The replacement operation index for each replacement rule.
+    _rep_nonts: int array
+        The right-hand-side nonterminal index for each replacement rule.
+    _del_ptr, _del_ops, _del_nonts: int arrays
+        The same for deletion rules.
+    _ins_ptr, _ins_ops, _ins_nonts: int arrays
+        The same for insertion rules.
+    _adjacency: tuple
+        The adjacency list format of this grammar.
+    _validated: dictionary
+        The last algebra which was successfully validated.
+
+    """
+    def __init__(self, nonterminals, reps, dels, inss, start_idx, accpt_idxs, rep_adj, del_adj, ins_adj):
+        self._nonterminals = nonterminals
+        self._reps = reps
+        self._dels = dels
+        self._inss = inss
+        self._start = start_idx
+        self._accepting = np.array(accpt_idxs, dtype=np.int64)
+        self._rep_ptr, self._rep_ops, self._rep_nonts = _compile_adjacency(rep_adj)
+        self._del_ptr, self._del_ops, self._del_nonts = _compile_adjacency(del_adj)
+        self._ins_ptr, self._ins_ops, self._ins_nonts = _compile_adjacency(ins_adj)
+        self._adjacency = (start_idx, list(accpt_idxs), rep_adj, del_adj, ins_adj)
+        self._validated = None
+
+    def size(self):
+        """ Returns the number of nonterminals in this grammar.
+
+        Returns
+        -------
+        size: int
+            the number of nonterminals in this grammar.
+
+        """
+        return len(self._nonterminals)
+
+    def validate(self, deltas):
+        """ Ensures that this grammar is compatible with the given algebra
+        deltas. Refer to Grammar.validate for details.
+        """
+        if self._validated is deltas:
+            return
+        _validate_operations(self._reps, self._dels, self._inss, deltas)
+        self._validated = deltas
+
+    def adjacency_lists(self):
+        """ Returns the adjacency list format of this grammar, refer to
+        Grammar.adjacency_lists for details.
+        """
+        return self._adjacency
+
+def edit_distance(x, y, grammar, deltas, band = None, max_dist = None):
     """ Computes the edit distance between two sequences x and y, based on
     the given ADP grammar and the given algebra.
 
@@ -478,22 +770,354 @@ def edit_distance(x, y, grammar, deltas):
     y: list
         Another list of objects.
     grammar: class adp.Grammar
-        An ADP grammar. Refer to the documentation above for more information.
+        An ADP grammar OR its compiled form, as returned by Grammar.compile.
+        Refer to the documentation above for more information. A Grammar
+        is reduced via Grammar.reduce before the computation, such that
+        unreachable, non-productive, or redundant nonterminals do not cost
+        any memory or time.
     deltas: dictionary
         An algebra, i.e. a mapping from operation names to distance functions
         OR a single distance function if the grammar supports only a single
         replacement, deletion, and insertion operation.
 
+    band: int (default = None)
+        If given, we only compute the dynamic programming cells (i, j) for
+        which j - i deviates at most band from the diagonal band between
+        0 and len(y) - len(x). The band is widened automatically until the
+        result is provably optimal, refer to the notes below.
+    max_dist: float (default = None)
+        If given, we return infinity for all pairs with an edit distance
+        above max_dist. The band is then chosen just wide enough to decide
+        whether the edit distance is below max_dist.
+
     Returns
     -------
     d: float
-        The edit distance between x and y.
+        The edit distance between x and y, or infinity if max_dist is given
+        and the edit distance is larger.
+
+    Notes
+    -----
+    The banded computation assumes that all operation costs are
+    non-negative and falls back to the full computation otherwise. Any
+    edit script which leaves the band with half-width w needs at least
+    abs(len(y) - len(x)) + 2 * w + 2 deletions and insertions, such that it
+    costs at least that many times the smallest deletion or insertion cost.
+    If the banded result does not exceed this lower bound, no script
+    through the band edge can improve it and the result is exact. Otherwise,
+    we double w and repeat.
 
     """
+    # the distance does not depend on the number of co-optimal scripts, so
+    # we can safely use the reduced grammar
+    if(isinstance(grammar, Grammar)):
+        grammar = grammar.compile(reduce = True)
+    # an infinite max_dist prunes nothing
+    if(max_dist is not None and np.isposinf(max_dist)):
+        max_dist = None
+    if(band is not None or max_dist is not None):
+        return _banded_edit_distance(x, y, grammar, deltas, band, max_dist)
     # apply the internal edit distance function
     Ds, _, _, _, start_idx, _, _, _, _ = _edit_distance(x, y, grammar, deltas)
     return Ds[start_idx, 0, 0]
 
+def _check_algebra(grammar, deltas):
+    """ Ensures that the given algebra is compatible with the given
+    (compiled) grammar and converts a single distance function to an
+    algebra.
+    """
+    if(isinstance(deltas, Callable)):
+        if(len(grammar._reps) > 1 or len(grammar._dels) > 1 or len(grammar._inss) > 1):
+            raise ValueError('If a function is given instead of an algebra, the grammar can only support a single operation of each type; otherwise, ambiguities arise.')
+        # generate a mock algebra that is definitely compatible
+        delta = deltas
+        return {grammar._reps[0] : delta, grammar._dels[0] : delta, grammar._inss[0] : delta}
+    grammar.validate(deltas)
+    return deltas
+
+def _banded_edit_distance(x, y, grammar, deltas, band, max_dist):
+    """ Computes the edit distance within an adaptively widened diagonal
+    band. Internal function, use edit_distance instead.
+    """
+    deltas = _check_algebra(grammar, deltas)
+    if(band is not None and band < 0):
+        raise ValueError('Expected a non-negative band, but got %s' % str(band))
+    cdef int m = len(x)
+    cdef int n = len(y)
+    cdef int i
+    cdef int j
+    cdef int k
+    # pre-compute all deletion and insertion costs
+    cdef int K_del = len(grammar._dels)
+    Deltas_del = np.zeros((K_del, m))
+    for k in range(K_del):
+        delta = deltas[grammar._dels[k]]
+        for i in range(m):
+            Deltas_del[k, i] = delta(x[i], None)
+    cdef int K_ins = len(grammar._inss)
+    Deltas_ins = np.zeros((K_ins, n))
+    for k in range(K_ins):
+        delta = deltas[grammar._inss[k]]
+        for j in range(n):
+            Deltas_ins[k, j] = delta(None, y[j])
+    # find the cheapest deletion or insertion as basis for the lower bound
+    # on scripts that leave the band
+    cdef double gap_min = min(np.min(Deltas_del, initial=np.inf), np.min(Deltas_ins, initial=np.inf))
+    cdef int diff = n - m
+    cdef int w_full = max(m, n)
+    if(gap_min < 0.):
+        w = w_full
+    elif(band is not None):
+        w = band
+    elif(gap_min > 0.):
+        # choose the band such that every script outside costs more than
+        # max_dist, clamped before the conversion to int because a huge
+        # max_dist would overflow it
+        w = min(max(0., np.floor((max_dist / gap_min - abs(diff) - 2) / 2) + 1), w_full)
+        w = int(w)
+    else:
+        w = 0
+    cdef int K_rep = len(grammar._reps)
+    cdef int lo
+    cdef int hi
+    cdef double[:,:,:] Deltas_rep_view
+    while True:
+        w = min(w, w_full)
+        lo = min(0, diff) - w
+        hi = max(0, diff) + w
+        # compute all replacement costs within the band
+        Deltas_rep = np.zeros((K_rep, m, hi - lo + 1))
+        Deltas_rep_view = Deltas_rep
+        for k in range(K_rep):
+            delta = deltas[grammar._reps[k]]
+            for i in range(m):
+                for j in range(max(0, i + lo), min(n, i + hi + 1)):
+                    Deltas_rep_view[k, i, j - i - lo] = delta(x[i], y[j])
+        if(w < w_full and np.min(Deltas_rep, initial=0.) < 0.):
+            # the lower bound is invalid for negative costs
+            w = w_full
+            continue
+        Ds = np.full((len(grammar._nonterminals), m+1, hi - lo + 1), np.inf)
+        Ds[grammar._accepting, m, diff - lo] = 0.
+        _banded_edit_distance_c(Deltas_rep, Deltas_del, Deltas_ins,
+            grammar._rep_ptr, grammar._rep_ops, grammar._rep_nonts,
+            grammar._del_ptr, grammar._del_ops, grammar._del_nonts,
+            grammar._ins_ptr, grammar._ins_ops, grammar._ins_nonts, lo, n, Ds)
+        d = Ds[grammar._start, 0, -lo]
+        if(w >= w_full):
+            break
+        # lower bound for all scripts which leave the band
+        bound = (abs(diff) + 2 * w + 2) * gap_min
+        if(d <= bound):
+            break
+        if(max_dist is not None and bound > max_dist):
+            # all scripts inside and outside the band are too expensive
+            return np.inf
+        w = max(1, 2 * w)
+    if(max_dist is not None and d > max_dist):
+        return np.inf
+    return d
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _banded_edit_distance_c(const double[:,:,:] Deltas_rep, const double[:,:] Deltas_del, const double[:,:] Deltas_ins,
+        const long long[:] rep_ptr, const long long[:] rep_ops, const long long[:] rep_nonts,
+        const long long[:] del_ptr, const long long[:] del_ops, const long long[:] del_nonts,
+        const long long[:] ins_ptr, const long long[:] ins_ops, const long long[:] ins_nonts,
+        int lo, int n, double[:,:,:] Ds) noexcept nogil:
+    """ Computes the ADP edit distance for all nonterminals within a
+    diagonal band, analogous to _edit_distance_c.
+
+    Cell (i, j) with lo <= j - i <= lo + W - 1 is stored in
+    Ds[:, i, j - i - lo], where W = Ds.shape[2], and the replacement costs
+    Deltas_rep are stored in the same banded layout. All cells outside the
+    band are treated as infinite. The edit distance for the start
+    nonterminal s will be in Ds[s, 0, -lo] afterwards.
+
+    """
+    cdef int R = Ds.shape[0]
+    cdef int m = Ds.shape[1] - 1
+    cdef int W = Ds.shape[2]
+    cdef int i
+    cdef int j
+    cdef int c
+    cdef int r
+    cdef long long t
+    cdef double min_cost
+    cdef double current_cost
+    for i in range(m,-1,-1):
+        for j in range(min(n, i + lo + W - 1), max(0, i + lo) - 1, -1):
+            if(i == m and j == n):
+                continue
+            c = j - i - lo
+            for r in range(R):
+                min_cost = INFINITY
+                if(i < m and j < n):
+                    # replacements stay on the same diagonal
+                    for t in range(rep_ptr[r], rep_ptr[r+1]):
+                        current_cost = Deltas_rep[rep_ops[t], i, c] + Ds[rep_nonts[t], i+1, c]
+                        if(current_cost < min_cost):
+                            min_cost = current_cost
+                if(i < m and c > 0):
+                    # deletions move one diagonal down
+                    for t in range(del_ptr[r], del_ptr[r+1]):
+                        current_cost = Deltas_del[del_ops[t], i] + Ds[del_nonts[t], i+1, c-1]
+                        if(current_cost < min_cost):
+                            min_cost = current_cost
+                if(j < n and c < W - 1):
+                    # insertions move one diagonal up
+                    for t in range(ins_ptr[r], ins_ptr[r+1]):
+                        current_cost = Deltas_ins[ins_ops[t], j] + Ds[ins_nonts[t], i, c+1]
+                        if(current_cost < min_cost):
+                            min_cost = current_cost
+                Ds[r, i, c] = min_cost
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def edit_distance_batch(pairs, grammar, deltas):
+    """ Computes the edit distance for many sequence pairs, based on the
+    same ADP grammar and algebra.
+
+    In contrast to calling edit_distance for every pair, the grammar is
+    compiled only once, all operation costs are packed into contiguous
+    buffers, and the dynamic programming runs without the GIL in parallel
+    over all pairs.
+
+    Parameters
+    ----------
+    pairs: list
+        A list of tuples (x, y) of sequences.
+    grammar: class adp.Grammar
+        An ADP grammar OR its compiled form, as returned by Grammar.compile.
+    deltas: dictionary
+        An algebra, i.e. a mapping from operation names to distance functions
+        OR a single distance function if the grammar supports only a single
+        replacement, deletion, and insertion operation.
+
+    Returns
+    -------
+    d: array_like
+        A len(pairs) element vector, where d[p] is the edit distance between
+        the two sequences in pairs[p].
+
+    """
+    if(isinstance(grammar, Grammar)):
+        grammar = grammar.compile(reduce = True)
+    deltas = _check_algebra(grammar, deltas)
+    cdef int P = len(pairs)
+    cdef int R = len(grammar._nonterminals)
+    cdef int p
+    # pack the operation costs and the sequence lengths of all pairs
+    lens = np.zeros((P, 2), dtype=np.int32)
+    offsets = np.zeros((P + 1, 3), dtype=np.int64)
+    reps = []
+    dels = []
+    inss = []
+    for p in range(P):
+        x, y = pairs[p]
+        Deltas_rep, Deltas_del, Deltas_ins = _operation_costs(x, y, grammar, deltas)
+        lens[p, 0] = len(x)
+        lens[p, 1] = len(y)
+        offsets[p + 1, 0] = offsets[p, 0] + Deltas_rep.size
+        offsets[p + 1, 1] = offsets[p, 1] + Deltas_del.size
+        offsets[p + 1, 2] = offsets[p, 2] + Deltas_ins.size
+        reps.append(Deltas_rep.ravel())
+        dels.append(Deltas_del.ravel())
+        inss.append(Deltas_ins.ravel())
+    # append a dummy entry such that all buffers are non-empty
+    cdef const double[::1] rep_buf = np.concatenate(reps + [np.zeros(1)])
+    cdef const double[::1] del_buf = np.concatenate(dels + [np.zeros(1)])
+    cdef const double[::1] ins_buf = np.concatenate(inss + [np.zeros(1)])
+    cdef const int[:,::1] lens_view = lens
+    cdef const long long[:,::1] off_view = offsets
+    cdef const long long[::1] accepting = grammar._accepting
+    cdef const long long[::1] rep_ptr = grammar._rep_ptr
+    cdef const long long[::1] rep_ops = grammar._rep_ops
+    cdef const long long[::1] rep_nonts = grammar._rep_nonts
+    cdef const long long[::1] del_ptr = grammar._del_ptr
+    cdef const long long[::1] del_ops = grammar._del_ops
+    cdef const long long[::1] del_nonts = grammar._del_nonts
+    cdef const long long[::1] ins_ptr = grammar._ins_ptr
+    cdef const long long[::1] ins_ops = grammar._ins_ops
+    cdef const long long[::1] ins_nonts = grammar._ins_nonts
+    cdef long long start = grammar._start
+    cdef int A = len(grammar._accepting)
+    # allocate enough scratch memory for the largest pair
+    cdef long long max_size = 1
+    if(P > 0):
+        max_size = R * np.max((lens[:, 0].astype(np.int64) + 1) * (lens[:, 1] + 1))
+    d = np.zeros(P)
+    cdef double[::1] d_view = d
+    cdef double* Ds
+    cdef int m
+    cdef int n
+    cdef long long t
+    cdef long long size
+    cdef int failed = 0
+    with nogil, parallel():
+        Ds = <double*> malloc(max_size * sizeof(double))
+        for p in prange(P):
+            if Ds == NULL:
+                failed += 1
+                continue
+            m = lens_view[p, 0]
+            n = lens_view[p, 1]
+            size = R * (m + 1) * (n + 1)
+            for t in range(size):
+                Ds[t] = INFINITY
+            for t in range(A):
+                Ds[(accepting[t] * (m + 1) + m) * (n + 1) + n] = 0.
+            _edit_distance_flat(&rep_buf[off_view[p, 0]], &del_buf[off_view[p, 1]], &ins_buf[off_view[p, 2]],
+                &rep_ptr[0], &rep_ops[0], &rep_nonts[0],
+                &del_ptr[0], &del_ops[0], &del_nonts[0],
+                &ins_ptr[0], &ins_ops[0], &ins_nonts[0],
+                R, m, n, Ds)
+            d_view[p] = Ds[start * (m + 1) * (n + 1)]
+        free(Ds)
+    if failed > 0:
+        raise MemoryError('Could not allocate the dynamic programming tensor')
+    return d
+
+def _operation_costs(x, y, grammar, deltas):
+    """ Computes all replacement, deletion, and insertion costs for the
+    given sequences, i.e. a K_rep x m x n tensor, a K_del x m matrix, and a
+    K_ins x n matrix, according to the given (compiled) grammar and algebra.
+    """
+    cdef int m = len(x)
+    cdef int n = len(y)
+    # First, compute all pairwise replacements
+    cdef int K_rep = len(grammar._reps)
+    Deltas_rep = np.zeros((K_rep, m, n))
+    cdef double[:,:,:] Deltas_rep_view = Deltas_rep
+    cdef int i
+    cdef int j
+    cdef int k
+    for k in range(K_rep):
+        delta = deltas[grammar._reps[k]]
+        for i in range(m):
+            for j in range(n):
+                Deltas_rep_view[k, i, j] = delta(x[i], y[j])
+
+    # Then, compute all deletions
+    cdef int K_del = len(grammar._dels)
+    Deltas_del = np.zeros((K_del, m))
+    cdef double[:,:] Deltas_del_view = Deltas_del
+    for k in range(K_del):
+        delta = deltas[grammar._dels[k]]
+        for i in range(m):
+            Deltas_del_view[k, i] = delta(x[i], None)
+
+    # Then, compute all insertions
+    cdef int K_ins = len(grammar._inss)
+    Deltas_ins = np.zeros((K_ins, n))
+    cdef double[:,:] Deltas_ins_view = Deltas_ins
+    for k in range(K_ins):
+        delta = deltas[grammar._inss[k]]
+        for j in range(n):
+            Deltas_ins_view[k, j] = delta(None, y[j])
+
+    return Deltas_rep, Deltas_del, Deltas_ins
+
 def _edit_distance(x, y, grammar, deltas):
     """ Computes the edit distance including all internal variables
     necessary during computation.
@@ -505,9 +1129,9 @@ def _edit_distance(x, y, grammar, deltas):
     y: list
         Another list of objects of length n.
     grammar: class adp.Grammar
-        An ADP grammar with R nonterminals, K_rep replacements,
-        K_del deletions, and K_ins insertions. Refer to the documentation
-        above for more information.
+        An ADP grammar (or its compiled form) with R nonterminals, K_rep
+        replacements, K_del deletions, and K_ins insertions. Refer to the
+        documentation above for more information.
     deltas: dictionary
         An algebra, i.e. a mapping from operation names to distance functions
         OR a single distance function if the grammar supports only a single
@@ -542,50 +1166,16 @@ def _edit_distance(x, y, grammar, deltas):
         insertion operations.
 
     """
+    # compile the grammar to flat rule tables
+    if(isinstance(grammar, Grammar)):
+        grammar = grammar.compile()
     # check if the given algebra is compatible with the given grammar.
-    if(isinstance(deltas, Callable)):
-        if(len(grammar._reps) > 1 or len(grammar._dels) > 1 or len(grammar._inss) > 1):
-            raise ValueError('If a function is given instead of an algebra, the grammar can only support a single operation of each type; otherwise, ambiguities arise.')
-        # generate a mock algebra that is definitely compatible
-        delta = deltas
-        deltas = {grammar._reps[0] : delta, grammar._dels[0] : delta, grammar._inss[0] : delta}
-    else:
-        grammar.validate(deltas)
+    deltas = _check_algebra(grammar, deltas)
 
     cdef int m = len(x)
     cdef int n = len(y)
     # pre-compute all operation costs
-
-    # First, compute all pairwise replacements
-    cdef int K_rep = len(grammar._reps)
-    Deltas_rep = np.zeros((K_rep, m, n))
-    cdef double[:,:,:] Deltas_rep_view = Deltas_rep
-    cdef int i
-    cdef int j
-    cdef int k
-    for k in range(K_rep):
-        delta = deltas[grammar._reps[k]]
-        for i in range(m):
-            for j in range(n):
-                Deltas_rep_view[k, i, j] = delta(x[i], y[j])
-
-    # Then, compute all deletions
-    cdef int K_del = len(grammar._dels)
-    Deltas_del = np.zeros((K_del, m))
-    cdef double[:,:] Deltas_del_view = Deltas_del
-    for k in range(K_del):
-        delta = deltas[grammar._dels[k]]
-        for i in range(m):
-            Deltas_del_view[k, i] = delta(x[i], None)
-
-    # Then, compute all insertions
-    cdef int K_ins = len(grammar._inss)
-    Deltas_ins = np.zeros((K_ins, n))
-    cdef double[:,:] Deltas_ins_view = Deltas_ins
-    for k in range(K_ins):
-        delta = deltas[grammar._inss[k]]
-        for j in range(n):
-            Deltas_ins_view[k, j] = delta(None, y[j])
+    Deltas_rep, Deltas_del, Deltas_ins = _operation_costs(x, y, grammar, deltas)
 
     # retrieve the adjacency list representation for
     # the grammar
@@ -595,53 +1185,344 @@ def _edit_distance(x, y, grammar, deltas):
     # for all nonterminals
     cdef int R = len(grammar._nonterminals)
     Ds = np.full((R, m+1, n+1), np.inf)
-    cdef double[:,:,:] Ds_view = Ds
     # initialize last entry for all accepting symbols
-    cdef int nont
-    for nont in accpt_idxs:
-        Ds_view[nont, m, n] = 0.
+    Ds[grammar._accepting, m, n] = 0.
+    # perform the actual computation
+    _edit_distance_c(Deltas_rep, Deltas_del, Deltas_ins,
+        grammar._rep_ptr, grammar._rep_ops, grammar._rep_nonts,
+        grammar._del_ptr, grammar._del_ops, grammar._del_nonts,
+        grammar._ins_ptr, grammar._ins_ops, grammar._ins_nonts, Ds)
 
-    # initialize last column for all symbols
+    return Ds, Deltas_rep, Deltas_del, Deltas_ins, start_idx, accpt_idxs, adj_rep, adj_del, adj_ins
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _edit_distance_c(const double[:,:,::1] Deltas_rep, const double[:,::1] Deltas_del, const double[:,::1] Deltas_ins,
+        const long long[::1] rep_ptr, const long long[::1] rep_ops, const long long[::1] rep_nonts,
+        const long long[::1] del_ptr, const long long[::1] del_ops, const long long[::1] del_nonts,
+        const long long[::1] ins_ptr, const long long[::1] ins_ops, const long long[::1] ins_nonts,
+        double[:,:,::1] Ds) noexcept nogil:
+    """ Computes the ADP edit distance for all nonterminals based on the
+    pre-computed operation costs and a compiled grammar.
+
+    Parameters
+    ----------
+    Deltas_rep: double tensor
+        A K_rep x m x n tensor of replacement costs.
+    Deltas_del: double matrix
+        A K_del x m matrix of deletion costs.
+    Deltas_ins: double matrix
+        A K_ins x n matrix of insertion costs.
+    rep_ptr, rep_ops, rep_nonts: long long arrays
+        The replacement rules in compressed sparse row format, refer to
+        CompiledGrammar.
+    del_ptr, del_ops, del_nonts: long long arrays
+        The deletion rules in compressed sparse row format.
+    ins_ptr, ins_ops, ins_nonts: long long arrays
+        The insertion rules in compressed sparse row format.
+    Ds: double tensor
+        A R x m+1 x n+1 tensor, which is infinite everywhere except for
+        Ds[r, m, n] = 0 for all accepting nonterminals r. The edit distance
+        for the start nonterminal s will be in Ds[s, 0, 0] afterwards.
+
+    """
+    _edit_distance_flat(&Deltas_rep[0, 0, 0], &Deltas_del[0, 0], &Deltas_ins[0, 0],
+        &rep_ptr[0], &rep_ops[0], &rep_nonts[0],
+        &del_ptr[0], &del_ops[0], &del_nonts[0],
+        &ins_ptr[0], &ins_ops[0], &ins_nonts[0],
+        Ds.shape[0], Ds.shape[1] - 1, Ds.shape[2] - 1, &Ds[0, 0, 0])
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _edit_distance_flat(const double* Deltas_rep, const double* Deltas_del, const double* Deltas_ins,
+        const long long* rep_ptr, const long long* rep_ops, const long long* rep_nonts,
+        const long long* del_ptr, const long long* del_ops, const long long* del_nonts,
+        const long long* ins_ptr, const long long* ins_ops, const long long* ins_nonts,
+        int R, int m, int n, double* Ds) noexcept nogil:
+    """ Implements _edit_distance_c on C-contiguous buffers, i.e.
+    Deltas_rep[k, i, j] is at Deltas_rep[(k * m + i) * n + j] and Ds[r, i, j]
+    is at Ds[(r * (m + 1) + i) * (n + 1) + j], such that it can also be
+    applied to slices of packed buffers in edit_distance_batch.
+    """
+    cdef int i
+    cdef int j
     cdef int r
-    cdef int s
+    cdef long long t
+    cdef long long M = m + 1
+    cdef long long N = n + 1
+    cdef double min_cost
+    cdef double current_cost
+    # initialize last column for all symbols
     for i in range(m-1,-1,-1):
         for r in range(R):
-            for (k, s) in adj_del[r]:
-                Ds_view[r, i, n] = Deltas_del_view[k, i] + Ds_view[s, i+1, n]
+            min_cost = INFINITY
+            for t in range(del_ptr[r], del_ptr[r+1]):
+                current_cost = Deltas_del[del_ops[t] * m + i] + Ds[(del_nonts[t] * M + i + 1) * N + n]
+                if(current_cost < min_cost):
+                    min_cost = current_cost
+            Ds[(r * M + i) * N + n] = min_cost
 
     # initialize last row for all symbols
     for j in range(n-1,-1,-1):
         for r in range(R):
-            for (k, s) in adj_ins[r]:
-                Ds_view[r, m, j] = Deltas_ins_view[k, j] + Ds_view[s, m, j+1]
+            min_cost = INFINITY
+            for t in range(ins_ptr[r], ins_ptr[r+1]):
+                current_cost = Deltas_ins[ins_ops[t] * n + j] + Ds[(ins_nonts[t] * M + m) * N + j + 1]
+                if(current_cost < min_cost):
+                    min_cost = current_cost
+            Ds[(r * M + m) * N + j] = min_cost
 
     # perform the remaining computation
-    cdef double min_cost
-    cdef double current_cost
     for i in range(m-1,-1,-1):
         for j in range(n-1,-1,-1):
             for r in range(R):
-                min_cost = np.inf
+                min_cost = INFINITY
                 # first, consider replacements
-                for (k, s) in adj_rep[r]:
-                    current_cost = Deltas_rep_view[k, i, j] + Ds_view[s, i+1, j+1]
+                for t in range(rep_ptr[r], rep_ptr[r+1]):
+                    current_cost = Deltas_rep[(rep_ops[t] * m + i) * n + j] + Ds[(rep_nonts[t] * M + i + 1) * N + j + 1]
                     if(current_cost < min_cost):
                         min_cost = current_cost
                 # then, consider deletions
-                for (k, s) in adj_del[r]:
-                    current_cost = Deltas_del_view[k, i] + Ds_view[s, i+1, j]
+                for t in range(del_ptr[r], del_ptr[r+1]):
+                    current_cost = Deltas_del[del_ops[t] * m + i] + Ds[(del_nonts[t] * M + i + 1) * N + j]
                     if(current_cost < min_cost):
                         min_cost = current_cost
                 # finally, consider insertions
-                for (k, s) in adj_ins[r]:
-                    current_cost = Deltas_ins_view[k, j] + Ds_view[s, i, j+1]
+                for t in range(ins_ptr[r], ins_ptr[r+1]):
+                    current_cost = Deltas_ins[ins_ops[t] * n + j] + Ds[(ins_nonts[t] * M + i) * N + j + 1]
                     if(current_cost < min_cost):
                         min_cost = current_cost
                 # set new entry to minimum
-                Ds_view[r, i, j] = min_cost
+                Ds[(r * M + i) * N + j] = min_cost
 
-    return Ds, Deltas_rep, Deltas_del, Deltas_ins, start_idx, accpt_idxs, adj_rep, adj_del, adj_ins
+def affine_edit_distance(x, y, Delta, double gap, double skip, bint kron = False):
+    """ Computes the affine edit distance between two sequences of symbol
+    indices x and y with constant gap costs, using a dedicated three-matrix
+    kernel (Gotoh, 1982) with two rows of memory per matrix.
+
+    The result is identical to edit_distance with the affine grammar of the
+    aed module, i.e. the nonterminals A (replacement), D (deletion), and
+    I (insertion), where opening a gap costs gap, extending it costs skip,
+    and a deletion can not follow an insertion directly.
+
+    Parameters
+    ----------
+    x: int array
+        a sequence of symbol indices.
+    y: int array
+        another sequence of symbol indices.
+    Delta: double matrix
+        a matrix where Delta[a, b] is the cost of replacing symbol a with
+        symbol b. Ignored if kron is True.
+    gap: float
+        the cost of opening a deletion or insertion gap.
+    skip: float
+        the cost of extending a deletion or insertion gap.
+    kron: bool (default = False)
+        if True, replacements cost zero for equal indices and one otherwise.
+
+    Returns
+    -------
+    d: float
+        the affine edit distance between x and y.
+
+    Raises
+    ------
+    ValueError
+        if kron is False and x or y contain indices outside Delta.
+
+    """
+    x = np.ascontiguousarray(x, dtype=np.int32)
+    y = np.ascontiguousarray(y, dtype=np.int32)
+    if kron:
+        Delta = np.zeros((1, 1))
+    else:
+        Delta = np.ascontiguousarray(Delta, dtype=float)
+        if Delta.ndim != 2:
+            raise ValueError('Expected a replacement cost matrix, but got shape %s' % str(Delta.shape))
+        if((len(x) > 0 and (np.min(x) < 0 or np.max(x) >= Delta.shape[0])) or
+           (len(y) > 0 and (np.min(y) < 0 or np.max(y) >= Delta.shape[1]))):
+            raise ValueError('Symbol indices must be valid indices into the replacement cost matrix')
+    cdef int n = len(y)
+    cdef double* rows = <double*> malloc(6 * (n + 1) * sizeof(double))
+    if rows == NULL:
+        raise MemoryError('Could not allocate the dynamic programming rows')
+    cdef double d
+    try:
+        d = _affine_edit_distance_c(x, y, Delta, gap, skip, kron, rows)
+    finally:
+        free(rows)
+    return d
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def affine_edit_distance_batch(pairs, Delta, double gap, double skip, bint kron = False):
+    """ Computes the affine edit distance for many pairs of sequences of
+    symbol indices, using the kernel of affine_edit_distance in parallel
+    without the GIL.
 
+    Parameters
+    ----------
+    pairs: list
+        A list of tuples (x, y) of sequences of symbol indices.
+    Delta: double matrix
+        a matrix where Delta[a, b] is the cost of replacing symbol a with
+        symbol b. Ignored if kron is True.
+    gap: float
+        the cost of opening a deletion or insertion gap.
+    skip: float
+        the cost of extending a deletion or insertion gap.
+    kron: bool (default = False)
+        if True, replacements cost zero for equal indices and one otherwise.
+
+    Returns
+    -------
+    d: array_like
+        A len(pairs) element vector, where d[p] is the affine edit distance
+        between the two sequences in pairs[p].
+
+    Raises
+    ------
+    ValueError
+        if kron is False and some sequence contains indices outside Delta.
+
+    """
+    cdef int P = len(pairs)
+    # pack all sequences into contiguous buffers
+    x_offsets = np.zeros(P + 1, dtype=np.int64)
+    y_offsets = np.zeros(P + 1, dtype=np.int64)
+    x_offsets[1:] = np.cumsum([len(x) for x, _ in pairs])
+    y_offsets[1:] = np.cumsum([len(y) for _, y in pairs])
+    x_values = np.zeros(x_offsets[P], dtype=np.int32)
+    y_values = np.zeros(y_offsets[P], dtype=np.int32)
+    cdef int p
+    for p in range(P):
+        x_values[x_offsets[p]:x_offsets[p+1]] = pairs[p][0]
+        y_values[y_offsets[p]:y_offsets[p+1]] = pairs[p][1]
+    if kron:
+        Delta = np.zeros((1, 1))
+    else:
+        Delta = np.ascontiguousarray(Delta, dtype=float)
+        if Delta.ndim != 2:
+            raise ValueError('Expected a replacement cost matrix, but got shape %s' % str(Delta.shape))
+        if((len(x_values) > 0 and (np.min(x_values) < 0 or np.max(x_values) >= Delta.shape[0])) or
+           (len(y_values) > 0 and (np.min(y_values) < 0 or np.max(y_values) >= Delta.shape[1]))):
+            raise ValueError('Symbol indices must be valid indices into the replacement cost matrix')
+    cdef long long max_n = 0
+    if(P > 0):
+        max_n = np.max(np.diff(y_offsets))
+    cdef const int[::1] x_view = x_values
+    cdef const int[::1] y_view = y_values
+    cdef const long long[::1] x_off_view = x_offsets
+    cdef const long long[::1] y_off_view = y_offsets
+    cdef const double[:,:] Delta_view = Delta
+    d = np.zeros(P)
+    cdef double[::1] d_view = d
+    cdef double* rows
+    cdef int failed = 0
+    with nogil, parallel():
+        rows = <double*> malloc(6 * (max_n + 1) * sizeof(double))
+        for p in prange(P):
+            if rows == NULL:
+                failed += 1
+            else:
+                d_view[p] = _affine_edit_distance_c(
+                    x_view[x_off_view[p]:x_off_view[p+1]],
+                    y_view[y_off_view[p]:y_off_view[p+1]],
+                    Delta_view, gap, skip, kron, rows)
+        free(rows)
+    if failed > 0:
+        raise MemoryError('Could not allocate the dynamic programming rows')
+    return d
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double _affine_edit_distance_c(const int[:] x, const int[:] y, const double[:,:] Delta, double gap, double skip, bint kron, double* rows) noexcept nogil:
+    """ Computes the affine edit distance via two rows for each of the three
+    dynamic programming matrices A, D, and I.
+
+    Parameters
+    ----------
+    x: int array
+        a m-element sequence of symbol indices.
+    y: int array
+        a n-element sequence of symbol indices.
+    Delta: double matrix
+        replacement costs for symbol indices (ignored if kron is True).
+    gap: double
+        the gap opening cost.
+    skip: double
+        the gap extension cost.
+    kron: bint
+        whether to use the Kronecker distance for replacements.
+    rows: double pointer
+        scratch memory for at least 6 * (n+1) doubles.
+
+    Returns
+    -------
+    d: double
+        the affine edit distance between x and y.
+
+    """
+    cdef int m = x.shape[0]
+    cdef int n = y.shape[0]
+    # the rows for i+1 (next) and i (cur) of all three matrices
+    cdef double* A_next = rows
+    cdef double* D_next = rows + (n + 1)
+    cdef double* I_next = rows + 2 * (n + 1)
+    cdef double* A_cur = rows + 3 * (n + 1)
+    cdef double* D_cur = rows + 4 * (n + 1)
+    cdef double* I_cur = rows + 5 * (n + 1)
+    cdef double* tmp
+    cdef int i
+    cdef int j
+    cdef double rep
+    cdef double rep_cost
+    # initialize the last row, where only insertions are possible
+    A_next[n] = 0.
+    D_next[n] = 0.
+    I_next[n] = 0.
+    for j in range(n-1,-1,-1):
+        I_next[j] = skip + I_next[j+1]
+        A_next[j] = gap + I_next[j+1]
+        D_next[j] = gap + I_next[j+1]
+    for i in range(m-1,-1,-1):
+        # in the last column, only deletions are possible
+        A_cur[n] = gap + D_next[n]
+        D_cur[n] = skip + D_next[n]
+        I_cur[n] = INFINITY
+        for j in range(n-1,-1,-1):
+            if kron:
+                if x[i] == y[j]:
+                    rep = 0.
+                else:
+                    rep = 1.
+            else:
+                rep = Delta[x[i], y[j]]
+            rep_cost = rep + A_next[j+1]
+            # I -> rep A | skins I
+            I_cur[j] = min2(rep_cost, skip + I_cur[j+1])
+            # D -> rep A | skdel D | ins I
+            D_cur[j] = min2(min2(rep_cost, skip + D_next[j]), gap + I_cur[j+1])
+            # A -> rep A | del D | ins I
+            A_cur[j] = min2(min2(rep_cost, gap + D_next[j]), gap + I_cur[j+1])
+        # swap rows
+        tmp = A_next
+        A_next = A_cur
+        A_cur = tmp
+        tmp = D_next
+        D_next = D_cur
+        D_cur = tmp
+        tmp = I_next
+        I_next = I_cur
+        I_cur = tmp
+    return A_next[0]
+
+cdef inline double min2(double a, double b) noexcept nogil:
+    if(a < b):
+        return a
+    return b
 
 ####### BACKTRACING FUNCTIONS #######
 
@@ -40,6 +40,8 @@ _grammar.append_deletion("D", "D", "skdel")
 _grammar.append_insertion("D", "I", "ins")
 _grammar.append_replacement("I", "A", "rep")
 _grammar.append_insertion("I", "I", "skins")
+# and compile it once for all distance computations
+_compiled_grammar = _grammar.compile()
 
 
 class AffineAlgebra:
@@ -51,6 +53,10 @@ class AffineAlgebra:
     _rep: function (default = Kronecker distance)
         A function for replacement costs, i.e. _rep(x, y) is the cost of
         replacing x with y.
+    _rep_matrix: array_like (default = None)
+        A matrix of replacement costs for integer-encoded symbols, i.e.
+        _rep_matrix[x, y] is the cost of replacing x with y. Only set if
+        rep is given as a matrix.
     _gap: function (default = constant function with 1.0)
         A function for deletion/insertion costs, i.e. _gap(x) is the cost of
         deleting/inserting x.
@@ -65,8 +71,14 @@ class AffineAlgebra:
     """
 
     def __init__(self, rep=None, gap=1.0, skip=0.5):
+        self._rep_matrix = None
         if rep is None:
             self._rep = self._kron
+        elif not callable(rep):
+            self._rep_matrix = np.asarray(rep, dtype=float)
+            if self._rep_matrix.ndim != 2:
+                raise ValueError("Expected a replacement function or cost matrix")
+            self._rep = self._matrix_rep
         else:
             self._rep = rep
         if not callable(gap):
@@ -98,6 +110,9 @@ class AffineAlgebra:
         else:
             return 1.0
 
+    def _matrix_rep(self, x, y):
+        return self._rep_matrix[x, y]
+
     def _gap_const(self, x, y):
         return self._gap_cost
 
@@ -105,7 +120,7 @@ class AffineAlgebra:
         return self._skip_cost
 
 
-def aed(x, y, rep=None, gap=1.0, skip=0.5):
+def aed(x, y, rep=None, gap=1.0, skip=0.5, band=None, max_dist=None):
     """Computes the affine edit distance using algebraic dynamic programming.
 
     Parameters
@@ -116,8 +131,10 @@ def aed(x, y, rep=None, gap=1.0, skip=0.5):
         Another list-like object.
     rep: function (default = Kronecker delta)
         A function with two arguments, computing the cost for replacing the
-        first with the second OR an AffineAlgebra object, in which case the
-        remaining aguments will be ignored. Defaults to the Kronecker distance.
+        first with the second OR a matrix of replacement costs, in which case
+        x and y need to contain integer indices into that matrix, OR an
+        AffineAlgebra object, in which case the remaining aguments will be
+        ignored. Defaults to the Kronecker distance.
     gap: function or float (default = 1.0)
         A function with two arguments, computing the cost for deleting the
         first or inserting the second OR a number defining a constant cost.
@@ -126,18 +143,123 @@ def aed(x, y, rep=None, gap=1.0, skip=0.5):
         A function with two arguments, computing the cost for deleting the
         first or inserting the second for gap extensions OR a number defining
         a constant cost. Defaults to 0.5.
+    band: int (default = None)
+        If given, only a diagonal band of the dynamic programming matrices
+        is computed, which is widened automatically until the result is
+        exact. Refer to adp.edit_distance for details.
+    max_dist: float (default = None)
+        If given, infinity is returned for all pairs with an affine edit
+        distance above max_dist.
 
     Returns
     -------
     d: float
-        The affine edit distance between x and y.
+        The affine edit distance between x and y, or infinity if max_dist is
+        given and the distance is larger.
+
+    Notes
+    -----
+    If gap and skip are constants and rep is the Kronecker distance or a
+    matrix, we use the dedicated kernel adp.affine_edit_distance, which
+    yields the same result as the general ADP computation but is much
+    faster. In that case, band is ignored.
 
     """
     if isinstance(rep, AffineAlgebra):
         algebra = rep
     else:
         algebra = AffineAlgebra(rep, gap, skip)
-    return adp.edit_distance(x, y, _grammar, algebra)
+    d = _aed_constant_gaps(x, y, algebra)
+    if d is not None:
+        if max_dist is not None and d > max_dist:
+            return np.inf
+        return d
+    return adp.edit_distance(x, y, _compiled_grammar, algebra, band, max_dist)
+
+
+def aed_batch(pairs, rep=None, gap=1.0, skip=0.5):
+    """Computes the affine edit distance for many pairs of sequences.
+
+    Parameters
+    ----------
+    pairs: list
+        A list of tuples (x, y) of list-like objects.
+    rep: function (default = Kronecker delta)
+        A replacement cost function, cost matrix, or AffineAlgebra object.
+        Refer to aed for details.
+    gap: function or float (default = 1.0)
+        The gap opening costs. Refer to aed for details.
+    skip: function or float (default = 0.5)
+        The gap extension costs. Refer to aed for details.
+
+    Returns
+    -------
+    d: array_like
+        A len(pairs) element vector, where d[p] is the affine edit distance
+        between the two sequences in pairs[p].
+
+    Notes
+    -----
+    If gap and skip are constants and rep is the Kronecker distance or a
+    matrix, we use adp.affine_edit_distance_batch. Otherwise, we use
+    adp.edit_distance_batch with the compiled affine grammar. In both cases,
+    the dynamic programming runs in parallel over all pairs.
+
+    """
+    if isinstance(rep, AffineAlgebra):
+        algebra = rep
+    else:
+        algebra = AffineAlgebra(rep, gap, skip)
+    if algebra._gap == algebra._gap_const and algebra._skip == algebra._skip_const:
+        if algebra._rep_matrix is not None and algebra._rep == algebra._matrix_rep:
+            return adp.affine_edit_distance_batch(
+                pairs, algebra._rep_matrix, algebra._gap_cost, algebra._skip_cost
+            )
+        if algebra._rep == algebra._kron:
+            # encode all inputs with a joint symbol index
+            codes = {}
+            try:
+                idx_pairs = [
+                    (
+                        [codes.setdefault(symbol, len(codes)) for symbol in x],
+                        [codes.setdefault(symbol, len(codes)) for symbol in y],
+                    )
+                    for x, y in pairs
+                ]
+            except TypeError:
+                # unhashable symbols can only be handled by the general ADP
+                idx_pairs = None
+            if idx_pairs is not None:
+                return adp.affine_edit_distance_batch(
+                    idx_pairs, None, algebra._gap_cost, algebra._skip_cost, kron=True
+                )
+    return adp.edit_distance_batch(pairs, _compiled_grammar, algebra)
+
+
+def _aed_constant_gaps(x, y, algebra):
+    """Computes the affine edit distance via the dedicated affine kernel if
+    the given algebra has constant gap and skip costs and a Kronecker or
+    matrix replacement cost. Returns None otherwise.
+    """
+    if algebra._gap != algebra._gap_const or algebra._skip != algebra._skip_const:
+        return None
+    if algebra._rep_matrix is not None and algebra._rep == algebra._matrix_rep:
+        return adp.affine_edit_distance(
+            x, y, algebra._rep_matrix, algebra._gap_cost, algebra._skip_cost
+        )
+    if algebra._rep != algebra._kron:
+        return None
+    # encode both inputs with a joint symbol index
+    codes = {}
+    try:
+        x_idx = [codes.setdefault(symbol, len(codes)) for symbol in x]
+        y_idx = [codes.setdefault(symbol, len(codes)) for symbol in y]
+    except TypeError:
+        # unhashable symbols can only be handled by the general ADP
+        return None
+    return adp.affine_edit_distance(
+        x_idx, y_idx, None, algebra._gap_cost, algebra._skip_cost, kron=True
+    )
 
 
 def aed_backtrace(x, y, rep=None, gap=1.0, skip=0.5):
@@ -26,13 +26,16 @@ URL: http://proceedings.mlr.press/v80/paassen18a.html
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import itertools
 import numpy as np
 from scipy.optimize import minimize
 from scipy.spatial.distance import pdist, squareform
 from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.utils import check_random_state
 from proto_dist_ml.mglvq import MGLVQ
 import edist.sed as sed
 import edist.multiprocess as mp
+from edist.dataset import PackedTrees
 
 __author__ = "Benjamin Paaßen"
 __copyright__ = "Copyright (C) 2019-2021, Benjamin Paaßen"
@@ -42,6 +45,9 @@ __email__ = "bpaassen@techfak.uni-bielefeld.de"
 
 _ERR_CUTOFF = 1e-5
 _BFGS_MAX_IT = 100
+_ADAM_BETA1 = 0.9
+_ADAM_BETA2 = 0.999
+_ADAM_EPS = 1e-8
 
 
 class BEDL(BaseEstimator, ClassifierMixin):
@@ -71,6 +77,21 @@ class BEDL(BaseEstimator, ClassifierMixin):
         The matrix backtracing function for the distance.
         Defaults to sed.sed_backtrace_matrix. Note that this currently does NOT
         support ADP because ADP returns a different backtracing format.
+    batch_size: int (default = None)
+        If given and smaller than the number of training data points, we
+        train in mini-batch mode (refer to fit for details). If None, each
+        epoch uses the full pairwise distance matrix.
+    block_size: int (default = None)
+        The number of sampled data points on which the MGLVQ prototypes are
+        refreshed in mini-batch mode. Defaults to max(batch_size, 10 * K *
+        number of classes).
+    refresh_interval: int (default = 10)
+        The number of mini-batch steps after which the prototypes are
+        refreshed on a new sampled block.
+    learning_rate: float (default = 1e-2)
+        The Adam learning rate for mini-batch mode.
+    random_state: int or RandomState (default = None)
+        The random state to sample mini-batches and blocks.
     _classifier: class proto_dist_ml.MGLVQ
         The learned MGLVQ classifier model.
     _idx: dictionary
@@ -83,14 +104,35 @@ class BEDL(BaseEstimator, ClassifierMixin):
         efficient.
     _delta: function
         The learned delta function.
+    _proto_idx: array_like
+        The indices of the prototypes in the training data.
+    _prototypes: list
+        The prototypes in indexed form, i.e. with symbol indices instead of
+        the original symbols.
 
     """
 
     def __init__(
-        self, K, T=5, phi=None, phi_grad=None, distance=None, distance_backtrace=None
+        self,
+        K,
+        T=5,
+        phi=None,
+        phi_grad=None,
+        distance=None,
+        distance_backtrace=None,
+        batch_size=None,
+        block_size=None,
+        refresh_interval=10,
+        learning_rate=1e-2,
+        random_state=None,
     ):
         self.K = K
         self.T = T
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.refresh_interval = refresh_interval
+        self.learning_rate = learning_rate
+        self.random_state = random_state
         if phi is None:
             self.phi = lambda mus: mus
             self.phi_grad = lambda mus: np.ones_like(mus)
@@ -118,6 +160,19 @@ class BEDL(BaseEstimator, ClassifierMixin):
 
         For more details, please refer to the ICML 2018 paper.
 
+        If batch_size is set and smaller than len(X), we avoid the quadratic
+        distance matrix and train in mini-batch mode instead. We iterate T
+        epochs over random mini-batches and perform the following steps:
+
+        1. Every refresh_interval steps, we sample a block of block_size data
+           points (stratified by label and including the current prototypes),
+           compute the pairwise distances on that block, and refresh the
+           MGLVQ prototypes on it.
+        2. We compute the matrix backtraces from the mini-batch to the
+           prototypes.
+        3. We perform one Adam step on the embedding for the GLVQ loss of the
+           mini-batch.
+
         Arguments
         ---------
         X: list
@@ -133,24 +188,111 @@ class BEDL(BaseEstimator, ClassifierMixin):
             self
 
         """
-        # identify the alphabet from the training data
-        alphabet = set()
-        for i in range(len(X)):
-            for t in range(len(X[i])):
-                alphabet.add(X[i][t])
-        # build an index of the input symbols
-        self._idx = create_index(sorted(list(alphabet)))
-        # preprocess all input data to have symbol indices as nodes instead
-        # of the original symbols
-        X = index_data(X, self._idx)
+        # identify the alphabet from the training data and encode all
+        # input data in bulk to have symbol indices as nodes instead of the
+        # original symbols
+        values, offsets, self._idx = encode_data(X)
+        X = _unpack(values, offsets, X)
         # initialize the classifier
         self._classifier = MGLVQ(self.K)
         # initialize the embedding
         self._embedding = initialize_embedding(len(self._idx))
-        # set up optimizer options
-        options = {"ftol": _ERR_CUTOFF, "maxiter": _BFGS_MAX_IT}
         # set up unique labels
+        y = np.asarray(y)
         unique_labels = np.unique(y)
+        if self.batch_size is not None and self.batch_size < len(X):
+            self._fit_minibatch(X, y, unique_labels)
+        else:
+            self._fit_full(X, y, unique_labels)
+        # store the learned delta function
+        self._delta_obj = EmbeddingDelta(self._embedding)
+        self._delta_obj._index = self._idx
+        self._delta = self._delta_obj.delta_with_indexing
+        # cache the indexed prototypes for prediction
+        self._prototypes = [X[w] for w in self._proto_idx]
+        self._packed_prototypes = sed._pack_indices(
+            [_node_list(w) for w in self._prototypes]
+        )
+        return self
+
+    def _pairwise_distances(self, X, DeltaObj):
+        """Computes the pairwise distances on the indexed data X for the
+        embedding in DeltaObj. The sequence edit distance is computed
+        directly on the symbol distance table, without Python calls per
+        symbol pair.
+        """
+        if self.distance is sed.sed:
+            return sed.sed_indexed_pairwise_symmetric(X, DeltaObj._Delta)
+        return mp.pairwise_distances_symmetric(X, self.distance, DeltaObj.delta)
+
+    def decision_function(self, X):
+        """Computes the learned edit distances from all given data points to
+        all prototypes.
+
+        The input data is indexed only once. If the learned distance is the
+        sequence edit distance, all distances are computed in parallel by
+        sed.sed_indexed_pairwise directly on the learned symbol distance
+        table, without any Python calls per symbol pair. Otherwise, we fall
+        back to multiprocess.pairwise_distances with the learned delta.
+
+        Arguments
+        ---------
+        X: list
+            a list of data points, each being either a list or a tree,
+            depending on the edit distance that was learned.
+
+        Returns
+        -------
+        D: array_like
+            a len(X) x K matrix of distances from the data points to the
+            prototypes, where K is the overall number of prototypes.
+
+        Raises
+        ------
+        ValueError
+            if X contains symbols which did not occur in the training data.
+
+        """
+        values, offsets, _ = encode_data(X, self._idx)
+        if self.distance is sed.sed:
+            return sed.sed_indexed_packed(
+                values, offsets, *self._packed_prototypes, self._delta_obj._Delta
+            )
+        return mp.pairwise_distances(
+            _unpack(values, offsets, X),
+            self._prototypes,
+            self.distance,
+            self._delta_obj.delta,
+        )
+
+    def predict(self, X):
+        """Predicts the labels for the given data points according to the
+        closest prototype with respect to the learned edit distance.
+
+        Arguments
+        ---------
+        X: list
+            a list of data points, each being either a list or a tree,
+            depending on the edit distance that was learned.
+
+        Returns
+        -------
+        y: array_like
+            the predicted label for each data point.
+
+        Raises
+        ------
+        ValueError
+            if X contains symbols which did not occur in the training data.
+
+        """
+        D = self.decision_function(X)
+        return self._classifier._y[np.argmin(D, axis=1)]
+
+    def _fit_full(self, X, y, unique_labels):
+        """Trains the embedding with full-batch epochs, refer to fit."""
+        # set up optimizer options
+        options = {"ftol": _ERR_CUTOFF, "maxiter": _BFGS_MAX_IT}
         # keep track of prototype changes
         old_w = None
         # now, start the learning process
@@ -158,7 +300,7 @@ class BEDL(BaseEstimator, ClassifierMixin):
         for t in range(self.T):
             DeltaObj = EmbeddingDelta(self._embedding)
             # first, compute the current pairwise edit distance matrix
-            D = mp.pairwise_distances_symmetric(X, self.distance, DeltaObj.delta)
+            D = self._pairwise_distances(X, DeltaObj)
             # then, train the classifier
             self._classifier.prevent_initialization = t > 0
             self._classifier.fit(D, y)
@@ -174,11 +316,7 @@ class BEDL(BaseEstimator, ClassifierMixin):
             Ps = mp.pairwise_backtraces(X, W, self.distance_backtrace, DeltaObj.delta)
             # reduce the backtraces to just count the symbol pairings, which
             # speeds up gradient computations later on
-            for k in range(len(Ps)):
-                for l in range(len(Ps[k])):
-                    Ps[k][l] = reduce_backtrace(
-                        Ps[k][l][0], X[k], W[l], len(self._embedding)
-                    )
+            Ps = reduce_backtraces(Ps, X, W, len(self._embedding))
             # set up the glvq loss and gradient function
             obj = lambda embedding: self._loss_and_grad(embedding, Ps, y, unique_labels)
             # optimize the embedding
@@ -199,11 +337,82 @@ class BEDL(BaseEstimator, ClassifierMixin):
             self._embedding = res.x.reshape(self._embedding.shape)
             # store current prototypes
             old_w = np.copy(self._classifier._w)
-        # store the learned delta function
-        self._delta_obj = EmbeddingDelta(self._embedding)
-        self._delta_obj._index = self._idx
-        self._delta = self._delta_obj.delta_with_indexing
-        return self
+        self._proto_idx = np.copy(self._classifier._w)
+
+    def _fit_minibatch(self, X, y, unique_labels):
+        """Trains the embedding with stochastic mini-batch steps, refer to
+        fit.
+        """
+        rng = check_random_state(self.random_state)
+        N = len(X)
+        block_size = self.block_size
+        if block_size is None:
+            block_size = max(self.batch_size, 10 * self.K * len(unique_labels))
+        # set up the Adam moment estimates
+        moment1 = np.zeros_like(self._embedding)
+        moment2 = np.zeros_like(self._embedding)
+        self._proto_idx = None
+        self._loss = []
+        step = 0
+        for t in range(self.T):
+            perm = rng.permutation(N)
+            for start in range(0, N, self.batch_size):
+                DeltaObj = EmbeddingDelta(self._embedding)
+                # refresh the prototypes on a sampled block
+                if step % self.refresh_interval == 0:
+                    self._refresh_prototypes(
+                        X, y, unique_labels, block_size, rng, DeltaObj
+                    )
+                    W = [X[w] for w in self._proto_idx]
+                # compute the backtraces from the current batch to the
+                # prototypes and reduce them to symbol pair counts
+                batch = perm[start : start + self.batch_size]
+                X_batch = [X[i] for i in batch]
+                Ps = mp.pairwise_backtraces(
+                    X_batch, W, self.distance_backtrace, DeltaObj.delta
+                )
+                Ps = reduce_backtraces(Ps, X_batch, W, len(self._embedding))
+                # compute the mini-batch loss and gradient
+                loss, Grad = self._loss_and_grad(
+                    self._embedding, Ps, y[batch], unique_labels
+                )
+                self._loss.append(loss)
+                # perform an Adam step on the embedding
+                step += 1
+                moment1 = _ADAM_BETA1 * moment1 + (1.0 - _ADAM_BETA1) * Grad
+                moment2 = _ADAM_BETA2 * moment2 + (1.0 - _ADAM_BETA2) * Grad**2
+                moment1_hat = moment1 / (1.0 - _ADAM_BETA1**step)
+                moment2_hat = moment2 / (1.0 - _ADAM_BETA2**step)
+                update = moment1_hat / (np.sqrt(moment2_hat) + _ADAM_EPS)
+                self._embedding = self._embedding - self.learning_rate * update
+
+    def _refresh_prototypes(self, X, y, unique_labels, block_size, rng, DeltaObj):
+        """Samples a block of training data, which is stratified by label and
+        contains the current prototypes, and re-fits the MGLVQ prototypes on
+        the pairwise distances within that block.
+        """
+        # sample the block with the same label distribution as the data,
+        # but with at least K points per class
+        block = []
+        for label in unique_labels:
+            inClass = np.where(y == label)[0]
+            num = int(round(block_size * len(inClass) / len(y)))
+            num = min(len(inClass), max(self.K, num))
+            block.append(rng.choice(inClass, num, replace=False))
+        block = np.concatenate(block)
+        # make sure that the current prototypes are part of the block, such
+        # that MGLVQ can continue from them
+        if self._proto_idx is not None:
+            block = np.concatenate(
+                [self._proto_idx, np.setdiff1d(block, self._proto_idx)]
+            )
+        X_block = [X[i] for i in block]
+        D = self._pairwise_distances(X_block, DeltaObj)
+        self._classifier.prevent_initialization = self._proto_idx is not None
+        if self._proto_idx is not None:
+            self._classifier._w = np.arange(len(self._proto_idx))
+        self._classifier.fit(D, y[block])
+        self._proto_idx = block[self._classifier._w]
 
     def _loss_and_grad(self, embedding, Ps, y, unique_labels):
         """Computes the GLVQ loss and its gradient with respect to the
@@ -213,8 +422,9 @@ class BEDL(BaseEstimator, ClassifierMixin):
         ----------
         embedding: array_like
             the current embedding parameters as a vector.
-        Ps: list
-            the reduced matrix backtraces between the data and the prototypes.
+        Ps: array_like
+            the reduced matrix backtraces between the data and the prototypes,
+            as returned by reduce_backtraces.
         y: array_like
             the data labels.
         unique_labels: array_like
@@ -241,10 +451,7 @@ class BEDL(BaseEstimator, ClassifierMixin):
         # compute the pairwise distances between all embedding elements.
         Delta = squareform(pdist(embedding))
         # compute the datapoint-to-prototype distances based on Ps
-        Dp = np.zeros((len(Ps), len(Ps[0])))
-        for i in range(len(Ps)):
-            for k in range(len(Ps[i])):
-                Dp[i, k] = np.sum(Ps[i][k] * Delta)
+        Dp = np.tensordot(Ps, Delta, axes=2)
 
         # find the closest correct and the closest wrong prototype for all
         # data points
@@ -362,6 +569,117 @@ def index_data(Xs, idx):
     return Ys
 
 
+def encode_data(Xs, idx=None):
+    """Encodes all data in the input dataset in bulk into a packed
+    representation, i.e. a flat array of the symbol indices of all data
+    points and an offset array.
+
+    If all symbols share a common NumPy type (e.g. characters, strings, or
+    numbers), the alphabet discovery and the lookup of symbol indices are
+    vectorized. Otherwise, we fall back to a dictionary lookup per symbol.
+
+    Parameters
+    ----------
+    Xs: list
+        A list of data, each being either a list or a tree in
+        node list/adjacency list format.
+    idx: dictionary (default = None)
+        A map from symbols to indices. If None, the alphabet is discovered
+        from the data and the index is create_index(sorted(alphabet)).
+
+    Returns
+    -------
+    values: array_like
+        An int32 array with the symbol indices of all data points,
+        concatenated.
+    offsets: array_like
+        An int64 array with len(Xs) + 1 entries, such that the symbol
+        indices of Xs[i] are values[offsets[i]:offsets[i+1]].
+    idx: dictionary
+        The map from symbols to indices.
+
+    Raises
+    ------
+    ValueError
+        if idx is given and some symbol is not in the index.
+
+    """
+    nodes = [_node_list(X) for X in Xs]
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    lengths = np.fromiter(map(len, nodes), dtype=np.int64, count=len(nodes))
+    np.cumsum(lengths, out=offsets[1:])
+    if all(isinstance(x, str) for x in nodes):
+        # for strings, we can use the unicode code points as symbols
+        symbols = np.frombuffer("".join(nodes).encode("utf-32-le"), dtype="<u4")
+        if idx is None:
+            alphabet, values = np.unique(symbols, return_inverse=True)
+            idx = create_index([chr(c) for c in alphabet])
+            return values.astype(np.int32), offsets, idx
+        keys = [k for k in idx if isinstance(k, str) and len(k) == 1]
+        key_codes = np.array([ord(k) for k in keys], dtype="<u4")
+        return _lookup(symbols, key_codes, keys, idx), offsets, idx
+    symbol_list = list(itertools.chain.from_iterable(nodes))
+    symbols = None
+    types = set(map(type, symbol_list))
+    if types == {int}:
+        symbols = np.fromiter(symbol_list, dtype=np.int64, count=len(symbol_list))
+    elif len(types) == 1:
+        symbols = np.array(symbol_list)
+        if symbols.ndim != 1 or symbols.dtype == object:
+            symbols = None
+    if symbols is None:
+        # fall back to a Python-level index if the symbols do not share a
+        # common type
+        if idx is None:
+            idx = create_index(sorted(set(symbol_list)))
+        values = np.zeros(len(symbol_list), dtype=np.int32)
+        for t, x in enumerate(symbol_list):
+            if x not in idx:
+                raise ValueError("Symbol not in index: %s" % str(x))
+            values[t] = idx[x]
+        return values, offsets, idx
+    if idx is None:
+        # identify the alphabet and the symbol indices in one go
+        alphabet, values = np.unique(symbols, return_inverse=True)
+        return values.astype(np.int32), offsets, create_index(alphabet.tolist())
+    keys = [k for k in idx if type(k) is type(symbol_list[0])]
+    return _lookup(symbols, np.array(keys), keys, idx), offsets, idx
+
+
+def _lookup(symbols, key_array, keys, idx):
+    """Looks up the indices of all symbols in a vectorized fashion, where
+    key_array[i] is the array representation of keys[i].
+    """
+    if len(keys) == 0:
+        if len(symbols) > 0:
+            raise ValueError("Symbol not in index: %s" % str(symbols[0]))
+        return np.zeros(0, dtype=np.int32)
+    idx_values = np.array([idx[k] for k in keys], dtype=np.int32)
+    order = np.argsort(key_array)
+    key_array = key_array[order]
+    pos = np.clip(np.searchsorted(key_array, symbols), 0, len(keys) - 1)
+    unknown = np.where(key_array[pos] != symbols)[0]
+    if len(unknown) > 0:
+        raise ValueError("Symbol not in index: %s" % str(symbols[unknown[0]]))
+    return idx_values[order][pos]
+
+
+def _unpack(values, offsets, Xs):
+    """Returns the packed values in the same format as Xs. Sequences are
+    views on the values. Trees are the items of a dataset.PackedTrees
+    object, such that the tree distance functions read the children in CSR
+    format as well as the precomputed outermost right leaves and keyroots
+    instead of the original adjacency lists.
+    """
+    if len(Xs) > 0 and isinstance(Xs[0], tuple):
+        trees = PackedTrees.from_list(
+            [(values[offsets[i] : offsets[i + 1]], Xs[i][1]) for i in range(len(Xs))],
+            dtype=values.dtype,
+        )
+        return list(trees)
+    return [values[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
 def initialize_embedding(size):
     """Sets up a size-dimensional simplex with side length 1 and size+1
     vertices (i.e. an equilateral hyper-triangle).
@@ -506,22 +824,85 @@ def reduce_backtrace(P, x, y, size):
         x = x[0]
     if isinstance(y, tuple):
         y = y[0]
-    # store where each sequence equals to each symbol
-    Loc_x = np.zeros((P.shape[0], size + 1), dtype=bool)
-    for i in range(len(x)):
-        Loc_x[i, x[i]] = True
-    if P.shape[0] > len(x):
-        Loc_x[len(x), size] = True
-    Loc_y = np.zeros((P.shape[1], size + 1), dtype=bool)
-    for j in range(len(y)):
-        Loc_y[j, y[j]] = True
-    if P.shape[1] > len(y):
-        Loc_y[len(y), size] = True
-
-    # initialize the accumulation matrix
-    Phat = np.zeros((size + 1, size + 1))
-    # accumulate probabilities
-    for k in range(size + 1):
-        for l in range(size + 1):
-            Phat[k, l] = np.sum(P[Loc_x[:, k], :][:, Loc_y[:, l]])
-    return Phat
+    # map every row and column of P to a symbol index, where the optional
+    # last row and column are mapped to the deletion/insertion index size
+    x_idx = _symbol_indices(x, P.shape[0], size)
+    y_idx = _symbol_indices(y, P.shape[1], size)
+    # every cell of P contributes to exactly one symbol pair, such that we
+    # can accumulate all probabilities with a single scatter-add over the
+    # flattened pair indices
+    pair_idx = np.expand_dims(x_idx * (size + 1), 1) + np.expand_dims(y_idx, 0)
+    Phat = np.bincount(
+        pair_idx.ravel(), weights=np.ravel(P), minlength=(size + 1) * (size + 1)
+    )
+    return Phat.reshape((size + 1, size + 1))
+
+
+def reduce_backtraces(Ps, X, Y, size):
+    """Applies reduce_backtrace to all pairs of backtrace matrices at once,
+    as returned by multiprocess.pairwise_backtraces.
+
+    Parameters
+    ----------
+    Ps: list
+        A len(X) x len(Y) list of lists, where Ps[k][l] is the backtrace
+        matrix between X[k] and Y[l] (or a tuple with that matrix as first
+        entry, as returned by backtrace_matrix functions).
+    X: list
+        A list of objects, either sequences or trees.
+    Y: list
+        A list of objects, either sequences or trees.
+    size: int
+        The alphabet size.
+
+    Returns
+    -------
+    Phats: array_like
+        A len(X) x len(Y) x size+1 x size+1 tensor, where Phats[k, l] is
+        reduce_backtrace(Ps[k][l], X[k], Y[l], size).
+
+    """
+    A = size + 1
+    Phats = np.zeros((len(X), len(Y), A, A))
+    if len(X) == 0 or len(Y) == 0:
+        return Phats
+    # pre-compute the symbol indices for all data points only once
+    x_idxs = [_node_list(x) for x in X]
+    y_idxs = [_node_list(y) for y in Y]
+    # collect the flattened pair indices for all backtraces, shifted by
+    # the offset of the respective block in Phats
+    pair_idxs = []
+    weights = []
+    for k in range(len(X)):
+        for l in range(len(Y)):
+            P = Ps[k][l]
+            if isinstance(P, tuple):
+                P = P[0]
+            x_idx = _symbol_indices(x_idxs[k], P.shape[0], size)
+            y_idx = _symbol_indices(y_idxs[l], P.shape[1], size)
+            pair_idx = np.expand_dims(x_idx * A, 1) + np.expand_dims(y_idx, 0)
+            pair_idxs.append(pair_idx.ravel() + (k * len(Y) + l) * A * A)
+            weights.append(np.ravel(P))
+    # accumulate everything with a single scatter-add
+    Phats += np.bincount(
+        np.concatenate(pair_idxs),
+        weights=np.concatenate(weights),
+        minlength=len(X) * len(Y) * A * A,
+    ).reshape(Phats.shape)
+    return Phats
+
+
+def _node_list(x):
+    """Returns the node list of a tree or the sequence itself."""
+    if isinstance(x, tuple):
+        return x[0]
+    return x
+
+
+def _symbol_indices(x, length, size):
+    """Returns an int array with length entries, where the first len(x)
+    entries are the symbol indices in x and all remaining entries are size.
+    """
+    idx = np.full(length, size, dtype=int)
+    idx[: len(x)] = x
+    return idx
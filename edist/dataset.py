@@ -0,0 +1,477 @@
+"""
+Provides packed, array-backed containers for datasets of sequences and
+trees, which can be stored on disk, memory-mapped, and sliced without
+copying.
+
+"""
+
+# Copyright (C) 2019-2021
+# Benjamin Paaßen
+# AG Machine Learning
+# Bielefeld University
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from collections.abc import Sequence
+import numpy as np
+from edist.ted import outermost_right_leaves, keyroots
+from edist.tree_utils import parents
+
+__author__ = "Benjamin Paaßen"
+__copyright__ = "Copyright (C) 2019-2021, Benjamin Paaßen"
+__license__ = "GPLv3"
+__maintainer__ = "Benjamin Paaßen"
+__email__ = "bpaassen@techfak.uni-bielefeld.de"
+
+
+class _PackedBase:
+    """Implements the functionality shared by PackedSequences and
+    PackedTrees, namely length, iteration, slicing, storage, and pickling.
+
+    Subclasses define the class attribute _FIELDS, i.e. the names of all
+    array attributes in the order of the constructor arguments, and the
+    methods _item, _slice, and _compact.
+
+    Attributes
+    ----------
+    _path: str
+        The directory from which this container was loaded or None.
+    _mmap_mode: str
+        The memory-map mode with which this container was loaded or None.
+    _start: int
+        The index of the first datum of this container in the container
+        stored at _path.
+
+    """
+
+    _FIELDS = ()
+
+    def _init_source(self):
+        self._path = None
+        self._mmap_mode = None
+        self._start = 0
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._item(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                stop = max(start, stop)
+                sliced = self._slice(start, stop)
+                sliced._path = self._path
+                sliced._mmap_mode = self._mmap_mode
+                sliced._start = self._start + start
+                return sliced
+            key = np.arange(start, stop, step)
+        if np.ndim(key) > 0:
+            return self.from_list([self._item(i) for i in np.asarray(key)])
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("Index %d is out of range" % key)
+        return self._item(key)
+
+    def save(self, path):
+        """Stores this container as a directory of .npy files, which can be
+        memory-mapped via load.
+
+        Parameters
+        ----------
+        path: str
+            The directory to write to. It is created if it does not exist.
+
+        """
+        os.makedirs(path, exist_ok=True)
+        compact = self._compact()
+        for field in self._FIELDS:
+            np.save(os.path.join(path, field + ".npy"), getattr(compact, field))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Loads a container which has been stored via save.
+
+        Parameters
+        ----------
+        path: str
+            The directory to read from.
+        mmap_mode: str (default = 'r')
+            The memory-map mode for numpy.load. If None, all arrays are
+            loaded into memory.
+
+        Returns
+        -------
+        data: class
+            The loaded container. If mmap_mode is not None, the data stays on
+            disk and pickling the container (or any slice of it), e.g. for
+            multiprocess, only transfers the path and the index range.
+
+        """
+        arrays = [
+            np.load(os.path.join(path, field + ".npy"), mmap_mode=mmap_mode)
+            for field in cls._FIELDS
+        ]
+        data = cls(*arrays)
+        if mmap_mode is not None:
+            data._path = path
+            data._mmap_mode = mmap_mode
+        return data
+
+    def __reduce__(self):
+        if self._path is not None:
+            return (
+                _load_range,
+                (type(self), self._path, self._mmap_mode, self._start, len(self)),
+            )
+        compact = self._compact()
+        return (type(self), tuple(getattr(compact, f) for f in self._FIELDS))
+
+
+def _load_range(cls, path, mmap_mode, start, length):
+    """Re-opens a memory-mapped container and returns the given range."""
+    return cls.load(path, mmap_mode)[start : start + length]
+
+
+class PackedSequences(_PackedBase):
+    """Stores a list of sequences as one flat value array and an offset
+    array, such that the kth sequence is values[offsets[k]:offsets[k+1]].
+
+    Indexing returns a view on the values, which can be passed to all
+    distance functions that accept array-like sequences, e.g. sed.sed or,
+    for double values, dtw.dtw_numeric. If values is a matrix, each row is
+    one element, such that sequences of vectors (e.g. for
+    dtw.dtw_euclidean) are supported as well. Slicing with step one returns
+    another PackedSequences object that shares the value array, and lists
+    of sequences can be replaced by PackedSequences objects in multiprocess.
+
+    Attributes
+    ----------
+    values: array_like
+        The concatenation of all sequences along the first axis.
+    offsets: array_like
+        An int64 array with len(self) + 1 non-decreasing entries.
+
+    """
+
+    _FIELDS = ("values", "offsets")
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = np.asarray(offsets)
+        if self.offsets.ndim != 1 or len(self.offsets) == 0:
+            raise ValueError("Expected a non-empty offset vector")
+        if self.offsets[-1] > len(values) or np.any(np.diff(self.offsets) < 0):
+            raise ValueError("Offsets must be non-decreasing and within the values")
+        self._init_source()
+
+    @classmethod
+    def from_list(cls, Xs, dtype=None):
+        """Packs a list of sequences.
+
+        Parameters
+        ----------
+        Xs: list
+            A list of sequences, e.g. lists, strings, or arrays.
+        dtype: type (default = None)
+            The data type of the value array. If None, numpy infers it.
+
+        Returns
+        -------
+        data: class dataset.PackedSequences
+            The packed sequences.
+
+        """
+        offsets = np.zeros(len(Xs) + 1, dtype=np.int64)
+        parts = []
+        for k in range(len(Xs)):
+            x = Xs[k]
+            if isinstance(x, str):
+                x = list(x)
+            parts.append(np.asarray(x, dtype=dtype))
+            offsets[k + 1] = offsets[k] + len(parts[-1])
+        parts = [part for part in parts if len(part) > 0]
+        if parts:
+            values = np.concatenate(parts)
+        else:
+            values = np.zeros(0, dtype=dtype)
+        return cls(values, offsets)
+
+    def _item(self, i):
+        return self.values[self.offsets[i] : self.offsets[i + 1]]
+
+    def _slice(self, start, stop):
+        return PackedSequences(self.values, self.offsets[start : stop + 1])
+
+    def _compact(self):
+        lo = self.offsets[0]
+        return PackedSequences(self.values[lo : self.offsets[-1]], self.offsets - lo)
+
+
+class PackedTrees(_PackedBase):
+    """Stores a list of trees in depth-first-search order as flat arrays,
+    namely a label array with offsets, the children of all nodes in
+    compressed sparse row (CSR) format, and the precomputed outermost right
+    leaves, keyroots, and parents of all trees.
+
+    Indexing returns a tuple of the form (nodes, adj), where nodes is a view
+    on the labels and adj is a PackedAdjacency object, such that it can be
+    passed to all tree distance functions, e.g. ted.ted or uted.uted. These
+    functions read the precomputed outermost right leaves, keyroots, and
+    CSR children from adj instead of recomputing them from adjacency lists.
+    Slicing with step one returns another PackedTrees object that shares
+    all arrays, and lists of trees can be replaced by PackedTrees objects
+    in multiprocess.
+
+    Attributes
+    ----------
+    labels: array_like
+        The concatenated node labels of all trees.
+    offsets: array_like
+        An int64 array with len(self) + 1 entries, such that the nodes of the
+        kth tree are labels[offsets[k]:offsets[k+1]].
+    children: array_like
+        An int64 array with the concatenated children of all nodes, indexed
+        relative to their tree.
+    child_offsets: array_like
+        An int64 array with one entry per node (of all trees) plus one, such
+        that the children of node u are
+        children[child_offsets[u]:child_offsets[u+1]].
+    orl: array_like
+        The outermost right leaf of each node, relative to its tree.
+    keyroot_values: array_like
+        The concatenated keyroots of all trees in descending order.
+    keyroot_offsets: array_like
+        An int64 array with len(self) + 1 entries into keyroot_values.
+    par: array_like
+        The parent of each node, relative to its tree, or -1 for roots.
+
+    """
+
+    _FIELDS = (
+        "labels",
+        "offsets",
+        "children",
+        "child_offsets",
+        "orl",
+        "keyroot_values",
+        "keyroot_offsets",
+        "par",
+    )
+
+    def __init__(
+        self,
+        labels,
+        offsets,
+        children,
+        child_offsets,
+        orl,
+        keyroot_values,
+        keyroot_offsets,
+        par,
+    ):
+        self.labels = labels
+        self.offsets = np.asarray(offsets)
+        self.children = children
+        self.child_offsets = child_offsets
+        self.orl = orl
+        self.keyroot_values = keyroot_values
+        self.keyroot_offsets = np.asarray(keyroot_offsets)
+        self.par = par
+        if self.offsets.ndim != 1 or len(self.offsets) == 0:
+            raise ValueError("Expected a non-empty offset vector")
+        if len(self.keyroot_offsets) != len(self.offsets):
+            raise ValueError("Expected one keyroot offset per tree plus one")
+        if self.offsets[-1] > len(labels) or len(child_offsets) != len(labels) + 1:
+            raise ValueError("Expected one child offset per node plus one")
+        self._init_source()
+
+    @classmethod
+    def from_list(cls, Xs, dtype=None):
+        """Packs a list of trees.
+
+        Parameters
+        ----------
+        Xs: list
+            A list of trees in node list/adjacency list format, each in
+            depth-first-search order.
+        dtype: type (default = None)
+            The data type of the label array. If None, numpy infers it.
+
+        Returns
+        -------
+        data: class dataset.PackedTrees
+            The packed trees.
+
+        """
+        offsets = np.zeros(len(Xs) + 1, dtype=np.int64)
+        keyroot_offsets = np.zeros(len(Xs) + 1, dtype=np.int64)
+        labels = []
+        children = []
+        degrees = []
+        orls = []
+        krs = []
+        pars = []
+        for k in range(len(Xs)):
+            nodes, adj = Xs[k]
+            offsets[k + 1] = offsets[k] + len(nodes)
+            labels.extend(nodes)
+            for i in range(len(adj)):
+                children.extend(adj[i])
+                degrees.append(len(adj[i]))
+            if adj:
+                orl = outermost_right_leaves(list(adj))
+                kr = keyroots(orl)
+            else:
+                orl = np.zeros(0, dtype=int)
+                kr = np.zeros(0, dtype=int)
+            orls.append(orl)
+            krs.append(kr)
+            pars.append(parents(adj))
+            keyroot_offsets[k + 1] = keyroot_offsets[k] + len(kr)
+        child_offsets = np.zeros(len(degrees) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=child_offsets[1:])
+        return cls(
+            np.array(labels, dtype=dtype),
+            offsets,
+            np.array(children, dtype=np.int64),
+            child_offsets,
+            np.concatenate(orls + [np.zeros(0, dtype=np.int64)]).astype(np.int64),
+            np.concatenate(krs + [np.zeros(0, dtype=np.int64)]).astype(np.int64),
+            keyroot_offsets,
+            np.concatenate(pars + [np.zeros(0, dtype=np.int64)]).astype(np.int64),
+        )
+
+    def nodes(self, i):
+        """Returns a view on the node labels of the ith tree."""
+        return self.labels[self.offsets[i] : self.offsets[i + 1]]
+
+    def adjacency(self, i):
+        """Returns the adjacency list of the ith tree."""
+        lo = self.offsets[i]
+        hi = self.offsets[i + 1]
+        bounds = self.child_offsets[lo : hi + 1] - self.child_offsets[lo]
+        children = self.children[self.child_offsets[lo] : self.child_offsets[hi]]
+        children = children.tolist()
+        return [children[bounds[u] : bounds[u + 1]] for u in range(hi - lo)]
+
+    def outermost_right_leaves(self, i):
+        """Returns a view on the outermost right leaves of the ith tree."""
+        return self.orl[self.offsets[i] : self.offsets[i + 1]]
+
+    def keyroots(self, i):
+        """Returns a view on the keyroots of the ith tree."""
+        return self.keyroot_values[
+            self.keyroot_offsets[i] : self.keyroot_offsets[i + 1]
+        ]
+
+    def parents(self, i):
+        """Returns a view on the parent array of the ith tree."""
+        return self.par[self.offsets[i] : self.offsets[i + 1]]
+
+    def _item(self, i):
+        lo = self.offsets[i]
+        hi = self.offsets[i + 1]
+        c_lo = self.child_offsets[lo]
+        return (
+            self.nodes(i),
+            PackedAdjacency(
+                self.children[c_lo : self.child_offsets[hi]],
+                self.child_offsets[lo : hi + 1] - c_lo,
+                self.outermost_right_leaves(i),
+                self.keyroots(i),
+            ),
+        )
+
+    def _slice(self, start, stop):
+        return PackedTrees(
+            self.labels,
+            self.offsets[start : stop + 1],
+            self.children,
+            self.child_offsets,
+            self.orl,
+            self.keyroot_values,
+            self.keyroot_offsets[start : stop + 1],
+            self.par,
+        )
+
+    def _compact(self):
+        lo = self.offsets[0]
+        hi = self.offsets[-1]
+        c_lo = self.child_offsets[lo]
+        c_hi = self.child_offsets[hi]
+        k_lo = self.keyroot_offsets[0]
+        k_hi = self.keyroot_offsets[-1]
+        return PackedTrees(
+            self.labels[lo:hi],
+            self.offsets - lo,
+            self.children[c_lo:c_hi],
+            self.child_offsets[lo : hi + 1] - c_lo,
+            self.orl[lo:hi],
+            self.keyroot_values[k_lo:k_hi],
+            self.keyroot_offsets - k_lo,
+            self.par[lo:hi],
+        )
+
+
+class PackedAdjacency(Sequence):
+    """Represents the adjacency of a single tree of a PackedTrees object as
+    views on its arrays, such that no nested lists need to be built.
+
+    Indexing with a node u returns a view on the children of u, such that
+    this object can be used wherever an adjacency list is read. Tree
+    distance functions check for the attributes below and use the arrays
+    directly.
+
+    Attributes
+    ----------
+    children: array_like
+        The concatenated children of all nodes of the tree.
+    ptr: array_like
+        An int64 array with one entry per node plus one, such that the
+        children of u are children[ptr[u]:ptr[u+1]].
+    orl: array_like
+        The outermost right leaf of each node.
+    keyroots: array_like
+        The keyroots of the tree in descending order.
+
+    """
+
+    def __init__(self, children, ptr, orl, keyroots):
+        self.children = np.asarray(children, dtype=np.int64)
+        self.ptr = np.asarray(ptr, dtype=np.int64)
+        self.orl = np.asarray(orl, dtype=np.int64)
+        self.keyroots = np.asarray(keyroots, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ptr) - 1
+
+    def __getitem__(self, u):
+        if isinstance(u, slice):
+            return [self[v] for v in range(*u.indices(len(self)))]
+        if u < 0:
+            u += len(self)
+        if u < 0 or u >= len(self):
+            raise IndexError("Index %d is out of range" % u)
+        return self.children[self.ptr[u] : self.ptr[u + 1]]
+
+    def tolist(self):
+        """Returns this adjacency as a list of child lists."""
+        children = self.children.tolist()
+        return [children[self.ptr[u] : self.ptr[u + 1]] for u in range(len(self))]
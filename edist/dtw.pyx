@@ -26,10 +26,15 @@ backtracing in cython.
 import random
 import heapq
 import numpy as np
-from cython.parallel import prange
-from libc.math cimport sqrt
+from scipy.spatial.distance import cdist
+from cython.parallel import prange, parallel
+from libc.stdlib cimport malloc, free
+from libc.math cimport sqrt, ceil, floor, INFINITY
+from libc.float cimport FLT_EPSILON, DBL_EPSILON
 cimport cython
 from edist.alignment import Alignment
+from edist._fused cimport real_t, min3
+from edist._precision import REAL_DTYPES, check_dtype, as_cutoff
 
 __author__ = 'Benjamin Paaßen'
 __copyright__ = 'Copyright (C) 2019-2021, Benjamin Paaßen'
@@ -37,7 +42,7 @@ __license__ = 'GPLv3'
 __maintainer__ = 'Benjamin Paaßen'
 __email__  = 'bpaassen@techfak.uni-bielefeld.de'
 
-def dtw(x, y, delta):
+def dtw(x, y, delta, window = None, slope = None, cutoff = None, dtype = np.float64):
     """ Computes the dynamic time warping distance between the input sequence
     x and the input sequence y, given the element-wise distance function delta.
 
@@ -50,6 +55,33 @@ def dtw(x, y, delta):
     delta: function
         a function that takes an element of x as first and an element of y
         as second input and returns the distance between them.
+    window: int (default = None)
+        if given, the Sakoe-Chiba radius, i.e. x[i] may only be aligned to
+        y[j] if j deviates by at most window from the diagonal
+        i * (n - 1) / (m - 1), where m = len(x) and n = len(y).
+    slope: float (default = None)
+        if given, the maximum slope of the Itakura parallelogram, which must
+        be at least max(m - 1, n - 1) / min(m - 1, n - 1), i.e. x[i] may only
+        be aligned to y[j] if both (i, j) and (m - 1 - i, n - 1 - j) lie
+        between the lines with slopes 1 / slope and slope through the
+        origin.
+
+        If window or slope are given, we only compute and store the cells of
+        the dynamic programming matrix inside the window, which takes
+        O(m * window) instead of O(m * n) time and memory. The window gets
+        widened where necessary to admit a warping path on the integer grid.
+    cutoff: float (default = None)
+        if given, we abandon the computation and return infinity as soon as
+        the minimum over a row of the dynamic programming matrix exceeds
+        cutoff, because every warping path passes through every row. This
+        requires that delta is non-negative. The result is the exact
+        distance if it is at most cutoff and infinity otherwise, which is
+        useful for nearest neighbor search with the best distance so far as
+        cutoff.
+    dtype: numpy dtype (default = np.float64)
+        the precision of the element-wise distances and the dynamic
+        programming matrix, either np.float64 or np.float32. Single
+        precision halves the memory traffic for long sequences.
 
     Returns
     -------
@@ -61,22 +93,43 @@ def dtw(x, y, delta):
     cdef int n = len(y)
     if(m < 1 or n < 1):
         raise ValueError('Dynamic time warping can not handle empty input sequences!')
-    # First, compute all pairwise replacements
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
+    dtype = check_dtype(dtype, REAL_DTYPES)
     cdef int i
     cdef int j
+    cdef long long[::1] lo
+    cdef long long[::1] hi
+    cdef long long[::1] ptr
+    cdef double[::1] Delta_window
+    if window is not None or slope is not None:
+        # only compute the pairwise replacements inside the window
+        lo, hi, ptr = _window(m, n, window, slope)
+        Delta_window = np.zeros(ptr[m])
+        for i in range(m):
+            for j in range(lo[i], hi[i] + 1):
+                Delta_window[ptr[i] + j - lo[i]] = delta(x[i], y[j])
+        return _dtw_window(np.asarray(Delta_window, dtype=dtype), lo, hi, ptr, as_cutoff(cutoff))
+
+    # First, compute all pairwise replacements row by row, such that we
+    # only need a double precision buffer for a single row
+    Delta = np.zeros((m, n), dtype=dtype)
+    row = np.zeros(n)
+    cdef double[:] row_view = row
     for i in range(m):
         for j in range(n):
-            Delta_view[i,j] = delta(x[i], y[j])
+            row_view[j] = delta(x[i], y[j])
+        Delta[i, :] = row
 
     # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-    return D[0,0]
+    D = np.zeros((m,n), dtype=dtype)
+    return _dtw_dp(Delta, D, as_cutoff(cutoff))
+
+def _dtw_dp(const real_t[:,:] Delta, real_t[:,:] D, double cutoff = INFINITY):
+    """ Calls dtw_c in the precision of the given arrays. """
+    return dtw_c(Delta, D, cutoff)
 
 @cython.boundscheck(False)
-def dtw_numeric(double[:] x, double[:] y):
+def dtw_numeric(double[:] x, double[:] y, window = None, slope = None, radius = None, return_alignment = False,
+    cutoff = None):
     """ Computes the dynamic time warping distance between two input arrays x
     and y, using the absolute value as element-wise distance measure.
 
@@ -86,36 +139,53 @@ def dtw_numeric(double[:] x, double[:] y):
         an array of doubles.
     y: array_like
         another array of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
+    radius: int (default = None)
+        if given, we approximate the dynamic time warping distance via
+        FastDTW (Salvador and Chan, 2007), i.e. we average neighboring
+        elements to halve the length of both series, recursively compute a
+        warping path at the coarse resolution, and refine it within the given
+        radius around the projected path. This takes O((m + n) * radius)
+        time instead of O(m * n), but the result is only an upper bound
+        for the exact distance. This option can not be combined with window
+        or slope.
+    return_alignment: bool (default = False)
+        if True and radius is given, we also return the approximate warping
+        path.
+    cutoff: float (default = None)
+        if given, we return infinity as soon as the distance provably
+        exceeds cutoff; see dtw. In addition to the row minimum, we add the
+        lower bound of Keogh and Ratanamahatana (2005) for all rows which
+        are not yet computed, as proposed by Rakthanmanon et al. (2012).
+        This option can not be combined with radius.
 
     Returns
     -------
     d: float
         the dynamic time warping distance between x and y.
+    alignment: class alignment.Alignment
+        the approximate warping path; only returned if radius is given and
+        return_alignment is True.
 
     """
     cdef int m = len(x)
     cdef int n = len(y)
     if(m < 1 or n < 1):
         raise ValueError('Dynamic time warping can not handle empty input sequences!')
-    # First, compute all pairwise replacements
-    # using OMP parallelization
-    cdef int i
-    cdef int j
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
-    for i in prange(m, nogil=True):
-        for j in prange(n):
-            if(x[i] > y[j]):
-                Delta_view[i,j] = x[i] - y[j]
-            else:
-                Delta_view[i,j] = y[j] - x[i]
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-    return D[0,0]
+    if radius is not None:
+        if window is not None or slope is not None or cutoff is not None:
+            raise ValueError('FastDTW can not be combined with a window, a slope, or a cutoff')
+        return _fastdtw_result(np.expand_dims(x, 1), np.expand_dims(y, 1), radius, False, return_alignment)
+    # compute the dynamic time warping distance, where we compute the
+    # element-wise distances on the fly
+    return _dtw_fused(np.expand_dims(x, 1), np.expand_dims(y, 1), window, slope, False, cutoff)
 
 @cython.boundscheck(False)
-def dtw_manhattan(double[:,:] x, double[:,:] y):
+def dtw_manhattan(double[:,:] x, double[:,:] y, window = None, slope = None, radius = None, return_alignment = False,
+    cutoff = None):
     """ Computes the multivariate dynamic time warping distance between two
     input arrays x and y, using the Manhattan distance as element-wise
     distance measure.
@@ -126,11 +196,26 @@ def dtw_manhattan(double[:,:] x, double[:,:] y):
         a m x K matrix of doubles.
     y: array_like
         a n x K matrix of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
+    radius: int (default = None)
+        if given, we approximate the distance via FastDTW; see dtw_numeric.
+    return_alignment: bool (default = False)
+        if True and radius is given, we also return the approximate warping
+        path.
+    cutoff: float (default = None)
+        if given, we return infinity as soon as the distance provably
+        exceeds cutoff; see dtw_numeric.
 
     Returns
     -------
     d: float
         the dynamic time warping distance between x and y.
+    alignment: class alignment.Alignment
+        the approximate warping path; only returned if radius is given and
+        return_alignment is True.
 
     """
     cdef int m = x.shape[0]
@@ -140,29 +225,17 @@ def dtw_manhattan(double[:,:] x, double[:,:] y):
     cdef int K = x.shape[1]
     if(y.shape[1] != K):
         raise ValueError('x and y do not have the same dimensionality (%d versus %d)' % (x.shape[1], y.shape[1]))
-    # First, compute all pairwise replacements
-    # using OMP parallelization
-    cdef int i
-    cdef int j
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
-    cdef int k
-    cdef double diff
-    for i in prange(m, nogil=True):
-        for j in prange(n):
-            for k in prange(K):
-                diff = x[i,k] - y[j,k]
-                if(diff < 0):
-                    Delta_view[i, j] -= diff
-                else:
-                    Delta_view[i, j] += diff
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-    return D[0,0]
+    if radius is not None:
+        if window is not None or slope is not None or cutoff is not None:
+            raise ValueError('FastDTW can not be combined with a window, a slope, or a cutoff')
+        return _fastdtw_result(x, y, radius, False, return_alignment)
+    # compute the dynamic time warping distance, where we compute the
+    # element-wise distances on the fly
+    return _dtw_fused(x, y, window, slope, False, cutoff)
 
 @cython.boundscheck(False)
-def dtw_euclidean(double[:,:] x, double[:,:] y):
+def dtw_euclidean(double[:,:] x, double[:,:] y, window = None, slope = None, radius = None, return_alignment = False,
+    cutoff = None):
     """ Computes the multivariate dynamic time warping distance between two
     input arrays x and y, using the Euclidean distance as element-wise
     distance measure.
@@ -173,11 +246,26 @@ def dtw_euclidean(double[:,:] x, double[:,:] y):
         a m x K matrix of doubles.
     y: array_like
         a n x K matrix of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
+    radius: int (default = None)
+        if given, we approximate the distance via FastDTW; see dtw_numeric.
+    return_alignment: bool (default = False)
+        if True and radius is given, we also return the approximate warping
+        path.
+    cutoff: float (default = None)
+        if given, we return infinity as soon as the distance provably
+        exceeds cutoff; see dtw_numeric.
 
     Returns
     -------
     d: float
         the dynamic time warping distance between x and y.
+    alignment: class alignment.Alignment
+        the approximate warping path; only returned if radius is given and
+        return_alignment is True.
 
     """
     cdef int m = x.shape[0]
@@ -187,27 +275,126 @@ def dtw_euclidean(double[:,:] x, double[:,:] y):
     cdef int K = x.shape[1]
     if(y.shape[1] != K):
         raise ValueError('x and y do not have the same dimensionality (%d versus %d)' % (x.shape[1], y.shape[1]))
-    # First, compute all pairwise replacements
-    # using OMP parallelization
-    cdef int i
-    cdef int j
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
+    if radius is not None:
+        if window is not None or slope is not None or cutoff is not None:
+            raise ValueError('FastDTW can not be combined with a window, a slope, or a cutoff')
+        return _fastdtw_result(x, y, radius, True, return_alignment)
+    # compute the dynamic time warping distance, where we compute the
+    # element-wise distances on the fly
+    return _dtw_fused(x, y, window, slope, True, cutoff)
+
+def _dtw_fused(const double[:,:] x, const double[:,:] y, window, slope, bint euclidean, cutoff = None):
+    """ Computes the dynamic time warping distance between the rows of x
+    and y with Manhattan or Euclidean element-wise distances via
+    dtw_fused_c, inside the window given by window and slope (refer to
+    _window).
+    """
+    cdef int m = x.shape[0]
+    cdef int n = y.shape[0]
+    lo, hi, _ = _full_or_window(m, n, window, slope)
+    if cutoff is None:
+        prefix = np.zeros(m)
+    else:
+        prefix = _prefix_bounds(x, y, lo, hi, euclidean)
+    return dtw_fused_c(x, y, lo, hi, euclidean, np.zeros(n), np.zeros(n), prefix, as_cutoff(cutoff))
+
+def _prefix_bounds(x, y, lo, hi, bint euclidean):
+    """ Computes prefix[i], a lower bound for the costs of the rows 0, ...,
+    i-1 of every warping path inside the window lo, hi, via the distance of
+    every row of x to the envelope of y in every dimension.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    gaps = np.zeros((x.shape[0], x.shape[1]))
+    for k in range(x.shape[1]):
+        U, L = _envelope(y[:, k], lo, hi)
+        gaps[:, k] = np.maximum(x[:, k] - U, 0.) + np.maximum(L - x[:, k], 0.)
+    if euclidean:
+        lb = np.sqrt(np.sum(np.square(gaps), 1))
+    else:
+        lb = np.sum(gaps, 1)
+    prefix = np.zeros(x.shape[0])
+    np.cumsum(lb[:-1], out = prefix[1:])
+    return prefix
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double dtw_fused_c(const double[:,:] x, const double[:,:] y, const long long[::1] lo,
+    const long long[::1] hi, bint euclidean, double[::1] row, double[::1] next_row,
+    const double[::1] prefix, double cutoff) noexcept nogil:
+    """ Computes the dynamic time warping distance between the rows of x
+    and y inside the window lo[i] <= j <= hi[i] like dtw_window_c, but
+    computes the Manhattan or Euclidean distances between rows on the fly
+    instead of reading them from a precomputed matrix, and only stores two
+    rows of the dynamic programming matrix, each with n entries.
+
+    We abandon the computation as soon as the minimum over row i plus the
+    lower bound prefix[i] for all rows before i exceeds cutoff.
+
+    Returns
+    -------
+    d: float
+        the dynamic time warping distance between x and y or infinity if it
+        exceeds cutoff.
+
+    """
+    cdef long long m = x.shape[0]
+    cdef long long n = y.shape[0]
+    cdef long long i
+    cdef long long j
     cdef int k
     cdef double diff
-    for i in prange(m, nogil=True):
-        for j in prange(n):
-            for k in prange(K):
+    cdef double dist
+    cdef double right
+    cdef double down
+    cdef double diag
+    cdef double row_min
+    # D[i, :] is stored in cur and D[i+1, :] in nxt
+    cdef double* cur = &row[0]
+    cdef double* nxt = &next_row[0]
+    cdef double* tmp
+    # the relative tolerance for comparing distances to the cutoff, which
+    # covers the rounding errors of summing up to m + n costs
+    cdef double tol = DBL_EPSILON * (m + n)
+    for i in range(m-1, -1, -1):
+        tmp = cur
+        cur = nxt
+        nxt = tmp
+        row_min = INFINITY
+        for j in range(hi[i], lo[i]-1, -1):
+            # compute the distance between x[i] and y[j]
+            dist = 0.
+            for k in range(x.shape[1]):
                 diff = x[i,k] - y[j,k]
-                Delta_view[i, j] += diff * diff
-            Delta_view[i, j] = sqrt(Delta_view[i, j])
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-    return D[0,0]
+                if euclidean:
+                    dist = dist + diff * diff
+                elif(diff < 0):
+                    dist = dist - diff
+                else:
+                    dist = dist + diff
+            if euclidean:
+                dist = sqrt(dist)
+            if i == m-1:
+                if j == n-1:
+                    cur[j] = dist
+                else:
+                    cur[j] = dist + cur[j+1]
+            else:
+                right = cur[j+1] if j < hi[i] else INFINITY
+                down = nxt[j] if j >= lo[i+1] and j <= hi[i+1] else INFINITY
+                diag = nxt[j+1] if j + 1 >= lo[i+1] and j + 1 <= hi[i+1] else INFINITY
+                cur[j] = dist + min3(diag, right, down)
+            if cur[j] < row_min:
+                row_min = cur[j]
+        # allow for rounding errors in the lower bounds
+        if row_min + prefix[i] > cutoff * (1. + tol):
+            return INFINITY
+    if cur[0] > cutoff * (1. + tol):
+        return INFINITY
+    return cur[0]
 
 @cython.boundscheck(False)
-def dtw_string(str x, str y):
+def dtw_string(str x, str y, window = None, slope = None, cutoff = None, dtype = np.float64):
     """ Computes the dynamic time warping distance between two
     input strings x and y, using the Kronecker distance as element-wise
     distance measure.
@@ -218,6 +405,15 @@ def dtw_string(str x, str y):
         a string.
     y: str
         another string.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
+    cutoff: float (default = None)
+        if given, we return infinity as soon as the distance provably
+        exceeds cutoff; see dtw.
+    dtype: numpy dtype (default = np.float64)
+        the precision of the dynamic programming matrix; see dtw.
 
     Returns
     -------
@@ -229,87 +425,296 @@ def dtw_string(str x, str y):
     cdef int n = len(y)
     if(m < 1 or n < 1):
         raise ValueError('Dynamic time warping can not handle empty input sequences!')
+    dtype = check_dtype(dtype, REAL_DTYPES)
+    cdef int i
+    cdef int j
+    cdef long long[::1] lo
+    cdef long long[::1] hi
+    cdef long long[::1] ptr
+    cdef double[::1] Delta_window
+    if window is not None or slope is not None:
+        # only compute the pairwise replacements inside the window
+        lo, hi, ptr = _window(m, n, window, slope)
+        Delta_window = np.zeros(ptr[m])
+        for i in range(m):
+            for j in range(lo[i], hi[i] + 1):
+                if(x[i] != y[j]):
+                    Delta_window[ptr[i] + j - lo[i]] = 1.
+        return _dtw_window(np.asarray(Delta_window, dtype=dtype), lo, hi, ptr, as_cutoff(cutoff))
     # First, compute all pairwise replacements
+    Delta = np.zeros((m, n), dtype=dtype)
+    _kronecker_string_costs(x, y, Delta)
+    # Then, compute the dynamic time warping distance
+    D = np.zeros((m,n), dtype=dtype)
+    return _dtw_dp(Delta, D, as_cutoff(cutoff))
+
+@cython.boundscheck(False)
+def _kronecker_string_costs(str x, str y, real_t[:,:] Delta):
+    """ Sets Delta[i, j] to one wherever x[i] != y[j]. """
+    cdef int m = len(x)
+    cdef int n = len(y)
     cdef int i
     cdef int j
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
     for i in prange(m, nogil=True):
         for j in prange(n):
-            if(x[i] == y[j]):
-                Delta_view[i, j] = 0.
-            else:
-                Delta_view[i, j] = 1.
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-    return D[0,0]
+            if(x[i] != y[j]):
+                Delta[i, j] = 1.
 
 @cython.boundscheck(False)
-cdef void dtw_c(const double[:,:] Delta, double[:,:] D) noexcept nogil:
+cdef double dtw_c(const real_t[:,:] Delta, real_t[:,:] D, double cutoff = INFINITY) noexcept nogil:
     """ Computes the dynamic time warping distance between two input sequences
     with pairwise element distances Delta and an (empty) dynamic programming
     matrix D.
 
     Parameters
     ----------
-    Delta: array_like
+    Delta: float or double matrix
         a m x n matrix containing the pairwise element distances.
-    D: array:like
+    D: float or double matrix
         another m x n matrix to which the output will be written.
         The dynamic time warping distance will be in cell [0, 0] after the
         computation is finished.
+    cutoff: double (default = infinity)
+        we abandon the computation as soon as the minimum over a row of D
+        exceeds cutoff, up to a relative tolerance of the machine precision
+        of D times m + n to allow for rounding errors.
+
+    Returns
+    -------
+    d: double
+        the dynamic time warping distance or infinity if it exceeds cutoff.
 
     """
     cdef int i
     cdef int j
+    cdef double row_min
+    # the relative tolerance for comparing distances to the cutoff, which
+    # covers the rounding errors of summing up to m + n costs in the
+    # precision of D
+    cdef double tol = DBL_EPSILON
+    if real_t is float:
+        tol = FLT_EPSILON
+    tol *= D.shape[0] + D.shape[1]
     # initialize last entry
     D[-1, -1] = Delta[-1, -1]
     # compute last column
     for i in range(D.shape[0]-2,-1,-1):
         D[i,-1] = Delta[i,-1] + D[i+1,-1]
     # compute last row
+    row_min = D[-1, -1]
     for j in range(D.shape[1]-2,-1,-1):
         D[-1,j] = Delta[-1,j] + D[-1,j+1]
+        if D[-1,j] < row_min:
+            row_min = D[-1,j]
+    if row_min > cutoff * (1. + tol):
+        return INFINITY
     # compute remaining matrix
     for i in range(D.shape[0]-2,-1,-1):
+        row_min = D[i,-1]
         for j in range(D.shape[1]-2,-1,-1):
             D[i,j] = Delta[i,j] + min3(D[i+1,j+1], D[i,j+1], D[i+1,j])
+            if D[i,j] < row_min:
+                row_min = D[i,j]
+        if row_min > cutoff * (1. + tol):
+            return INFINITY
+    if D[0,0] > cutoff * (1. + tol):
+        return INFINITY
+    return D[0,0]
 
-cdef double min3(double a, double b, double c) nogil:
-    """ Computes the minimum of three numbers.
+def _window(int m, int n, window = None, slope = None):
+    """ Computes the admissible columns lo[i] <= j <= hi[i] for every row i
+    of the dynamic programming matrix given a Sakoe-Chiba radius and/or an
+    Itakura slope, as well as the offsets ptr[i] of each row in the banded
+    storage, such that cell (i, j) is stored at ptr[i] + j - lo[i].
 
-    Parameters
-    ----------
-    a: double
-        a number
-    b: double
-        another number
-    c: double
-        yet another number
+    Both constraints are first computed on real-valued coordinates and then
+    rounded to the integer grid. Afterwards, we widen the window where
+    necessary such that lo and hi are non-decreasing, such that lo[0] = 0
+    and hi[m-1] = n-1, and such that every row overlaps with its
+    predecessor, which guarantees at least one warping path.
+    """
+    rows = np.arange(m, dtype=float)
+    lo_f = np.zeros(m)
+    hi_f = np.full(m, n - 1.)
+    if window is not None:
+        if window < 0:
+            raise ValueError('The Sakoe-Chiba window must be non-negative, but was %s' % str(window))
+        # center the window around the diagonal from (0, 0) to (m-1, n-1)
+        if m > 1:
+            center = rows * (n - 1) / (m - 1)
+        else:
+            center = np.zeros(m)
+        lo_f = np.maximum(lo_f, center - window)
+        hi_f = np.minimum(hi_f, center + window)
+    if slope is not None:
+        if slope < 1.:
+            raise ValueError('The Itakura slope must be at least 1, but was %s' % str(slope))
+        if m > 1 and n > 1 and (slope * (m - 1) < n - 1 or slope * (n - 1) < m - 1):
+            raise ValueError('An Itakura slope of %s admits no warping path between sequences of length %d and %d' % (str(slope), m, n))
+        lo_f = np.maximum(lo_f, np.maximum(rows / slope, (n - 1) - slope * (m - 1 - rows)))
+        hi_f = np.minimum(hi_f, np.minimum(rows * slope, (n - 1) - (m - 1 - rows) / slope))
+    lo = np.clip(np.ceil(lo_f - 1E-8), 0, n - 1).astype(np.int64)
+    hi = np.clip(np.floor(hi_f + 1E-8), 0, n - 1).astype(np.int64)
+    return _repair_window(lo, hi, n)
 
-    Returns
-    -------
-    min3: double
-        min({a, b, c})
+def _repair_window(lo, hi, int n):
+    """ Widens the window lo[i] <= j <= hi[i] where necessary such that a
+    warping path exists (refer to _window) and returns lo, hi, and the row
+    offsets ptr of the banded storage.
+    """
+    cdef int m = len(lo)
+    lo = np.ascontiguousarray(np.minimum.accumulate(lo[::-1])[::-1])
+    hi = np.maximum.accumulate(hi)
+    lo[0] = 0
+    hi[m-1] = n - 1
+    cdef long long[::1] lo_view = lo
+    cdef long long[::1] hi_view = hi
+    cdef int i
+    for i in range(m):
+        if hi_view[i] < lo_view[i]:
+            hi_view[i] = lo_view[i]
+        if i > 0:
+            if hi_view[i] < hi_view[i-1]:
+                hi_view[i] = hi_view[i-1]
+            if lo_view[i] > hi_view[i-1] + 1:
+                lo_view[i] = hi_view[i-1] + 1
+    ptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(hi - lo + 1, out=ptr[1:])
+    return lo, hi, ptr
 
+def _dtw_window(const real_t[::1] Delta, const long long[::1] lo, const long long[::1] hi, const long long[::1] ptr,
+    double cutoff = INFINITY):
+    """ Computes the dynamic time warping distance from the pairwise
+    element distances Delta inside the window lo, hi in banded storage
+    (refer to _window), in the precision of Delta.
     """
-    if(a < b):
-        if(a < c):
-            return a
-        else:
-            return c
+    cdef real_t[::1] D
+    if real_t is float:
+        D = np.zeros(ptr[ptr.shape[0]-1], dtype=np.float32)
     else:
-        if(b < c):
-            return b
-        else:
-            return c
+        D = np.zeros(ptr[ptr.shape[0]-1])
+    return dtw_window_c(Delta, D, lo, hi, ptr, cutoff)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void vector_costs_window_(const double[:,:] x, const double[:,:] y, const long long[::1] lo,
+    const long long[::1] hi, const long long[::1] ptr, bint euclidean, double[::1] Delta) noexcept nogil:
+    """ Computes the Manhattan or the Euclidean distances between the rows
+    of x and y inside the window lo, hi and writes them to Delta in banded
+    storage (refer to _window).
+    """
+    cdef int i
+    cdef long long j
+    cdef int k
+    cdef double diff
+    cdef double dist
+    for i in prange(x.shape[0]):
+        for j in range(lo[i], hi[i] + 1):
+            dist = 0.
+            for k in range(x.shape[1]):
+                diff = x[i,k] - y[j,k]
+                if euclidean:
+                    dist = dist + diff * diff
+                elif(diff < 0):
+                    dist = dist - diff
+                else:
+                    dist = dist + diff
+            if euclidean:
+                dist = sqrt(dist)
+            Delta[ptr[i] + j - lo[i]] = dist
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline real_t window_get_(const real_t[::1] A, const long long[::1] lo, const long long[::1] hi,
+    const long long[::1] ptr, long long i, long long j) noexcept nogil:
+    """ Returns entry (i, j) of a matrix A in banded storage or infinity if
+    the entry lies outside the window.
+    """
+    if i >= lo.shape[0] or j < lo[i] or j > hi[i]:
+        return INFINITY
+    return A[ptr[i] + j - lo[i]]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double dtw_window_c(const real_t[::1] Delta, real_t[::1] D, const long long[::1] lo,
+    const long long[::1] hi, const long long[::1] ptr, double cutoff = INFINITY) noexcept nogil:
+    """ Computes the dynamic time warping distance like dtw_c, but only
+    for the cells inside the window lo[i] <= j <= hi[i], where both Delta
+    and D are stored in banded form, i.e. cell (i, j) is at
+    ptr[i] + j - lo[i]. Cells outside the window count as infinite. The
+    dynamic time warping distance will be in D[0] after the computation is
+    finished and is returned, unless the minimum over a row exceeds cutoff
+    (with the same tolerance as in dtw_c), in which case we abandon the
+    computation and return infinity.
+
+    """
+    cdef long long m = lo.shape[0]
+    cdef long long i
+    cdef long long j
+    cdef long long idx
+    cdef real_t right
+    cdef double row_min
+    # the relative tolerance for comparing distances to the cutoff, which
+    # covers the rounding errors of summing up to m + n costs in the
+    # precision of D
+    cdef double tol = DBL_EPSILON
+    if real_t is float:
+        tol = FLT_EPSILON
+    tol *= m + hi[m-1] + 1
+    # initialize last entry
+    D[ptr[m]-1] = Delta[ptr[m]-1]
+    for i in range(m-1, -1, -1):
+        row_min = INFINITY
+        for j in range(hi[i], lo[i]-1, -1):
+            idx = ptr[i] + j - lo[i]
+            if i == m-1:
+                if j < hi[i]:
+                    D[idx] = Delta[idx] + D[idx+1]
+            else:
+                if j < hi[i]:
+                    right = D[idx+1]
+                else:
+                    right = INFINITY
+                D[idx] = Delta[idx] + min3(window_get_(D, lo, hi, ptr, i+1, j+1), right,
+                    window_get_(D, lo, hi, ptr, i+1, j))
+            if D[idx] < row_min:
+                row_min = D[idx]
+        if row_min > cutoff * (1. + tol):
+            return INFINITY
+    if D[0] > cutoff * (1. + tol):
+        return INFINITY
+    return D[0]
 
 ####### BACKTRACING FUNCTIONS #######
 
 cdef double _BACKTRACE_TOL = 1E-5
 
-def dtw_backtrace(x, y, delta):
+def _dtw_matrices(x, y, delta, window = None, slope = None):
+    """ Computes the pairwise element distances Delta and the dynamic
+    programming matrix D for the backtracing functions, both in banded
+    storage (refer to _window). Without window and slope, the band covers
+    the entire matrix.
+    """
+    cdef int m = len(x)
+    cdef int n = len(y)
+    if window is None and slope is None:
+        lo = np.zeros(m, dtype=np.int64)
+        hi = np.full(m, n - 1, dtype=np.int64)
+        ptr = np.arange(m + 1, dtype=np.int64) * n
+    else:
+        lo, hi, ptr = _window(m, n, window, slope)
+    Delta = np.zeros(ptr[m])
+    cdef double[::1] Delta_view = Delta
+    cdef int i
+    cdef int j
+    for i in range(m):
+        for j in range(lo[i], hi[i] + 1):
+            Delta_view[ptr[i] + j - lo[i]] = delta(x[i], y[j])
+    D = np.zeros(ptr[m])
+    dtw_window_c[double](Delta, D, lo, hi, ptr)
+    return Delta, D, lo, hi, ptr
+
+def dtw_backtrace(x, y, delta, window = None, slope = None):
     """ Computes a co-optimal alignment between the two input sequences
     x and y, given the element-wise distance function delta. This mechanism
     is deterministic and will always prefer replacements over other options.
@@ -323,6 +728,10 @@ def dtw_backtrace(x, y, delta):
     delta: function
         a function that takes an element of x as first and an element of y
         as second input and returns the distance between them.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
 
     Returns
     -------
@@ -335,37 +744,38 @@ def dtw_backtrace(x, y, delta):
     cdef int n = len(y)
     if(m < 1 or n < 1):
         raise ValueError('Dynamic time warping can not handle empty input sequences!')
-    # First, compute all pairwise replacements
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
+    # First, compute all pairwise replacements and the dynamic time warping
+    # distance
+    Delta, D, lo_arr, hi_arr, ptr_arr = _dtw_matrices(x, y, delta, window, slope)
+    cdef double[::1] Delta_view = Delta
+    cdef long long[::1] lo = lo_arr
+    cdef long long[::1] hi = hi_arr
+    cdef long long[::1] ptr = ptr_arr
     cdef int i
     cdef int j
-    for i in range(m):
-        for j in range(n):
-            Delta_view[i,j] = delta(x[i], y[j])
-
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
+    cdef double rest
 
-    cdef double[:,:] D_view = D
+    cdef double[::1] D_view = D
     # Finally, compute the backtrace
     i = 0
     j = 0
     alignment = Alignment()
     while(i < m - 1 and j < n - 1):
         alignment.append_tuple(i, j)
+        # the cost of the co-optimal remaining alignment after aligning x[i]
+        # and y[j]
+        rest = window_get_(D_view, lo, hi, ptr, i, j) - window_get_(Delta_view, lo, hi, ptr, i, j) + _BACKTRACE_TOL
         # check which alignment option is co-optimal
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j+1]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i+1, j+1)):
             # replacement is co-optimal
             i += 1
             j += 1
             continue
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i+1, j)):
             # copying y[j] is co-optimal
             i += 1
             continue
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i,j+1]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i, j+1)):
             # copying x[i] is co-optimal
             j += 1
             continue
@@ -380,7 +790,7 @@ def dtw_backtrace(x, y, delta):
     alignment.append_tuple(m-1, n-1)
     return alignment
 
-def dtw_backtrace_stochastic(x, y, delta):
+def dtw_backtrace_stochastic(x, y, delta, window = None, slope = None):
     """ Computes a co-optimal alignment between the two input sequences
     x and y, given the element-wise distance function delta. This mechanism
     is stochastic and will return a random co-optimal alignment.
@@ -399,6 +809,10 @@ def dtw_backtrace_stochastic(x, y, delta):
     delta: function
         a function that takes an element of x as first and an element of y
         as second input and returns the distance between them.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
 
     Returns
     -------
@@ -411,20 +825,18 @@ def dtw_backtrace_stochastic(x, y, delta):
     cdef int n = len(y)
     if(m < 1 or n < 1):
         raise ValueError('Dynamic time warping can not handle empty input sequences!')
-    # First, compute all pairwise replacements
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
+    # First, compute all pairwise replacements and the dynamic time warping
+    # distance
+    Delta, D, lo_arr, hi_arr, ptr_arr = _dtw_matrices(x, y, delta, window, slope)
+    cdef double[::1] Delta_view = Delta
+    cdef long long[::1] lo = lo_arr
+    cdef long long[::1] hi = hi_arr
+    cdef long long[::1] ptr = ptr_arr
     cdef int i
     cdef int j
-    for i in range(m):
-        for j in range(n):
-            Delta_view[i,j] = delta(x[i], y[j])
+    cdef double rest
 
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-
-    cdef double[:,:] D_view = D
+    cdef double[::1] D_view = D
     # Finally, compute the backtrace
     cdef int r
     i = 0
@@ -432,12 +844,15 @@ def dtw_backtrace_stochastic(x, y, delta):
     alignment = Alignment()
     while(i < m - 1 and j < n - 1):
         alignment.append_tuple(i, j)
+        # the cost of the co-optimal remaining alignment after aligning x[i]
+        # and y[j]
+        rest = window_get_(D_view, lo, hi, ptr, i, j) - window_get_(Delta_view, lo, hi, ptr, i, j) + _BACKTRACE_TOL
         # check which alignment options are co-optimal
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j+1]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i+1, j+1)):
             # replacement is co-optimal
-            if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j]):
+            if(rest > window_get_(D_view, lo, hi, ptr, i+1, j)):
                 # replacement and copying y[j] are co-optimal
-                if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i,j+1]):
+                if(rest > window_get_(D_view, lo, hi, ptr, i, j+1)):
                     # replacement, copying y[j], and copying x[i] are co-optimal
                     # Select whether to proceed in any direction uniformly at random
                     r = random.randrange(3)
@@ -453,7 +868,7 @@ def dtw_backtrace_stochastic(x, y, delta):
                     # coin toss
                     i += 1
                     j += random.randrange(2)
-            elif(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i,j+1]):
+            elif(rest > window_get_(D_view, lo, hi, ptr, i, j+1)):
                 # replacement and copying x[i] are co-optimal
                 # select whether to proceed in i direction according to a
                 # coin toss
@@ -463,9 +878,9 @@ def dtw_backtrace_stochastic(x, y, delta):
                 # only replacement is co-optimal
                 i += 1
                 j += 1
-        elif(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j]):
+        elif(rest > window_get_(D_view, lo, hi, ptr, i+1, j)):
             # copying y[j] is co-optimal
-            if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i,j+1]):
+            if(rest > window_get_(D_view, lo, hi, ptr, i, j+1)):
                 # copying y[j] and copying x[i] are co-optimal
                 # Select whether to proceed in i or j direction uniformly at random
                 r = random.randrange(2)
@@ -476,7 +891,7 @@ def dtw_backtrace_stochastic(x, y, delta):
             else:
                 # only copying y[j] is co-optimal
                 i += 1
-        elif(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i,j+1]):
+        elif(rest > window_get_(D_view, lo, hi, ptr, i, j+1)):
             # only copying x[i] is co-optimal
             j += 1
         else:
@@ -491,7 +906,7 @@ def dtw_backtrace_stochastic(x, y, delta):
     alignment.append_tuple(m-1, n-1)
     return alignment
 
-def dtw_backtrace_matrix(x, y, delta):
+def dtw_backtrace_matrix(x, y, delta, window = None, slope = None):
     """ Computes a matrix, summarizing all co-optimal alignments between
     x and y in a matrix P, where entry P[i, j] specifies the fraction of
     co-optimal alignments in which node x[i] has been aligned with node y[j].
@@ -505,6 +920,10 @@ def dtw_backtrace_matrix(x, y, delta):
     delta: function
         a function that takes an element of x as first and an element of y
         as second input and returns the distance between them.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    slope: float (default = None)
+        the maximum slope of the Itakura parallelogram; see dtw.
 
     Returns
     -------
@@ -522,19 +941,17 @@ def dtw_backtrace_matrix(x, y, delta):
     cdef int n = len(y)
     if(m < 1 or n < 1):
         raise ValueError('Dynamic time warping can not handle empty input sequences!')
-    # First, compute all pairwise replacements
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
+    # First, compute all pairwise replacements and the dynamic time warping
+    # distance
+    Delta, D, lo_arr, hi_arr, ptr_arr = _dtw_matrices(x, y, delta, window, slope)
+    cdef double[::1] Delta_view = Delta
+    cdef long long[::1] lo = lo_arr
+    cdef long long[::1] hi = hi_arr
+    cdef long long[::1] ptr = ptr_arr
     cdef int i
     cdef int j
-    for i in range(m):
-        for j in range(n):
-            Delta_view[i,j] = delta(x[i], y[j])
-
-    # Then, compute the dynamic time warping distance
-    D = np.zeros((m,n))
-    dtw_c(Delta, D)
-    cdef double[:,:] D_view = D
+    cdef double rest
+    cdef double[::1] D_view = D
 
     # compute the forward matrix Alpha, which contains the number of
     # co-optimal alignment paths from cell [0, 0] to cell [i, j]
@@ -569,18 +986,21 @@ def dtw_backtrace_matrix(x, y, delta):
             heapq.heappush(q, (i+1, j))
             continue
         found_coopt = False
+        # the cost of the co-optimal remaining alignment after aligning x[i]
+        # and y[j]
+        rest = window_get_(D_view, lo, hi, ptr, i, j) - window_get_(Delta_view, lo, hi, ptr, i, j) + _BACKTRACE_TOL
         # check which alignment option is co-optimal
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j+1]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i+1, j+1)):
             # replacement is co-optimal
             Alpha_view[i+1, j+1] += k
             heapq.heappush(q, (i+1, j+1))
             found_coopt = True
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i+1,j]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i+1, j)):
             # copying y[j] is co-optimal
             Alpha_view[i+1, j] += k
             heapq.heappush(q, (i+1, j))
             found_coopt = True
-        if(D_view[i,j] + _BACKTRACE_TOL > Delta_view[i,j] + D_view[i,j+1]):
+        if(rest > window_get_(D_view, lo, hi, ptr, i, j+1)):
             # copying x[i] is co-optimal
             Alpha_view[i, j+1] += k
             heapq.heappush(q, (i, j+1))
@@ -610,15 +1030,18 @@ def dtw_backtrace_matrix(x, y, delta):
             continue
         found_coopt = False
         # check which alignment option is co-optimal
-        if(D_view[i-1,j-1] + _BACKTRACE_TOL > Delta_view[i-1,j-1] + D_view[i,j]):
+        if(window_get_(D_view, lo, hi, ptr, i-1, j-1) + _BACKTRACE_TOL >
+                window_get_(Delta_view, lo, hi, ptr, i-1, j-1) + window_get_(D_view, lo, hi, ptr, i, j)):
             # replacement is co-optimal
             Beta_view[i-1, j-1] += k
             found_coopt = True
-        if(D_view[i-1,j] + _BACKTRACE_TOL > Delta_view[i-1,j] + D_view[i,j]):
+        if(window_get_(D_view, lo, hi, ptr, i-1, j) + _BACKTRACE_TOL >
+                window_get_(Delta_view, lo, hi, ptr, i-1, j) + window_get_(D_view, lo, hi, ptr, i, j)):
             # copying y[j] is co-optimal
             Beta_view[i-1, j] += k
             found_coopt = True
-        if(D_view[i,j-1] + _BACKTRACE_TOL > Delta_view[i,j-1] + D_view[i,j]):
+        if(window_get_(D_view, lo, hi, ptr, i, j-1) + _BACKTRACE_TOL >
+                window_get_(Delta_view, lo, hi, ptr, i, j-1) + window_get_(D_view, lo, hi, ptr, i, j)):
             # copying x[i] is co-optimal
             Beta_view[i, j-1] += k
             found_coopt = True
@@ -635,3 +1058,809 @@ def dtw_backtrace_matrix(x, y, delta):
     # of co-optimal alignments
     return K.astype(float) / Alpha_view[m-1, n-1], K, Alpha_view[m-1, n-1]
 
+
+####### FAST APPROXIMATE DYNAMIC TIME WARPING #######
+
+def _fastdtw(x, y, int radius, bint euclidean):
+    """ Approximates the dynamic time warping distance between the rows of
+    x and y via the multiresolution scheme of Salvador and Chan (2007),
+    i.e. we halve the resolution of both series by averaging neighboring
+    frames, solve the coarse problem recursively, project the coarse
+    warping path to the original resolution, and compute an exact dynamic
+    time warping only inside a window of the given radius around the
+    projected path. This takes O((m + n) * radius) time and memory.
+
+    Returns the approximate distance as well as the row indices I and the
+    column indices J of the according warping path.
+    """
+    cdef int m = x.shape[0]
+    cdef int n = y.shape[0]
+    if m <= radius + 2 or n <= radius + 2:
+        # for short series, we compute the full dynamic time warping
+        lo = np.zeros(m, dtype=np.int64)
+        hi = np.full(m, n - 1, dtype=np.int64)
+        ptr = np.arange(m + 1, dtype=np.int64) * n
+    else:
+        _, I, J = _fastdtw(_coarsen(x), _coarsen(y), radius, euclidean)
+        lo, hi, ptr = _project_path(I, J, m, n, radius)
+    Delta = np.zeros(ptr[m])
+    vector_costs_window_(x, y, lo, hi, ptr, euclidean, Delta)
+    D = np.zeros(ptr[m])
+    dtw_window_c[double](Delta, D, lo, hi, ptr)
+    I = np.zeros(m + n - 1, dtype=np.int64)
+    J = np.zeros(m + n - 1, dtype=np.int64)
+    L = dtw_window_path_(Delta, D, lo, hi, ptr, I, J)
+    return D[0], I[:L], J[:L]
+
+def _coarsen(x):
+    """ Halves the resolution of a series by averaging every two
+    consecutive rows, where an odd last row is kept as is.
+    """
+    cdef int m = x.shape[0]
+    x_coarse = np.zeros(((m + 1) // 2, x.shape[1]))
+    x_coarse[:m // 2] = 0.5 * (x[0:m-1:2] + x[1:m:2])
+    if m % 2 == 1:
+        x_coarse[m // 2] = x[m-1]
+    return x_coarse
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _project_path(const long long[::1] I, const long long[::1] J, int m, int n, int radius):
+    """ Projects a warping path at half resolution to a window at full
+    resolution (refer to _window), which contains all cells covered by the
+    coarse path as well as all cells within the given radius around it.
+    """
+    lo = np.full(m, n - 1, dtype=np.int64)
+    hi = np.zeros(m, dtype=np.int64)
+    cdef long long[::1] lo_view = lo
+    cdef long long[::1] hi_view = hi
+    cdef long long p
+    cdef long long r
+    cdef long long c_lo
+    cdef long long c_hi
+    for p in range(I.shape[0]):
+        c_lo = max(0, 2 * (J[p] - radius))
+        c_hi = min(n - 1, 2 * (J[p] + radius) + 1)
+        for r in range(max(0, 2 * (I[p] - radius)), min(m - 1, 2 * (I[p] + radius) + 1) + 1):
+            if c_lo < lo_view[r]:
+                lo_view[r] = c_lo
+            if c_hi > hi_view[r]:
+                hi_view[r] = c_hi
+    return _repair_window(lo, hi, n)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef long long dtw_window_path_(const double[::1] Delta, const double[::1] D, const long long[::1] lo,
+    const long long[::1] hi, const long long[::1] ptr, long long[::1] I, long long[::1] J) noexcept nogil:
+    """ Computes a co-optimal warping path in banded storage like
+    dtw_backtrace, i.e. preferring replacements over other options, writes
+    its row and column indices to I and J, and returns its length.
+    """
+    cdef long long m = lo.shape[0]
+    cdef long long n = hi[m-1] + 1
+    cdef long long i = 0
+    cdef long long j = 0
+    cdef long long L = 0
+    cdef double rest
+    while(i < m - 1 and j < n - 1):
+        I[L] = i
+        J[L] = j
+        L += 1
+        rest = D[ptr[i] + j - lo[i]] - Delta[ptr[i] + j - lo[i]] + _BACKTRACE_TOL
+        if(rest > window_get_(D, lo, hi, ptr, i+1, j+1)):
+            i += 1
+            j += 1
+        elif(rest > window_get_(D, lo, hi, ptr, i+1, j)):
+            i += 1
+        else:
+            j += 1
+    while(i < m - 1):
+        I[L] = i
+        J[L] = j
+        L += 1
+        i += 1
+    while(j < n - 1):
+        I[L] = i
+        J[L] = j
+        L += 1
+        j += 1
+    I[L] = m - 1
+    J[L] = n - 1
+    return L + 1
+
+def _fastdtw_result(x, y, radius, bint euclidean, return_alignment):
+    """ Calls _fastdtw and converts the output for the dtw functions. """
+    if radius < 0:
+        raise ValueError('The FastDTW radius must be non-negative, but was %s' % str(radius))
+    d, I, J = _fastdtw(np.asarray(x, dtype=float), np.asarray(y, dtype=float), radius, euclidean)
+    if not return_alignment:
+        return d
+    alignment = Alignment()
+    for i, j in zip(I.tolist(), J.tolist()):
+        alignment.append_tuple(i, j)
+    return d, alignment
+
+####### LOWER BOUNDS AND NEAREST NEIGHBORS #######
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void envelope_c(const double[::1] y, const long long[::1] lo, const long long[::1] hi,
+    double[::1] U, double[::1] L, long long[::1] max_queue, long long[::1] min_queue) noexcept nogil:
+    """ Computes the maximum U[i] and the minimum L[i] of y[lo[i]:hi[i]+1]
+    for all i, where lo and hi are non-decreasing, via the monotone queues
+    of Lemire (2006) in O(len(lo) + len(y)). Both queues need space for
+    len(y) entries.
+    """
+    cdef long long i
+    cdef long long j = 0
+    cdef long long max_head = 0
+    cdef long long max_tail = 0
+    cdef long long min_head = 0
+    cdef long long min_tail = 0
+    for i in range(lo.shape[0]):
+        # push all new elements of the window
+        while j <= hi[i]:
+            while max_tail > max_head and y[max_queue[max_tail-1]] <= y[j]:
+                max_tail -= 1
+            max_queue[max_tail] = j
+            max_tail += 1
+            while min_tail > min_head and y[min_queue[min_tail-1]] >= y[j]:
+                min_tail -= 1
+            min_queue[min_tail] = j
+            min_tail += 1
+            j += 1
+        # pop all elements which left the window
+        while max_queue[max_head] < lo[i]:
+            max_head += 1
+        while min_queue[min_head] < lo[i]:
+            min_head += 1
+        U[i] = y[max_queue[max_head]]
+        L[i] = y[min_queue[min_head]]
+
+def _envelope(y, lo, hi):
+    """ Calls envelope_c for the given window. """
+    y = np.ascontiguousarray(y, dtype=float)
+    U = np.zeros(len(lo))
+    L = np.zeros(len(lo))
+    envelope_c(y, lo, hi, U, L, np.zeros(len(y), dtype=np.int64), np.zeros(len(y), dtype=np.int64))
+    return U, L
+
+def envelope(y, window = None, m = None):
+    """ Computes the upper and the lower envelope of the time series y for
+    lower bounds on the dynamic time warping distance with the given
+    Sakoe-Chiba radius, i.e. U[i] and L[i] are the maximum and minimum of
+    all y[j] which may be aligned to the i-th element of a series of length
+    m. The envelope only depends on y, the window, and m, such that it can
+    be computed once per series in a corpus and window size.
+
+    Parameters
+    ----------
+    y: array_like
+        an array of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw. If None, the envelope covers all of
+        y.
+    m: int (default = len(y))
+        the length of the series which will be compared to y.
+
+    Returns
+    -------
+    U: ndarray
+        the upper envelope with m entries.
+    L: ndarray
+        the lower envelope with m entries.
+
+    """
+    if m is None:
+        m = len(y)
+    lo, hi, _ = _full_or_window(m, len(y), window)
+    return _envelope(y, lo, hi)
+
+def _full_or_window(int m, int n, window, slope = None):
+    """ Returns the window lo, hi, ptr for the given Sakoe-Chiba radius and
+    Itakura slope or the full matrix if both are None.
+    """
+    if window is None and slope is None:
+        return np.zeros(m, dtype=np.int64), np.full(m, n - 1, dtype=np.int64), np.arange(m + 1, dtype=np.int64) * n
+    return _window(m, n, window, slope)
+
+def lb_kim(x, y):
+    """ Computes the lower bound of Kim et al. (2001) for the dynamic time
+    warping distance between the numeric series x and y, in the simplified
+    form of Rakthanmanon et al. (2012), i.e. the cost of aligning the first
+    and the last elements, which every warping path has to pay.
+
+    Parameters
+    ----------
+    x: array_like
+        an array of doubles.
+    y: array_like
+        another array of doubles.
+
+    Returns
+    -------
+    lb: float
+        a lower bound for dtw_numeric(x, y), irrespective of the window.
+
+    """
+    if len(x) < 1 or len(y) < 1:
+        raise ValueError('Dynamic time warping can not handle empty input sequences!')
+    lb = abs(x[0] - y[0])
+    if len(x) > 1 or len(y) > 1:
+        lb += abs(x[len(x)-1] - y[len(y)-1])
+    return lb
+
+def lb_keogh(x, y, window = None, env = None):
+    """ Computes the lower bound of Keogh and Ratanamahatana (2005) for the
+    dynamic time warping distance between the numeric series x and y, i.e.
+    the distance of every x[i] to the envelope of y.
+
+    Parameters
+    ----------
+    x: array_like
+        an array of doubles.
+    y: array_like
+        another array of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    env: tuple (default = None)
+        the envelope (U, L) of y as returned by envelope(y, window, len(x)).
+        If not given, it is computed.
+
+    Returns
+    -------
+    lb: float
+        a lower bound for dtw_numeric(x, y, window).
+
+    """
+    x = np.asarray(x, dtype=float)
+    if env is None:
+        env = envelope(y, window, len(x))
+    U, L = env
+    return np.sum(np.maximum(x - U, 0.)) + np.sum(np.maximum(L - x, 0.))
+
+def lb_improved(x, y, window = None, env = None):
+    """ Computes the lower bound of Lemire (2009) for the dynamic time
+    warping distance between the numeric series x and y, which adds to
+    lb_keogh(x, y) the distance of every y[j] to the envelope of the
+    projection of x onto the envelope of y. This bound is at least as tight
+    as lb_keogh, but takes twice the time.
+
+    Parameters
+    ----------
+    x: array_like
+        an array of doubles.
+    y: array_like
+        another array of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    env: tuple (default = None)
+        the envelope (U, L) of y as returned by envelope(y, window, len(x)).
+        If not given, it is computed.
+
+    Returns
+    -------
+    lb: float
+        a lower bound for dtw_numeric(x, y, window).
+
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    cdef int m = len(x)
+    cdef int n = len(y)
+    lo, hi, _ = _full_or_window(m, n, window)
+    if env is None:
+        env = _envelope(y, lo, hi)
+    U, L = env
+    # project x onto the envelope of y
+    h = np.minimum(np.maximum(x, L), U)
+    lb = np.sum(np.abs(x - h))
+    # compute the envelope of h for every column of the window, where the
+    # rows of column j range from the first row with hi >= j to the last
+    # row with lo <= j
+    cols = np.arange(n)
+    col_lo = np.searchsorted(hi, cols, side = 'left').astype(np.int64)
+    col_hi = (np.searchsorted(lo, cols, side = 'right') - 1).astype(np.int64)
+    U_h, L_h = _envelope(h, col_lo, col_hi)
+    return lb + np.sum(np.maximum(y - U_h, 0.)) + np.sum(np.maximum(L_h - y, 0.))
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double dtw_numeric_abandon_c(const double[::1] x, const double[::1] y, const long long[::1] lo,
+    const long long[::1] hi, const long long[::1] ptr, const double[::1] prefix, double cutoff,
+    double[::1] D) noexcept nogil:
+    """ Computes the dynamic time warping distance between x and y with
+    absolute distances inside the given window like dtw_window_c, but
+    computes the distances on the fly and abandons the computation as soon
+    as the minimum over row i plus the lower bound prefix[i] for all rows
+    before i exceeds the cutoff, with the same tolerance as dtw_fused_c. In
+    that case, we return infinity.
+    """
+    cdef long long m = lo.shape[0]
+    cdef long long n = y.shape[0]
+    # the relative tolerance for comparing distances to the cutoff, which
+    # covers the rounding errors of summing up to m + n costs
+    cdef double tol = DBL_EPSILON * (m + n)
+    cdef long long i
+    cdef long long j
+    cdef long long idx
+    cdef double right
+    cdef double row_min
+    cdef double cost
+    for i in range(m-1, -1, -1):
+        row_min = INFINITY
+        for j in range(hi[i], lo[i]-1, -1):
+            idx = ptr[i] + j - lo[i]
+            cost = x[i] - y[j]
+            if cost < 0.:
+                cost = -cost
+            if j < hi[i]:
+                right = D[idx+1]
+            elif i == m-1:
+                right = 0.
+            else:
+                right = INFINITY
+            if i == m-1:
+                D[idx] = cost + right
+            else:
+                D[idx] = cost + min3(window_get_(D, lo, hi, ptr, i+1, j+1), right,
+                    window_get_(D, lo, hi, ptr, i+1, j))
+            if D[idx] < row_min:
+                row_min = D[idx]
+        if row_min + prefix[i] > cutoff * (1. + tol):
+            return INFINITY
+    if D[0] > cutoff * (1. + tol):
+        return INFINITY
+    return D[0]
+
+def dtw_knn(queries, corpus, window = None, int k = 1):
+    """ Finds the k nearest neighbors in a corpus of numeric time series for
+    each query series according to dtw_numeric with the given Sakoe-Chiba
+    radius.
+
+    We follow the cascade of Rakthanmanon et al. (2012). For every query,
+    we visit the corpus in order of the lower bounds lb_kim and lb_keogh,
+    where the envelopes of the corpus series are computed only once per
+    series length. We stop as soon as the lower bound exceeds the k-th best
+    distance so far, skip every series whose lb_improved exceeds it, and
+    abandon the dynamic time warping computation as soon as the distance
+    provably exceeds it. The distances are the same as for a brute-force
+    search, but neighbors with tied distances may differ.
+
+    Parameters
+    ----------
+    queries: list
+        a list of query time series, each an array of doubles.
+    corpus: list
+        a list of time series to search, each an array of doubles.
+    window: int (default = None)
+        the Sakoe-Chiba radius; see dtw.
+    k: int (default = 1)
+        the number of neighbors.
+
+    Returns
+    -------
+    distances: ndarray
+        a len(queries) x k matrix, where distances[q, :] contains the
+        dynamic time warping distances of the k nearest neighbors of
+        queries[q] in ascending order.
+    indices: ndarray
+        a len(queries) x k matrix, where indices[q, :] contains the indices
+        of the k nearest neighbors of queries[q] in the corpus.
+
+    """
+    if k < 1 or k > len(corpus):
+        raise ValueError('k must be between 1 and the size of the corpus (%d), but was %d' % (len(corpus), k))
+    corpus = [np.ascontiguousarray(y, dtype=float) for y in corpus]
+    for y in corpus:
+        if len(y) < 1:
+            raise ValueError('Dynamic time warping can not handle empty input sequences!')
+    # caches for windows and corpus envelopes per query length
+    windows = {}
+    envelopes = {}
+    distances = np.zeros((len(queries), k))
+    indices = np.zeros((len(queries), k), dtype=int)
+    cdef int q
+    cdef int c
+    cdef double bsf
+    for q in range(len(queries)):
+        x = np.ascontiguousarray(queries[q], dtype=float)
+        m = len(x)
+        if m < 1:
+            raise ValueError('Dynamic time warping can not handle empty input sequences!')
+        if m not in envelopes:
+            for y in corpus:
+                if (m, len(y)) not in windows:
+                    windows[(m, len(y))] = _full_or_window(m, len(y), window)
+            envelopes[m] = [_envelope(y, *windows[(m, len(y))][:2]) for y in corpus]
+        # compute cheap lower bounds for all corpus series
+        lbs = np.zeros(len(corpus))
+        for c in range(len(corpus)):
+            lbs[c] = max(lb_kim(x, corpus[c]), lb_keogh(x, corpus[c], env = envelopes[m][c]))
+        # the current k best neighbors as a heap of (-distance, index) pairs
+        best = []
+        bsf = INFINITY
+        for c in np.argsort(lbs, kind = 'stable'):
+            if lbs[c] >= bsf:
+                # all remaining lower bounds are at least as large
+                break
+            y = corpus[c]
+            lo, hi, ptr = windows[(m, len(y))]
+            if lb_improved(x, y, window, env = envelopes[m][c]) >= bsf:
+                continue
+            # prepare the lower bounds of all rows before i for early
+            # abandoning
+            U, L = envelopes[m][c]
+            prefix = np.zeros(m + 1)
+            np.cumsum(np.maximum(x - U, 0.) + np.maximum(L - x, 0.), out = prefix[1:])
+            d = dtw_numeric_abandon_c(x, y, lo, hi, ptr, prefix, bsf, np.zeros(ptr[m]))
+            if d < bsf:
+                if len(best) == k:
+                    heapq.heapreplace(best, (-d, -c))
+                else:
+                    heapq.heappush(best, (-d, -c))
+                if len(best) == k:
+                    bsf = -best[0][0]
+        best = sorted((-d, -c) for d, c in best)
+        distances[q, :] = [d for d, c in best]
+        indices[q, :] = [c for d, c in best]
+    return distances, indices
+
+####### BATCHED MULTIVARIATE DYNAMIC TIME WARPING #######
+
+# the maximum number of entries of a single cost tile
+cdef long long _TILE_SIZE = 1 << 22
+
+def dtw_euclidean_many(query, corpus):
+    """ Computes the multivariate dynamic time warping distance between a
+    query array and every array in a corpus, using the Euclidean distance as
+    element-wise distance measure.
+
+    Instead of computing the element-wise distances for every pair
+    separately, we stack the corpus and compute the squared distances
+    ||x_i||^2 + ||y_j||^2 - 2 x_i^T y_j for whole blocks of the corpus via
+    a single matrix product, which numpy delegates to BLAS. The dynamic
+    time warping recurrence then runs on the resulting cost tile for every
+    series in the block. Up to rounding errors in the matrix product, the
+    result is the same as calling dtw_euclidean for every pair. Note that
+    the expansion cancels for nearly identical elements, such that
+    near-zero element-wise distances carry an absolute error of about
+    sqrt(eps) * ||x_i||, where eps is the machine precision.
+
+    Parameters
+    ----------
+    query: array_like
+        a m x K matrix of doubles.
+    corpus: list
+        a list of arrays, each a n_c x K matrix of doubles.
+
+    Returns
+    -------
+    d: ndarray
+        a vector with len(corpus) entries, where d[c] is the dynamic time
+        warping distance between query and corpus[c].
+
+    """
+    x = _as_series(query)
+    Y, offsets, y_sq = _stack_series(corpus, x.shape[1])
+    return _dtw_euclidean_many(x, Y, offsets, y_sq)
+
+def dtw_euclidean_pairwise(Xs, Ys = None):
+    """ Computes the multivariate dynamic time warping distance between all
+    pairs of arrays in Xs and Ys, using the Euclidean distance as
+    element-wise distance measure. The element-wise distances are computed
+    in tiles via BLAS; refer to dtw_euclidean_many. In particular,
+    near-zero distances carry an absolute error of about sqrt(eps) * ||x||.
+    If Ys is not given, the diagonal is exactly zero.
+
+    Parameters
+    ----------
+    Xs: list
+        a list of arrays, each a m_k x K matrix of doubles.
+    Ys: list (default = None)
+        a list of arrays, each a n_l x K matrix of doubles. If not given,
+        we compare Xs to itself.
+
+    Returns
+    -------
+    D: ndarray
+        a len(Xs) x len(Ys) matrix, where D[k, l] is the dynamic time
+        warping distance between Xs[k] and Ys[l].
+
+    """
+    symmetric = Ys is None
+    if symmetric:
+        Ys = Xs
+    Xs = [_as_series(x) for x in Xs]
+    D = np.zeros((len(Xs), len(Ys)))
+    if len(Xs) == 0:
+        return D
+    # stack the second list only once for all queries
+    Y, offsets, y_sq = _stack_series(Ys, Xs[0].shape[1])
+    cdef int k
+    for k in range(len(Xs)):
+        if Xs[k].shape[1] != Y.shape[1]:
+            raise ValueError('x and y do not have the same dimensionality (%d versus %d)' % (Xs[k].shape[1], Y.shape[1]))
+        D[k, :] = _dtw_euclidean_many(Xs[k], Y, offsets, y_sq)
+    if symmetric:
+        # the distance of each series to itself is zero, which the
+        # expanded squared distances only approximate
+        np.fill_diagonal(D, 0.)
+    return D
+
+def _as_series(x):
+    """ Converts the input to a C-contiguous m x K matrix of doubles with
+    m >= 1.
+    """
+    x = np.ascontiguousarray(x, dtype=float)
+    if x.ndim == 1:
+        x = np.expand_dims(x, 1)
+    if x.ndim != 2:
+        raise ValueError('Expected a m x K matrix, but got an array with %d dimensions' % x.ndim)
+    if x.shape[0] < 1:
+        raise ValueError('Dynamic time warping can not handle empty input sequences!')
+    return x
+
+def _stack_series(corpus, int K):
+    """ Stacks all arrays in the corpus into a single matrix Y, such that
+    corpus[c] corresponds to the rows offsets[c]:offsets[c+1] of Y, and
+    computes the squared norms of all rows of Y.
+    """
+    corpus = [_as_series(y) for y in corpus]
+    for y in corpus:
+        if y.shape[1] != K:
+            raise ValueError('x and y do not have the same dimensionality (%d versus %d)' % (K, y.shape[1]))
+    offsets = np.zeros(len(corpus) + 1, dtype=np.int64)
+    np.cumsum([y.shape[0] for y in corpus], out = offsets[1:])
+    if len(corpus) > 0:
+        Y = np.concatenate(corpus, axis = 0)
+    else:
+        Y = np.zeros((0, K))
+    return Y, offsets, np.einsum('jk,jk->j', Y, Y)
+
+def _dtw_euclidean_many(x, Y, const long long[::1] offsets, y_sq):
+    """ Computes the Euclidean dynamic time warping distance between x and
+    all series stacked in Y, where block after block of the corpus is
+    processed, such that every cost tile has at most _TILE_SIZE entries.
+    """
+    cdef int C = len(offsets) - 1
+    cdef long long m = x.shape[0]
+    d = np.zeros(C)
+    if C == 0:
+        return d
+    cdef double[::1] d_view = d
+    x_sq = np.einsum('ik,ik->i', x, x)
+    lens = np.diff(offsets)
+    cdef long long max_n = np.max(lens)
+    cdef int c0 = 0
+    cdef int c1
+    cdef int c
+    cdef long long r0
+    cdef long long R
+    cdef double[:,::1] tile_view
+    cdef double* rows
+    cdef int failed = 0
+    while c0 < C:
+        # extend the block as long as the tile stays small enough
+        c1 = c0 + 1
+        while c1 < C and m * (offsets[c1+1] - offsets[c0]) <= _TILE_SIZE:
+            c1 += 1
+        r0 = offsets[c0]
+        R = offsets[c1] - r0
+        # compute the cost tile via BLAS
+        tile = np.dot(x, Y[r0:r0+R].T)
+        tile *= -2.
+        tile += np.expand_dims(x_sq, 1)
+        tile += np.expand_dims(y_sq[r0:r0+R], 0)
+        np.maximum(tile, 0., out = tile)
+        np.sqrt(tile, out = tile)
+        tile_view = tile
+        # run the recurrence for every series in the block
+        with nogil, parallel():
+            rows = <double*> malloc(2 * max_n * sizeof(double))
+            for c in prange(c0, c1):
+                if rows == NULL:
+                    failed += 1
+                else:
+                    d_view[c] = dtw_tile_c(&tile_view[0, offsets[c] - r0], R, m,
+                        offsets[c+1] - offsets[c], rows, rows + max_n)
+            free(rows)
+        if failed > 0:
+            raise MemoryError('Could not allocate the dynamic programming rows')
+        c0 = c1
+    return d
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double dtw_tile_c(const double* Delta, long long stride, long long m, long long n,
+    double* cur, double* nxt) noexcept nogil:
+    """ Computes the dynamic time warping distance like dtw_c, where the
+    m x n matrix of element-wise distances is given as a pointer to a tile
+    with the given row stride, and where only two rows of the dynamic
+    programming matrix are stored in cur and nxt, each with n entries.
+    """
+    cdef long long i
+    cdef long long j
+    cdef double* tmp
+    cdef const double* Delta_i
+    # the last row
+    Delta_i = Delta + (m-1) * stride
+    cur[n-1] = Delta_i[n-1]
+    for j in range(n-2, -1, -1):
+        cur[j] = Delta_i[j] + cur[j+1]
+    for i in range(m-2, -1, -1):
+        # D[i+1, :] is now stored in nxt
+        tmp = cur
+        cur = nxt
+        nxt = tmp
+        Delta_i = Delta + i * stride
+        cur[n-1] = Delta_i[n-1] + nxt[n-1]
+        for j in range(n-2, -1, -1):
+            cur[j] = Delta_i[j] + min3(nxt[j+1], cur[j+1], nxt[j])
+    return cur[0]
+
+####### SUBSEQUENCE DYNAMIC TIME WARPING #######
+
+def dtw_subsequence(x, y, delta = None):
+    """ Finds the subsequence y[start:end] of a long sequence y which has
+    the smallest dynamic time warping distance to the query x, i.e. the
+    alignment has to cover all of x but may start and end anywhere in y.
+
+    We compute the dynamic programming matrix column by column over y,
+    where we only store the current column of costs and, for every entry,
+    the start of the best warping path ending there. This takes
+    O(len(x) * len(y)) time but only O(len(x)) memory. Refer to
+    dtw_subsequence_stream for a variant which processes y in chunks.
+
+    Parameters
+    ----------
+    x: list
+        the query sequence of objects.
+    y: list
+        the long sequence of objects.
+    delta: function (default = None)
+        a function that takes an element of x as first and an element of y
+        as second input and returns the non-negative distance between them.
+        If None, x and y must be numeric arrays, either with one entry or
+        with one row per time step, and we use the Manhattan distance.
+
+    Returns
+    -------
+    d: float
+        the dynamic time warping distance between x and y[start:end].
+    start: int
+        the start of the best matching window in y.
+    end: int
+        the end of the best matching window in y (exclusive).
+
+    """
+    if len(y) < 1:
+        raise ValueError('Dynamic time warping can not handle empty input sequences!')
+    for match in dtw_subsequence_stream(x, [y], delta):
+        return match
+
+def dtw_subsequence_stream(x, chunks, delta = None):
+    """ Searches the query x in a stream of chunks, e.g. a generator of
+    arrays, according to dtw_subsequence, i.e. the alignment has to cover
+    all of x but may start and end anywhere in the stream. The state
+    between chunks only consists of O(len(x)) numbers, such that this
+    function can run continuously over incoming data.
+
+    Parameters
+    ----------
+    x: list
+        the query sequence of objects.
+    chunks: iterable
+        an iterable of sequences of objects, which form the stream if
+        concatenated.
+    delta: function (default = None)
+        the element-wise distance; see dtw_subsequence.
+
+    Yields
+    ------
+    d: float
+        after every chunk, the smallest dynamic time warping distance
+        between x and a window of the stream which ends inside this chunk,
+        or infinity if the chunk is empty.
+    start: int
+        the start of the best matching window, counted from the start of
+        the stream, or -1 if the chunk is empty.
+    end: int
+        the end of the best matching window (exclusive), counted from the
+        start of the stream, or -1 if the chunk is empty.
+
+    """
+    cdef int m = len(x)
+    if m < 1:
+        raise ValueError('Dynamic time warping can not handle empty input sequences!')
+    if delta is None:
+        x = _as_series(x)
+    # the current column of the dynamic programming matrix and the start of
+    # the best warping path ending in each of its entries
+    D = np.full(m, INFINITY)
+    S = np.zeros(m, dtype=np.int64)
+    match = np.zeros(2, dtype=np.int64)
+    cdef long long offset = 0
+    cdef int i
+    cdef int j
+    cdef double[:,:] Delta_view
+    for chunk in chunks:
+        L = len(chunk)
+        if L == 0:
+            yield INFINITY, -1, -1
+            continue
+        # compute the element-wise distances for the current chunk
+        if delta is None:
+            chunk = _as_series(chunk)
+            if chunk.shape[1] != x.shape[1]:
+                raise ValueError('x and y do not have the same dimensionality (%d versus %d)' % (x.shape[1], chunk.shape[1]))
+            Delta = cdist(x, chunk, 'cityblock')
+        else:
+            Delta = np.zeros((m, L))
+            Delta_view = Delta
+            for i in range(m):
+                for j in range(L):
+                    Delta_view[i, j] = delta(x[i], chunk[j])
+        d = dtw_subsequence_chunk_(Delta, D, S, offset, match)
+        yield d, int(match[0]), int(match[1])
+        offset += L
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double dtw_subsequence_chunk_(const double[:,:] Delta, double[::1] D, long long[::1] S,
+    long long offset, long long[::1] match) noexcept nogil:
+    """ Continues the subsequence dynamic time warping computation for the
+    next chunk of the stream, given the m x L matrix Delta of distances
+    between the query and the chunk, which starts at index offset of the
+    stream.
+
+    D[i] is the cost of the best warping path which aligns x[:i+1] to a
+    window of the stream ending at the current position, and S[i] is the
+    start of that window. Both get updated in place, column by column.
+    Because all distances are non-negative, a warping path for x[0]
+    always starts at the current position.
+
+    Returns
+    -------
+    d: double
+        the cost of the best match ending inside the chunk. The start and
+        end of that match are written to match[0] and match[1].
+
+    """
+    cdef long long m = Delta.shape[0]
+    cdef long long i
+    cdef long long j
+    cdef double diag
+    cdef long long diag_start
+    cdef double old
+    cdef long long old_start
+    cdef double best
+    cdef long long start
+    cdef double d = INFINITY
+    for j in range(Delta.shape[1]):
+        diag = D[0]
+        diag_start = S[0]
+        D[0] = Delta[0, j]
+        S[0] = offset + j
+        for i in range(1, m):
+            old = D[i]
+            old_start = S[i]
+            # choose the best predecessor among (i-1, j-1), (i-1, j), and
+            # (i, j-1)
+            best = diag
+            start = diag_start
+            if D[i-1] < best:
+                best = D[i-1]
+                start = S[i-1]
+            if old < best:
+                best = old
+                start = old_start
+            D[i] = Delta[i, j] + best
+            S[i] = start
+            diag = old
+            diag_start = old_start
+        if D[m-1] < d:
+            d = D[m-1]
+            match[0] = S[m-1]
+            match[1] = offset + j + 1
+    return d
@@ -0,0 +1,281 @@
+#!python
+#cython: language_level=3
+"""
+Provides incremental versions of the dynamic time warping distance and the
+sequence edit distance, where the second sequence grows one element at a
+time.
+
+"""
+
+# Copyright (C) 2019-2021
+# Benjamin Paaßen
+# AG Machine Learning
+# Bielefeld University
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from libc.math cimport INFINITY
+cimport cython
+from edist._fused cimport min3
+
+__author__ = 'Benjamin Paaßen'
+__copyright__ = 'Copyright (C) 2019-2021, Benjamin Paaßen'
+__license__ = 'GPLv3'
+__maintainer__ = 'Benjamin Paaßen'
+__email__  = 'bpaassen@techfak.uni-bielefeld.de'
+
+_METHODS = ['dtw', 'sed']
+
+class IncrementalAligner:
+    """ Computes the dynamic time warping distance or the sequence edit
+    distance between a fixed sequence x and a sequence y which grows one
+    element at a time, e.g. a stream of measurements.
+
+    Instead of recomputing the distance from scratch after every appended
+    element, we store the last column of the dynamic programming matrix,
+    i.e. the distances between all prefixes of x and the current y, and
+    update it in O(len(x)) per appended element. The resulting distances
+    are the same as for edist.dtw.dtw(x, y, delta) and
+    edist.sed.sed(x, y, delta), up to rounding errors.
+
+    If a window is given, we only keep the last window elements of y.
+    Dropping an element at the start of y changes every alignment, such
+    that we store the element-wise distances of the last window elements
+    and recompute the column from them in O(len(x) * window) the next time
+    the distance is requested. Appending several elements before requesting
+    the distance thus only costs a single recomputation. The function delta
+    is never called twice for the same element.
+
+    Attributes
+    ----------
+    x: list
+        the fixed sequence.
+    method: str (default = 'dtw')
+        either 'dtw' for dynamic time warping or 'sed' for the sequence edit
+        distance.
+    delta: function (default = None)
+        a function that takes an element of x as first and an element of y
+        as second input and returns the distance between them, where None
+        stands for a gap in case of the sequence edit distance. If None,
+        we use the Manhattan distance between numeric elements for 'dtw'
+        and the Kronecker distance for 'sed'.
+    window: int (default = None)
+        if given, we only keep the last window elements of y.
+
+    """
+    def __init__(self, x, method = 'dtw', delta = None, window = None):
+        if method not in _METHODS:
+            raise ValueError('Unknown method %s; expected one of %s' % (str(method), str(_METHODS)))
+        if window is not None and window < 1:
+            raise ValueError('The window must be positive, but was %s' % str(window))
+        if method == 'dtw':
+            if len(x) < 1:
+                raise ValueError('Dynamic time warping can not handle empty input sequences!')
+            if delta is None:
+                x = np.asarray(x, dtype=float)
+                if x.ndim == 1:
+                    x = np.expand_dims(x, 1)
+        self.x = x
+        self.method = method
+        self.delta = delta
+        self.window = window
+        m = len(x)
+        # the deletion costs for the sequence edit distance
+        if method == 'sed' and delta is not None:
+            self._Delta_del = np.array([delta(x[i], None) for i in range(m)], dtype=float)
+        else:
+            self._Delta_del = np.ones(m)
+        # the last column of the dynamic programming matrix, where entry i
+        # contains the distance between x[:i+1] (for 'dtw') or x[:i] (for
+        # 'sed') and the current y
+        if method == 'dtw':
+            self._D = np.full(m, INFINITY)
+        else:
+            self._D = np.zeros(m + 1)
+        self._n = 0
+        if window is not None:
+            # a ring buffer of the element-wise distances of the last
+            # window elements, where the last entry of every row is the
+            # insertion cost
+            self._buffer = np.zeros((window, m + 1))
+            self._head = 0
+        self._dirty = False
+        self._reset()
+
+    def _reset(self):
+        """ Resets the column to the distances for an empty y. """
+        if self.method == 'dtw':
+            self._D[:] = INFINITY
+        else:
+            self._D[0] = 0.
+            np.cumsum(self._Delta_del, out = self._D[1:])
+
+    def _costs(self, y):
+        """ Computes the distances between all elements of x and the new
+        element y, followed by the insertion cost for y.
+        """
+        m = len(self.x)
+        costs = np.ones(m + 1)
+        if self.delta is not None:
+            for i in range(m):
+                costs[i] = self.delta(self.x[i], y)
+            if self.method == 'sed':
+                costs[m] = self.delta(None, y)
+        elif self.method == 'dtw':
+            y = np.asarray(y, dtype=float)
+            if y.shape != self.x.shape[1:] and not (y.ndim == 0 and self.x.shape[1] == 1):
+                raise ValueError('x and y do not have the same dimensionality (%d versus %d)' % (self.x.shape[1], y.size))
+            costs[:m] = np.sum(np.abs(self.x - y), 1)
+        else:
+            for i in range(m):
+                if self.x[i] == y:
+                    costs[i] = 0.
+        return costs
+
+    def append(self, y):
+        """ Appends a new element to y and updates the distance in
+        O(len(x)). If a window is given and y already contains window
+        elements, the oldest element is dropped and the distance is only
+        recomputed once it is requested via distance.
+
+        Parameters
+        ----------
+        y: object
+            the new element.
+
+        """
+        costs = self._costs(y)
+        if self.window is not None:
+            if self._n == self.window:
+                # overwrite the oldest element in the ring buffer
+                self._buffer[self._head, :] = costs
+                self._head = (self._head + 1) % self.window
+                self._dirty = True
+            else:
+                self._buffer[self._n, :] = costs
+                self._n += 1
+        else:
+            self._n += 1
+        if not self._dirty:
+            self._update(costs, self._n == 1)
+
+    def extend(self, ys):
+        """ Appends all elements of ys to y and returns the resulting
+        distance, which requires at most one recomputation; see append.
+
+        Parameters
+        ----------
+        ys: list
+            the new elements.
+
+        Returns
+        -------
+        d: float
+            the distance between x and the current y; see distance.
+
+        """
+        for y in ys:
+            self.append(y)
+        return self.distance
+
+    def _update(self, costs, bint first):
+        """ Updates the column with the distances of a new element. """
+        if self.method == 'dtw':
+            dtw_column_(costs, self._D, first)
+        else:
+            sed_column_(costs, self._Delta_del, self._D)
+
+    def _recompute(self):
+        """ Recomputes the column from the ring buffer. """
+        self._reset()
+        cdef const double[:, ::1] buffer = self._buffer
+        cdef const double[::1] Delta_del = self._Delta_del
+        cdef double[::1] D = self._D
+        cdef long long head = self._head
+        cdef long long n = self._n
+        cdef bint dtw = self.method == 'dtw'
+        with nogil:
+            recompute_column_(buffer, head, n, Delta_del, D, dtw)
+        self._dirty = False
+
+    @property
+    def distance(self):
+        """ The dynamic time warping distance or the sequence edit distance
+        between x and the current y. For dynamic time warping, the distance
+        is infinite as long as y is empty.
+        """
+        if self._dirty:
+            self._recompute()
+        return self._D[len(self._D) - 1]
+
+    def __len__(self):
+        """ Returns the number of elements in the current y. """
+        return self._n
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void recompute_column_(const double[:, ::1] buffer, long long head, long long n,
+    const double[::1] Delta_del, double[::1] D, bint dtw) noexcept nogil:
+    """ Recomputes the column D, which has to be reset to the distances for
+    an empty y, from the first n rows of the ring buffer of element-wise
+    distances, starting at row head.
+    """
+    cdef long long W = buffer.shape[0]
+    cdef long long k
+    for k in range(n):
+        if dtw:
+            dtw_column_(buffer[(head + k) % W], D, k == 0)
+        else:
+            sed_column_(buffer[(head + k) % W], Delta_del, D)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void dtw_column_(const double[::1] Delta_j, double[::1] D, bint first) noexcept nogil:
+    """ Updates the column D[i] = dtw(x[:i+1], y) for a new element y_j of y,
+    given the distances Delta_j[i] between x[i] and y_j. If first is True,
+    y_j is the first element of y.
+    """
+    cdef long long m = D.shape[0]
+    cdef long long i
+    cdef double diag
+    cdef double old
+    if first:
+        D[0] = Delta_j[0]
+        for i in range(1, m):
+            D[i] = Delta_j[i] + D[i-1]
+        return
+    diag = D[0]
+    D[0] = Delta_j[0] + D[0]
+    for i in range(1, m):
+        old = D[i]
+        D[i] = Delta_j[i] + min3(diag, old, D[i-1])
+        diag = old
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void sed_column_(const double[::1] Delta_j, const double[::1] Delta_del, double[::1] D) noexcept nogil:
+    """ Updates the column D[i] = sed(x[:i], y) for a new element y_j of y,
+    given the replacement costs Delta_j[i] between x[i] and y_j, the
+    insertion cost Delta_j[m] for y_j, and the deletion costs Delta_del.
+    """
+    cdef long long m = Delta_del.shape[0]
+    cdef long long i
+    cdef double diag = D[0]
+    cdef double old
+    D[0] = D[0] + Delta_j[m]
+    for i in range(1, m+1):
+        old = D[i]
+        D[i] = min3(diag + Delta_j[i-1], D[i-1] + Delta_del[i-1], old + Delta_j[m])
+        diag = old
@@ -26,10 +26,14 @@ backtracing in cython.
 import random
 import heapq
 import numpy as np
-from cython.parallel import prange
-from libc.math cimport sqrt
+from cython.parallel import prange, parallel
+from libc.math cimport sqrt, INFINITY
+from libc.float cimport FLT_EPSILON, DBL_EPSILON
+from libc.stdlib cimport malloc, free
 cimport cython
 from edist.alignment import Alignment
+from edist._fused cimport real_t, int_t, min3, min3_int
+from edist._precision import REAL_DTYPES, INT_DTYPES, check_dtype, as_cutoff
 
 __author__ = 'Benjamin Paaßen'
 __copyright__ = 'Copyright (C) 2019-2021, Benjamin Paaßen'
@@ -37,12 +41,11 @@ __license__ = 'GPLv3'
 __maintainer__ = 'Benjamin Paaßen'
 __email__  = 'bpaassen@techfak.uni-bielefeld.de'
 
-
 ###################################
 # Edit Distance with Custom Delta #
 ###################################
 
-def sed(x, y, delta = None):
+def sed(x, y, delta = None, cutoff = None, dtype = np.float64):
     """ Computes the sequence edit distance between the input sequence
     x and the input sequence y, given the element-wise distance function delta.
 
@@ -56,6 +59,20 @@ def sed(x, y, delta = None):
         a function that takes an element of x as first and an element of y
         as second input and returns the distance between them. If None, this
         method calls standard_sed instead.
+    cutoff: float (default = None)
+        if given, we abandon the computation and return infinity as soon as
+        the edit distance provably exceeds cutoff, i.e. as soon as for every
+        cell of the current row of the dynamic programming matrix, the
+        remaining costs plus a lower bound for the costs of reaching that
+        cell exceed cutoff. This requires that delta is non-negative. The
+        result is the exact distance if it is at most cutoff and infinity
+        otherwise.
+    dtype: numpy dtype (default = np.float64)
+        the precision of the costs and the dynamic programming matrix,
+        either np.float64 or np.float32. Single precision halves the memory
+        traffic for long sequences, which is usually sufficient for learned
+        costs. If delta is None, this is the integer precision for
+        standard_sed instead.
 
     Returns
     -------
@@ -64,109 +81,439 @@ def sed(x, y, delta = None):
 
     """
     if(delta is None):
-        return float(standard_sed(x, y))
-    _, _, _, D = _sed(x, y, delta)
-    return D[0,0]
+        if np.dtype(dtype).kind == 'f':
+            dtype = np.int64
+        return float(standard_sed(x, y, cutoff, dtype))
+    dtype = check_dtype(dtype, REAL_DTYPES)
+    Delta, Delta_del, Delta_ins = _sed_costs(x, y, delta, dtype)
+    D = np.zeros((len(x)+1,len(y)+1), dtype=dtype)
+    return _sed_dp(Delta, Delta_del, Delta_ins, D, as_cutoff(cutoff))
+
+def _sed_dp(const real_t[:,:] Delta, const real_t[:] Delta_del, const real_t[:] Delta_ins, real_t[:,:] D,
+    double cutoff = INFINITY):
+    """ Calls sed_c in the precision of the given arrays. """
+    return sed_c(Delta, Delta_del, Delta_ins, D, cutoff)
 
 def _sed(x, y, delta):
     """ Internal function. Call sed instead. """
+    Delta, Delta_del, Delta_ins = _sed_costs(x, y, delta)
+    # Then, compute the sequence edit distance
+    D = np.zeros((len(x)+1,len(y)+1))
+    _sed_dp(Delta, Delta_del, Delta_ins, D)
+
+    return Delta, Delta_del, Delta_ins, D
+
+def _sed_costs(x, y, delta, dtype = np.float64):
+    """ Computes all replacement, deletion, and insertion costs. """
     cdef int m = len(x)
     cdef int n = len(y)
-    # First, compute all pairwise replacements
-    Delta = np.zeros((m, n))
-    cdef double[:,:] Delta_view = Delta
+    # First, compute all pairwise replacements row by row, such that we
+    # only need a double precision buffer for a single row
+    Delta = np.zeros((m, n), dtype=dtype)
+    row = np.zeros(n)
+    cdef double[:] row_view = row
     cdef int i
     cdef int j
     for i in range(m):
         for j in range(n):
-            Delta_view[i,j] = delta(x[i], y[j])
+            row_view[j] = delta(x[i], y[j])
+        Delta[i, :] = row
 
     # Then, compute all deletions
-    Delta_del = np.zeros(m)
-    cdef double[:] Delta_del_view = Delta_del
+    Delta_del = np.zeros(m, dtype=dtype)
     for i in range(m):
-        Delta_del_view[i] = delta(x[i], None)
+        Delta_del[i] = delta(x[i], None)
 
     # Then, compute all insertions
-    Delta_ins = np.zeros(n)
-    cdef double[:] Delta_ins_view = Delta_ins
+    Delta_ins = np.zeros(n, dtype=dtype)
     for j in range(n):
-        Delta_ins_view[j] = delta(None, y[j])
-
-    # Then, compute the sequence edit distance
-    D = np.zeros((m+1,n+1))
-    sed_c(Delta, Delta_del, Delta_ins, D)
+        Delta_ins[j] = delta(None, y[j])
 
-    return Delta, Delta_del, Delta_ins, D
+    return Delta, Delta_del, Delta_ins
 
 
 @cython.boundscheck(False)
-cdef void sed_c(const double[:,:] Delta, const double[:] Delta_del, const double[:] Delta_ins, double[:,:] D) noexcept nogil:
+cdef double sed_c(const real_t[:,:] Delta, const real_t[:] Delta_del, const real_t[:] Delta_ins, real_t[:,:] D,
+    double cutoff = INFINITY) noexcept nogil:
     """ Computes the sequence edit distance between two input sequences
     with pairwise element distances Delta and an (empty) dynamic programming
     matrix D.
 
     Arguments
     ---------
-    Delta: double matrix
+    Delta: float or double matrix
         a m x n matrix containing the pairwise element distances.
-    Delta_del: double array
+    Delta_del: float or double array
         a m-element vector containing deletion costs.
-    Delta_ins: double array
+    Delta_ins: float or double array
         a n-element vector containing insertion costs.
-    D: double matrix
+    D: float or double matrix
         an m+1 x n+1 matrix to which the output will be written.
         The sequence edit distance will be in cell [0, 0] after the computation
         is finished.
+    cutoff: double (default = infinity)
+        we abandon the computation as soon as the minimum over row i of
+        D[i, j] plus a lower bound for the cost of reaching (i, j) from
+        (0, 0) exceeds cutoff. Because every alignment passes through every
+        row and reaching (i, j) requires at least i - j deletions or j - i
+        insertions, we use the cheapest deletion or insertion cost times
+        |i - j| as lower bound. To allow for rounding errors, we compare
+        to cutoff with a relative tolerance of the machine precision of D
+        times m + n.
+
+    Returns
+    -------
+    d: double
+        the sequence edit distance or infinity if it exceeds cutoff.
 
     """
     cdef int m = Delta.shape[0]
     cdef int n = Delta.shape[1]
     cdef int i
     cdef int j
+    cdef double min_del = INFINITY
+    cdef double min_ins = INFINITY
+    # the relative tolerance for comparing distances to the cutoff, which
+    # covers the rounding errors of summing up to m + n costs in the
+    # precision of D
+    cdef double tol = DBL_EPSILON
+    if real_t is float:
+        tol = FLT_EPSILON
+    tol *= m + n
     # initialize last entry
     D[m, n] = 0.
     # compute last column
     for i in range(m-1,-1,-1):
         D[i,n] = Delta_del[i] + D[i+1,n]
+        if Delta_del[i] < min_del:
+            min_del = Delta_del[i]
     # compute last row
     for j in range(n-1,-1,-1):
         D[m,j] = Delta_ins[j] + D[m,j+1]
+        if Delta_ins[j] < min_ins:
+            min_ins = Delta_ins[j]
+    if cutoff < INFINITY and row_bound_(D, m, n, min_del, min_ins) > cutoff * (1. + tol):
+        return INFINITY
     # compute remaining matrix
     for i in range(m-1,-1,-1):
         for j in range(n-1,-1,-1):
             D[i,j] = min3(Delta[i,j] + D[i+1,j+1],
                           Delta_del[i] + D[i+1, j],
                           Delta_ins[j] + D[i, j+1])
+        if cutoff < INFINITY and row_bound_(D, i, n, min_del, min_ins) > cutoff * (1. + tol):
+            return INFINITY
+    if D[0,0] > cutoff * (1. + tol):
+        return INFINITY
+    return D[0,0]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double row_bound_(const real_t[:,:] D, int i, int n, double min_del, double min_ins) noexcept nogil:
+    """ Returns the minimum over j of D[i, j] plus |i - j| times the
+    cheapest deletion cost min_del (if i > j) or the cheapest insertion
+    cost min_ins (if j > i), which is a lower bound for the sequence edit
+    distance.
+    """
+    cdef int j
+    cdef double bound = INFINITY
+    cdef double val
+    for j in range(n+1):
+        val = D[i, j]
+        if i > j:
+            val = val + (i - j) * min_del
+        elif j > i:
+            val = val + (j - i) * min_ins
+        if val < bound:
+            bound = val
+    return bound
+
+########################################
+# Edit Distance with Symbol Cost Table #
+########################################
+
+def sed_indexed(x, y, Delta):
+    """ Computes the sequence edit distance between two sequences of symbol
+    indices x and y, given a table of symbol-wise costs Delta.
+
+    In contrast to sed, this function does not call any Python function
+    per element pair but looks up all costs in Delta directly, which makes
+    it suitable for learned symbol costs, e.g. from bedl.BEDL.
 
-cdef double min3(double a, double b, double c) nogil:
-    """ Computes the minimum of three numbers.
+    Parameters
+    ----------
+    x: int array
+        a sequence of symbol indices in the range 0, ..., A-1.
+    y: int array
+        another sequence of symbol indices in the range 0, ..., A-1.
+    Delta: double matrix
+        an A+1 x A+1 matrix, where Delta[a, b] is the cost of replacing
+        symbol a with symbol b, Delta[a, A] is the cost of deleting a, and
+        Delta[A, b] is the cost of inserting b.
+
+    Returns
+    -------
+    d: float
+        the sequence edit distance between x and y according to Delta.
+
+    Raises
+    ------
+    ValueError
+        if Delta is not square or if x or y contain invalid indices.
+
+    """
+    return sed_indexed_pairwise([x], [y], Delta)[0, 0]
+
+def sed_indexed_pairwise(Xs, Ys, Delta):
+    """ Computes the sequence edit distances between all pairs of sequences
+    of symbol indices in Xs and Ys, given a table of symbol-wise costs Delta.
+
+    All sequences are packed into flat arrays once and all pairs are then
+    computed inside a parallel loop without the GIL, using a single row of
+    dynamic programming memory per pair.
 
     Parameters
     ----------
-    a: double
-        a number
-    b: double
-        another number
-    c: double
-        yet another number
+    Xs: list
+        a list of sequences of symbol indices in the range 0, ..., A-1 or
+        a dataset.PackedSequences object.
+    Ys: list
+        another list of sequences of symbol indices in the range 0, ..., A-1
+        or a dataset.PackedSequences object.
+    Delta: double matrix
+        an A+1 x A+1 matrix, where Delta[a, b] is the cost of replacing
+        symbol a with symbol b, Delta[a, A] is the cost of deleting a, and
+        Delta[A, b] is the cost of inserting b.
 
     Returns
     -------
-    min3: double
-        min({a, b, c})
+    D: array_like
+        a len(Xs) x len(Ys) matrix of sequence edit distances.
+
+    Raises
+    ------
+    ValueError
+        if Delta is not square or if Xs or Ys contain invalid indices.
 
     """
-    if(a < b):
-        if(a < c):
-            return a
-        else:
-            return c
-    else:
-        if(b < c):
-            return b
-        else:
-            return c
+    Delta = np.asarray(Delta, dtype=float)
+    if Delta.ndim != 2 or Delta.shape[0] != Delta.shape[1]:
+        raise ValueError('Expected a square symbol cost table, but got shape %s' % str(Delta.shape))
+    x_values, x_offsets = _pack_indices(Xs)
+    y_values, y_offsets = _pack_indices(Ys)
+    return sed_indexed_packed(x_values, x_offsets, y_values, y_offsets, Delta)
+
+def sed_indexed_pairwise_symmetric(Xs, Delta):
+    """ Computes the sequence edit distances between all pairs of sequences
+    of symbol indices in Xs, assuming that Delta is symmetric and zero on
+    the diagonal, such that the distance is symmetric as well. Due to
+    symmetry, only the pairs above the diagonal are computed, which is about
+    double as fast compared to sed_indexed_pairwise(Xs, Xs, Delta).
+
+    Parameters
+    ----------
+    Xs: list
+        a list of sequences of symbol indices in the range 0, ..., A-1 or
+        a dataset.PackedSequences object.
+    Delta: double matrix
+        a symmetric A+1 x A+1 matrix, where Delta[a, b] is the cost of
+        replacing symbol a with symbol b, Delta[a, A] is the cost of
+        deleting a, and Delta[A, b] is the cost of inserting b.
+
+    Returns
+    -------
+    D: array_like
+        a symmetric len(Xs) x len(Xs) matrix of sequence edit distances with
+        zeros on the diagonal.
+
+    Raises
+    ------
+    ValueError
+        if Delta is not square or if Xs contains invalid indices.
+
+    """
+    Delta = np.asarray(Delta, dtype=float)
+    if Delta.ndim != 2 or Delta.shape[0] != Delta.shape[1]:
+        raise ValueError('Expected a square symbol cost table, but got shape %s' % str(Delta.shape))
+    x_values, x_offsets = _pack_indices(Xs)
+    x_values, x_offsets = _check_packed(x_values, x_offsets, Delta.shape[0] - 1)
+    cdef int K = len(x_offsets) - 1
+    D = np.zeros((K, K))
+    if K < 2:
+        return D
+    cdef const int[:] x_view = x_values
+    cdef const long long[:] x_off_view = x_offsets
+    cdef const double[:,:] Delta_view = Delta
+    cdef double[:,:] D_view = D
+    cdef int max_n = np.max(np.diff(x_offsets))
+    cdef int i
+    cdef int j
+    cdef double* row
+    cdef int failed = 0
+    with nogil, parallel():
+        row = <double*> malloc((max_n + 1) * sizeof(double))
+        # the rows get shorter with increasing i, such that we balance the
+        # load dynamically
+        for i in prange(K - 1, schedule='dynamic'):
+            if row == NULL:
+                failed += 1
+                continue
+            for j in range(i + 1, K):
+                D_view[i, j] = sed_indexed_c(
+                    x_view[x_off_view[i]:x_off_view[i + 1]],
+                    x_view[x_off_view[j]:x_off_view[j + 1]],
+                    Delta_view, row)
+                D_view[j, i] = D_view[i, j]
+        free(row)
+    if failed > 0:
+        raise MemoryError('Could not allocate the dynamic programming row')
+    return D
+
+def sed_indexed_packed(x_values, x_offsets, y_values, y_offsets, Delta):
+    """ Computes the sequence edit distances between all pairs of packed
+    sequences of symbol indices, given a table of symbol-wise costs Delta.
+
+    A packed list of sequences consists of a flat array of all symbol
+    indices and an offset array, such that the kth sequence is
+    values[offsets[k]:offsets[k+1]], as returned by bedl.encode_data.
+    All pairs are computed inside a parallel loop without the GIL, using a
+    single row of dynamic programming memory per pair.
+
+    Parameters
+    ----------
+    x_values: int array
+        the concatenated symbol indices of the first list of sequences, in
+        the range 0, ..., A-1.
+    x_offsets: int array
+        a K+1 element array of offsets into x_values.
+    y_values: int array
+        the concatenated symbol indices of the second list of sequences, in
+        the range 0, ..., A-1.
+    y_offsets: int array
+        a L+1 element array of offsets into y_values.
+    Delta: double matrix
+        an A+1 x A+1 matrix, where Delta[a, b] is the cost of replacing
+        symbol a with symbol b, Delta[a, A] is the cost of deleting a, and
+        Delta[A, b] is the cost of inserting b.
+
+    Returns
+    -------
+    D: array_like
+        a K x L matrix of sequence edit distances.
+
+    Raises
+    ------
+    ValueError
+        if Delta is not square or if the values contain invalid indices.
+
+    """
+    Delta = np.asarray(Delta, dtype=float)
+    if Delta.ndim != 2 or Delta.shape[0] != Delta.shape[1]:
+        raise ValueError('Expected a square symbol cost table, but got shape %s' % str(Delta.shape))
+    x_values, x_offsets = _check_packed(x_values, x_offsets, Delta.shape[0] - 1)
+    y_values, y_offsets = _check_packed(y_values, y_offsets, Delta.shape[0] - 1)
+    cdef int K = len(x_offsets) - 1
+    cdef int L = len(y_offsets) - 1
+    D = np.zeros((K, L))
+    if K == 0 or L == 0:
+        return D
+    cdef const int[:] x_view = x_values
+    cdef const long long[:] x_off_view = x_offsets
+    cdef const int[:] y_view = y_values
+    cdef const long long[:] y_off_view = y_offsets
+    cdef const double[:,:] Delta_view = Delta
+    cdef double[:,:] D_view = D
+    cdef int max_n = np.max(np.diff(y_offsets))
+    cdef int p
+    cdef double* row
+    cdef int failed = 0
+    with nogil, parallel():
+        row = <double*> malloc((max_n + 1) * sizeof(double))
+        for p in prange(K * L):
+            if row == NULL:
+                failed += 1
+            else:
+                D_view[p // L, p % L] = sed_indexed_c(
+                    x_view[x_off_view[p // L]:x_off_view[p // L + 1]],
+                    y_view[y_off_view[p % L]:y_off_view[p % L + 1]],
+                    Delta_view, row)
+        free(row)
+    if failed > 0:
+        raise MemoryError('Could not allocate the dynamic programming row')
+    return D
+
+def _pack_indices(Xs):
+    """ Packs a list of index sequences into a flat int32 array and an int64
+    offset array. Already packed inputs, e.g. dataset.PackedSequences, are
+    returned as is.
+    """
+    if hasattr(Xs, 'values') and hasattr(Xs, 'offsets'):
+        return Xs.values, Xs.offsets
+    offsets = np.zeros(len(Xs) + 1, dtype=np.int64)
+    for k in range(len(Xs)):
+        offsets[k+1] = offsets[k] + len(Xs[k])
+    if offsets[-1] == 0:
+        return np.zeros(0, dtype=np.int32), offsets
+    values = np.concatenate([np.asarray(x, dtype=np.int32).ravel() for x in Xs])
+    return values, offsets
+
+def _check_packed(values, offsets, int A):
+    """ Converts a packed list of index sequences to contiguous int32/int64
+    arrays and verifies that all indices are in the range 0, ..., A-1.
+    """
+    values = np.ascontiguousarray(values, dtype=np.int32)
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    if len(offsets) == 0 or offsets[0] < 0 or offsets[-1] > len(values) or np.any(np.diff(offsets) < 0):
+        raise ValueError('Offsets must be non-decreasing and within the value array')
+    if len(values) > 0 and (np.min(values) < 0 or np.max(values) >= A):
+        raise ValueError('Symbol indices must be in the range 0, ..., %d' % (A - 1))
+    return values, offsets
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double sed_indexed_c(const int[:] x, const int[:] y, const double[:,:] Delta, double* row) noexcept nogil:
+    """ Computes the sequence edit distance between two index sequences
+    with a symbol cost table Delta, using a single row of memory.
+
+    Arguments
+    ---------
+    x: int array
+        a m-element sequence of symbol indices.
+    y: int array
+        a n-element sequence of symbol indices.
+    Delta: double matrix
+        an A+1 x A+1 symbol cost table, where index A stands for gaps.
+    row: double pointer
+        scratch memory for at least n+1 doubles.
+
+    Returns
+    -------
+    d: double
+        the sequence edit distance between x and y.
+
+    """
+    cdef int m = x.shape[0]
+    cdef int n = y.shape[0]
+    cdef int A = Delta.shape[0] - 1
+    cdef int i
+    cdef int j
+    cdef double diag
+    cdef double below
+    # initialize the last row D[m, :]
+    row[n] = 0.
+    for j in range(n-1,-1,-1):
+        row[j] = Delta[A, y[j]] + row[j+1]
+    # compute the remaining rows backwards, where row[j] contains D[i+1, j]
+    # before and D[i, j] after the update
+    for i in range(m-1,-1,-1):
+        diag = row[n]
+        row[n] = Delta[x[i], A] + row[n]
+        for j in range(n-1,-1,-1):
+            below = row[j]
+            row[j] = min3(Delta[x[i], y[j]] + diag,
+                          Delta[x[i], A] + below,
+                          Delta[A, y[j]] + row[j+1])
+            diag = below
+    return row[0]
 
 #########################
 # Backtracing Functions #
@@ -509,7 +856,7 @@ def sed_backtrace_matrix(x, y, delta = None):
 # Standard Edit Distance with Kronecker Delta #
 ###############################################
 
-def standard_sed(x, y):
+def standard_sed(x, y, cutoff = None, dtype = np.int64):
     """ Computes the standard sequence edit distance/Levenshtein distance
     between the input sequence x and the input sequence y.
 
@@ -519,37 +866,129 @@ def standard_sed(x, y):
         a sequence of objects.
     y: list
         another sequence of objects.
+    cutoff: float (default = None)
+        if given, we return infinity as soon as the edit distance provably
+        exceeds cutoff; see sed.
+    dtype: numpy dtype (default = np.int64)
+        the integer precision of the dynamic programming matrix, either
+        np.int64, np.int32, or np.int16. Smaller types reduce the memory
+        traffic, but the distance, which is at most len(x) + len(y), has to
+        fit into the type.
 
     Returns
     -------
     d: int
-        the standard sequence edit distance between x and y.
+        the standard sequence edit distance between x and y or infinity if
+        it exceeds cutoff.
 
     """
-    _, D = _standard_sed(x, y)
-    return D[0, 0]
+    dtype = check_dtype(dtype, INT_DTYPES, len(x) + len(y))
+    x_labels, y_labels = encode_labels(x, y)
+    D = np.zeros((len(x)+1,len(y)+1), dtype=dtype)
+    return _standard_sed_result(_standard_sed_labels_dp(x_labels, y_labels, D, as_cutoff(cutoff)))
 
-def _standard_sed(x, y):
+def _standard_sed_labels(x, y, dtype = np.int64):
     """ Internal function. Call standard_sed instead. """
+    x_labels, y_labels = encode_labels(x, y)
+    D = np.zeros((len(x)+1,len(y)+1), dtype=dtype)
+    _standard_sed_labels_dp(x_labels, y_labels, D)
+    return x_labels, y_labels, D
+
+def _standard_sed_labels_dp(const long long[:] x, const long long[:] y, int_t[:,:] D, double cutoff = INFINITY):
+    """ Calls standard_sed_labels_c in the precision of the given array. """
+    return standard_sed_labels_c(x, y, D, cutoff)
+
+def encode_labels(x, y):
+    """ Encodes the elements of two sequences as integer labels, such that
+    x[i] and y[j] receive the same label if and only if x[i] == y[j].
+
+    Unit-cost kernels can then compare labels inline instead of reading a
+    m x n matrix of Kronecker distances. Strings are encoded by their
+    unicode code points, all other elements via a dictionary. Elements
+    which are not hashable are compared to one representative per label.
+
+    Parameters
+    ----------
+    x: list
+        a sequence of objects.
+    y: list
+        another sequence of objects.
+
+    Returns
+    -------
+    x_labels: int array
+        the labels of the elements of x.
+    y_labels: int array
+        the labels of the elements of y.
+
+    """
+    if isinstance(x, str) and isinstance(y, str):
+        return _code_points(x), _code_points(y)
+    idx = {}
+    unhashable = []
+    x_labels = np.array([_label(e, idx, unhashable) for e in x], dtype=np.int64)
+    y_labels = np.array([_label(e, idx, unhashable) for e in y], dtype=np.int64)
+    return x_labels, y_labels
+
+def _code_points(str x):
+    """ Returns the unicode code points of the given string. """
+    return np.frombuffer(x.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+
+def _label(e, idx, unhashable):
+    """ Returns the label of element e and registers a new label if e is
+    not equal to any element seen so far. """
+    try:
+        return idx.setdefault(e, len(idx) + len(unhashable))
+    except TypeError:
+        for label, other in unhashable:
+            if other == e:
+                return label
+        label = len(idx) + len(unhashable)
+        unhashable.append((label, e))
+        return label
+
+def _standard_sed(x, y, dtype = np.int64):
+    """ Computes the standard sequence edit distance via a matrix of
+    Kronecker distances. Kept for compatibility; standard_sed compares
+    integer labels instead. """
+    Delta = _standard_sed_costs(x, y, dtype)
+    # Then, compute the sequence edit distance
+    D = np.zeros((len(x)+1,len(y)+1), dtype=dtype)
+    _standard_sed_dp(Delta, D)
+    return Delta, D
+
+def _standard_sed_dp(const int_t[:,:] Delta, int_t[:,:] D, double cutoff = INFINITY):
+    """ Calls standard_sed_c in the precision of the given arrays. """
+    return standard_sed_c(Delta, D, cutoff)
+
+def _standard_sed_result(long long d):
+    """ Returns the given standard edit distance or infinity if it is
+    negative, i.e. if standard_sed_c abandoned the computation. """
+    if d < 0:
+        return INFINITY
+    return d
+
+def _standard_sed_costs(x, y, dtype = np.int64):
+    """ Computes the Kronecker distances between all elements of x and y.
+    """
     cdef int m = len(x)
     cdef int n = len(y)
     # First, compute all pairwise replacements
-    Delta = np.zeros((m, n), dtype=int)
-    cdef long long[:,:] Delta_view = Delta
+    Delta = np.zeros((m, n), dtype=dtype)
+    _kronecker_costs(x, y, Delta)
+    return Delta
+
+def _kronecker_costs(x, y, int_t[:,:] Delta):
+    """ Sets Delta[i, j] to one wherever x[i] != y[j]. """
     cdef int i
     cdef int j
-    for i in range(m):
-        for j in range(n):
+    for i in range(Delta.shape[0]):
+        for j in range(Delta.shape[1]):
             if(x[i] != y[j]):
-                Delta_view[i, j] = 1
-
-    # Then, compute the sequence edit distance
-    D = np.zeros((m+1,n+1), dtype=int)
-    standard_sed_c(Delta, D)
-    return Delta, D
+                Delta[i, j] = 1
 
 @cython.boundscheck(False)
-def sed_string(str x, str y):
+def sed_string(str x, str y, cutoff = None, dtype = np.int64):
     """ Computes the standard sequence edit distance/Levenshtein distance
     between two input strings x and y, using the Kronecker distance as
     element-wise distance measure.
@@ -560,50 +999,57 @@ def sed_string(str x, str y):
         a string.
     y: str
         another string.
+    cutoff: float (default = None)
+        if given, we return infinity as soon as the edit distance provably
+        exceeds cutoff; see sed.
+    dtype: numpy dtype (default = np.int64)
+        the integer precision of the dynamic programming matrix; see
+        standard_sed.
 
     Returns
     -------
     d: int
-        the standard sequence edit distance between x and y.
+        the standard sequence edit distance between x and y or infinity if
+        it exceeds cutoff.
 
     """
     cdef int m = len(x)
     cdef int n = len(y)
-    # First, compute all pairwise replacements
-    Delta = np.zeros((m, n), dtype=int)
-    cdef long long[:,:] Delta_view = Delta
-    cdef int i
-    cdef int j
-    for i in prange(m, nogil=True):
-        for j in prange(n):
-            if(x[i] != y[j]):
-                Delta_view[i, j] = 1
-
-    # Then, compute the standard sequence edit distance
-    D = np.zeros((m+1,n+1), dtype=int)
-    standard_sed_c(Delta, D)
-    return D[0,0]
+    dtype = check_dtype(dtype, INT_DTYPES, m + n)
+    # compare the code points of both strings inline while computing the
+    # standard sequence edit distance
+    D = np.zeros((m+1,n+1), dtype=dtype)
+    return _standard_sed_result(_standard_sed_labels_dp(_code_points(x), _code_points(y), D, as_cutoff(cutoff)))
 
 @cython.boundscheck(False)
-cdef void standard_sed_c(const long long[:,:] Delta, long long[:,:] D) noexcept nogil:
+cdef long long standard_sed_c(const int_t[:,:] Delta, int_t[:,:] D, double cutoff = INFINITY) noexcept nogil:
     """ Computes the standard sequence edit distance between two input sequences
     with pairwise element distances Delta and an (empty) dynamic programming
     matrix D.
 
     Parameters
     ----------
-    Delta: long long matrix
+    Delta: short, int, or long long matrix
         a m x n matrix containing the pairwise element distances.
-    D: long long matrix
+    D: short, int, or long long matrix
         another m x n matrix to which the output will be written.
         The sequence edit distance will be in cell [0, 0] after the computation
         is finished.
+    cutoff: double (default = infinity)
+        we abandon the computation as soon as the minimum over row i of
+        D[i, j] + |i - j| exceeds cutoff; see sed_c.
+
+    Returns
+    -------
+    d: long long
+        the standard sequence edit distance or -1 if it exceeds cutoff.
 
     """
     cdef int m = Delta.shape[0]
     cdef int n = Delta.shape[1]
     cdef int i
     cdef int j
+    cdef long long bound
     # initialize last entry
     D[m, n] = 0
     # compute last column
@@ -612,41 +1058,82 @@ cdef void standard_sed_c(const long long[:,:] Delta, long long[:,:] D) noexcept
     # compute last row
     for j in range(n-1,-1,-1):
         D[m,j] = 1 + D[m,j+1]
+    if abs(m - n) > cutoff:
+        return -1
     # compute remaining matrix
     for i in range(m-1,-1,-1):
+        bound = D[i,n] + abs(n - i)
         for j in range(n-1,-1,-1):
             D[i,j] = min3_int(Delta[i,j] + D[i+1,j+1],
                           1 + D[i+1, j],
                           1 + D[i, j+1])
+            if D[i,j] + abs(j - i) < bound:
+                bound = D[i,j] + abs(j - i)
+        if bound > cutoff:
+            return -1
+    if D[0,0] > cutoff:
+        return -1
+    return D[0,0]
 
-cdef long long min3_int(long long a, long long b, long long c) nogil:
-    """ Computes the minimum of three numbers.
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef long long standard_sed_labels_c(const long long[:] x, const long long[:] y, int_t[:,:] D, double cutoff = INFINITY) noexcept nogil:
+    """ Computes the standard sequence edit distance between two input
+    sequences of integer labels x and y like standard_sed_c, but compares
+    the labels inline instead of reading a m x n matrix of Kronecker
+    distances.
 
     Parameters
     ----------
-    a: int
-        a number
-    b: int
-        another number
-    c: int
-        yet another number
+    x: long long array
+        the labels of the first sequence (length m).
+    y: long long array
+        the labels of the second sequence (length n).
+    D: short, int, or long long matrix
+        an (m+1) x (n+1) matrix to which the output will be written.
+        The sequence edit distance will be in cell [0, 0] after the
+        computation is finished.
+    cutoff: double (default = infinity)
+        we abandon the computation as soon as the minimum over row i of
+        D[i, j] + |i - j| exceeds cutoff; see sed_c.
 
     Returns
     -------
-    min3: int
-        min({a, b, c})
+    d: long long
+        the standard sequence edit distance or -1 if it exceeds cutoff.
 
     """
-    if(a < b):
-        if(a < c):
-            return a
-        else:
-            return c
-    else:
-        if(b < c):
-            return b
-        else:
-            return c
+    cdef int m = x.shape[0]
+    cdef int n = y.shape[0]
+    cdef int i
+    cdef int j
+    cdef long long x_i
+    cdef long long bound
+    # initialize last entry
+    D[m, n] = 0
+    # compute last column
+    for i in range(m-1,-1,-1):
+        D[i,n] = 1 + D[i+1,n]
+    # compute last row
+    for j in range(n-1,-1,-1):
+        D[m,j] = 1 + D[m,j+1]
+    if abs(m - n) > cutoff:
+        return -1
+    # compute remaining matrix
+    for i in range(m-1,-1,-1):
+        x_i = x[i]
+        bound = D[i,n] + abs(n - i)
+        for j in range(n-1,-1,-1):
+            D[i,j] = min3_int((x_i != y[j]) + D[i+1,j+1],
+                          1 + D[i+1, j],
+                          1 + D[i, j+1])
+            if D[i,j] + abs(j - i) < bound:
+                bound = D[i,j] + abs(j - i)
+        if bound > cutoff:
+            return -1
+    if D[0,0] > cutoff:
+        return -1
+    return D[0,0]
 
 #########################
 # Backtracing Functions #
@@ -674,8 +1161,9 @@ def standard_sed_backtrace(x, y):
     cdef int m = len(x)
     cdef int n = len(y)
     # Compute the standard edit distance first
-    Delta, D = _standard_sed(x, y)
-    cdef long long[:,:] Delta_view = Delta
+    x_labels, y_labels, D = _standard_sed_labels(x, y)
+    cdef long long[:] x_view = x_labels
+    cdef long long[:] y_view = y_labels
     cdef long long[:,:] D_view = D
 
     # Then, compute the backtrace
@@ -684,7 +1172,7 @@ def standard_sed_backtrace(x, y):
     alignment = Alignment()
     while(i < m and j < n):
         # check which alignment option is co-optimal
-        if(D_view[i,j] == Delta_view[i,j] + D_view[i+1,j+1]):
+        if(D_view[i,j] == (x_view[i] != y_view[j]) + D_view[i+1,j+1]):
             # replacement is co-optimal
             alignment.append_tuple(i, j)
             i += 1
@@ -738,8 +1226,9 @@ def standard_sed_backtrace_stochastic(x, y):
     cdef int m = len(x)
     cdef int n = len(y)
     # Compute the standard edit distance first
-    Delta, D = _standard_sed(x, y)
-    cdef long long[:,:] Delta_view = Delta
+    x_labels, y_labels, D = _standard_sed_labels(x, y)
+    cdef long long[:] x_view = x_labels
+    cdef long long[:] y_view = y_labels
     cdef long long[:,:] D_view = D
 
     # Then, compute the backtrace
@@ -748,7 +1237,7 @@ def standard_sed_backtrace_stochastic(x, y):
     alignment = Alignment()
     while(i < m and j < n):
         # check which alignment option is co-optimal
-        if(D_view[i,j] == Delta_view[i,j] + D_view[i+1,j+1]):
+        if(D_view[i,j] == (x_view[i] != y_view[j]) + D_view[i+1,j+1]):
             if(D_view[i,j] == 1 + D_view[i+1,j]):
                 if(D_view[i,j] == 1 + D_view[i,j+1]):
                     # replacement, deletion, and insertion is co-optimal
@@ -848,8 +1337,9 @@ def standard_sed_backtrace_matrix(x, y):
     cdef int m = len(x)
     cdef int n = len(y)
     # Compute the standard edit distance first
-    Delta, D = _standard_sed(x, y)
-    cdef long long[:,:] Delta_view = Delta
+    x_labels, y_labels, D = _standard_sed_labels(x, y)
+    cdef long long[:] x_view = x_labels
+    cdef long long[:] y_view = y_labels
     cdef long long[:,:] D_view = D
 
     # compute the forward matrix Alpha, which contains the number of
@@ -886,7 +1376,7 @@ def standard_sed_backtrace_matrix(x, y):
             continue
         found_coopt = False
         # check which alignment option is co-optimal
-        if(D_view[i,j] == Delta_view[i,j] + D_view[i+1,j+1]):
+        if(D_view[i,j] == (x_view[i] != y_view[j]) + D_view[i+1,j+1]):
             # replacement is co-optimal
             Alpha_view[i+1, j+1] += k
             heapq.heappush(q, (i+1, j+1))
@@ -924,7 +1414,7 @@ def standard_sed_backtrace_matrix(x, y):
             continue
         found_coopt = False
         # check which alignment option is co-optimal
-        if(D_view[i-1,j-1] == Delta_view[i-1,j-1] + D_view[i,j]):
+        if(D_view[i-1,j-1] == (x_view[i-1] != y_view[j-1]) + D_view[i,j]):
             # replacement is co-optimal
             Beta_view[i-1, j-1] += k
             found_coopt = True
@@ -950,7 +1440,7 @@ def standard_sed_backtrace_matrix(x, y):
         if(i == m or j == n):
             continue
         # check if replacement is co-optimal
-        if(D_view[i,j] == Delta_view[i,j] + D_view[i+1,j+1]):
+        if(D_view[i,j] == (x_view[i] != y_view[j]) + D_view[i+1,j+1]):
             K_view[i, j] = Alpha_view[i, j] * Beta_view[i+1, j+1]
 
     # compute the final summary matrix by dividing K by the overall number
@@ -964,3 +1454,191 @@ def standard_sed_backtrace_matrix(x, y):
 
     return P, K, k
 
+#############################
+# Subsequence Edit Distance #
+#############################
+
+def sed_subsequence(x, y, delta = None):
+    """ Finds the subsequence y[start:end] of a long sequence y which has
+    the smallest sequence edit distance to the query x, i.e. all of x has to
+    be edited but elements of y before start and after end are ignored
+    (Sellers, 1980).
+
+    We compute the dynamic programming matrix column by column over y,
+    where we only store the current column of costs and, for every entry,
+    the start of the best alignment ending there. This takes
+    O(len(x) * len(y)) time but only O(len(x)) memory. Refer to
+    sed_subsequence_stream for a variant which processes y in chunks.
+
+    Parameters
+    ----------
+    x: list
+        the query sequence of objects.
+    y: list
+        the long sequence of objects.
+    delta: function (default = None)
+        a function that takes an element of x as first and an element of y
+        as second input and returns the distance between them. If None, we
+        use a cost of 1 for each replacement, deletion, and insertion.
+
+    Returns
+    -------
+    d: float
+        the sequence edit distance between x and y[start:end].
+    start: int
+        the start of the best matching window in y.
+    end: int
+        the end of the best matching window in y (exclusive).
+
+    """
+    D, S = _sed_subsequence_init(x, delta)
+    # the empty window at the start of y matches if x is cheapest deleted
+    best = (D[len(x)], 0, 0)
+    for match in _sed_subsequence_stream(x, [y], delta, D, S):
+        if match[0] < best[0]:
+            best = match
+    return best
+
+def sed_subsequence_stream(x, chunks, delta = None):
+    """ Searches the query x in a stream of chunks, e.g. a generator of
+    sequences, according to sed_subsequence. The state between chunks only
+    consists of O(len(x)) numbers, such that this function can run
+    continuously over incoming data.
+
+    Parameters
+    ----------
+    x: list
+        the query sequence of objects.
+    chunks: iterable
+        an iterable of sequences of objects, which form the stream if
+        concatenated.
+    delta: function (default = None)
+        the element-wise distance; see sed_subsequence.
+
+    Yields
+    ------
+    d: float
+        after every chunk, the smallest sequence edit distance between x
+        and a window of the stream which ends inside this chunk, or
+        infinity if the chunk is empty.
+    start: int
+        the start of the best matching window, counted from the start of
+        the stream, or -1 if the chunk is empty.
+    end: int
+        the end of the best matching window (exclusive), counted from the
+        start of the stream, or -1 if the chunk is empty.
+
+    """
+    D, S = _sed_subsequence_init(x, delta)
+    return _sed_subsequence_stream(x, chunks, delta, D, S)
+
+def _sed_subsequence_init(x, delta):
+    """ Returns the first column of the dynamic programming matrix for
+    sed_subsequence, i.e. the costs of deleting x[:i], and the start of
+    the corresponding windows.
+    """
+    D = np.zeros(len(x) + 1)
+    np.cumsum(_sed_deletions(x, delta), out = D[1:])
+    return D, np.zeros(len(x) + 1, dtype=np.int64)
+
+def _sed_deletions(x, delta):
+    """ Returns the deletion costs for all elements of x. """
+    if delta is None:
+        return np.ones(len(x))
+    return np.array([delta(x[i], None) for i in range(len(x))], dtype=float)
+
+def _sed_subsequence_stream(x, chunks, delta, D, S):
+    """ Internal function. Call sed_subsequence_stream instead. """
+    cdef int m = len(x)
+    Delta_del = _sed_deletions(x, delta)
+    match = np.zeros(2, dtype=np.int64)
+    cdef long long offset = 0
+    cdef int i
+    cdef int j
+    cdef double[:,:] Delta_view
+    cdef double[:] Delta_ins_view
+    for chunk in chunks:
+        L = len(chunk)
+        if L == 0:
+            yield INFINITY, -1, -1
+            continue
+        # compute the replacement and insertion costs for the current chunk
+        Delta = np.zeros((m, L))
+        Delta_view = Delta
+        Delta_ins = np.ones(L)
+        Delta_ins_view = Delta_ins
+        if delta is None:
+            for i in range(m):
+                for j in range(L):
+                    if x[i] != chunk[j]:
+                        Delta_view[i, j] = 1.
+        else:
+            for i in range(m):
+                for j in range(L):
+                    Delta_view[i, j] = delta(x[i], chunk[j])
+            for j in range(L):
+                Delta_ins_view[j] = delta(None, chunk[j])
+        d = sed_subsequence_chunk_(Delta, Delta_del, Delta_ins, D, S, offset, match)
+        yield d, int(match[0]), int(match[1])
+        offset += L
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double sed_subsequence_chunk_(const double[:,:] Delta, const double[:] Delta_del,
+    const double[:] Delta_ins, double[::1] D, long long[::1] S, long long offset,
+    long long[::1] match) noexcept nogil:
+    """ Continues the subsequence edit distance computation for the next
+    chunk of the stream, given the m x L matrix Delta of replacement costs
+    between the query and the chunk, the deletion costs for the query, and
+    the insertion costs for the chunk, which starts at index offset of the
+    stream.
+
+    D[i] is the cost of the best alignment of x[:i] to a window of the
+    stream ending at the current position, and S[i] is the start of that
+    window. Both get updated in place, column by column.
+
+    Returns
+    -------
+    d: double
+        the cost of the best match ending inside the chunk. The start and
+        end of that match are written to match[0] and match[1].
+
+    """
+    cdef long long m = Delta.shape[0]
+    cdef long long i
+    cdef long long j
+    cdef double diag
+    cdef long long diag_start
+    cdef double old
+    cdef long long old_start
+    cdef double best
+    cdef long long start
+    cdef double d = INFINITY
+    for j in range(Delta.shape[1]):
+        # a window may start after every element of the stream
+        diag = D[0]
+        diag_start = S[0]
+        D[0] = 0.
+        S[0] = offset + j + 1
+        for i in range(1, m+1):
+            old = D[i]
+            old_start = S[i]
+            # choose the best option among replacement, deletion, and
+            # insertion
+            best = diag + Delta[i-1, j]
+            start = diag_start
+            if D[i-1] + Delta_del[i-1] < best:
+                best = D[i-1] + Delta_del[i-1]
+                start = S[i-1]
+            if old + Delta_ins[j] < best:
+                best = old + Delta_ins[j]
+                start = old_start
+            D[i] = best
+            S[i] = start
+            diag = old
+            diag_start = old_start
+        if D[m] < d:
+            d = D[m]
+            match[0] = S[m]
+            match[1] = offset + j + 1
+    return d
@@ -28,6 +28,7 @@ cimport cython
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 from edist.alignment import Alignment
+from edist.uted import approximate_assignment
 
 __author__ = 'Benjamin Paaßen'
 __copyright__ = 'Copyright 2019-2021, Benjamin Paaßen'
@@ -35,7 +36,7 @@ __license__ = 'GPLv3'
 __maintainer__ = 'Benjamin Paaßen'
 __email__  = 'bpaassen@techfak.uni-bielefeld.de'
 
-def seted(x, y, delta = None):
+def seted(x, y, delta = None, approx = None):
     """ Computes the set edit distance between the input set x and the input
     set y, given the element-wise distance function delta.
 
@@ -50,8 +51,8 @@ def seted(x, y, delta = None):
     for any i.
 
     This problem can be solved via the Hungarian or Munkres algorithm in
-    O([len(x) + len(y)]^3). So be advised that this method can become very slow
-    for large input sets.
+    O(len(x) * len(y) * min(len(x), len(y))). So be advised that this method
+    can become very slow for large input sets.
 
     Parameters
     ----------
@@ -63,15 +64,30 @@ def seted(x, y, delta = None):
         a function that takes an element of x as first and an element of y
         as second input and returns the distance between them. If not given,
         standard_seted is called instead.
+    approx: str (default = None)
+        if given, this function does not solve the assignment problem
+        exactly but uses a heuristic and returns an upper and a lower bound
+        for the set edit distance. 'greedy' aligns each element of x to the
+        best remaining element of y in order in O(m * n), where m = len(x)
+        and n = len(y), 'sorted' accepts replacements in order of
+        increasing cost in O(m * n * log(m * n)) due to sorting all
+        candidate pairs, and 'sinkhorn' rounds an entropy-regularized
+        assignment in O(m * n) for each of a fixed number of iterations
+        plus O(m * n * log(m * n)) for sorting the candidate pairs.
 
     Returns
     -------
     d: float
-        the set edit distance between x and y according to delta.
+        the set edit distance between x and y according to delta. If
+        approx is given, this is a tuple (upper, lower) of bounds instead,
+        where upper is the cost of an actual alignment.
 
     """
     if(delta is None):
-        return standard_seted(x, y)
+        return standard_seted(x, y, approx)
+
+    if approx is not None:
+        return _seted_bounds(_seted_costs(x, y, delta), approx)
 
     d, J = _seted(x, y, delta)
     return d
@@ -79,7 +95,13 @@ def seted(x, y, delta = None):
 def _seted(x, y, delta):
     """ Internal function, use seted instead.
     """
+    # compute the set edit distance
+    return _seted_matrix(_seted_costs(x, y, delta))
 
+def _seted_costs(x, y, delta):
+    """ Computes the (len(x) + 1) x (len(y) + 1) matrix of all
+    replacement, deletion, and insertion costs.
+    """
     cdef int m = len(x)
     cdef int n = len(y)
     # compute all replacement, deletion, and insertion costs
@@ -94,10 +116,30 @@ def _seted(x, y, delta):
         Delta_view[i, n] = delta(x[i], None)
     for j in range(n):
         Delta_view[m, j] = delta(None, y[j])
-    # compute the set edit distance
-    return _seted_matrix(Delta)
+    return Delta
+
+def _seted_bounds(Delta, approx):
+    """ Computes an upper and a lower bound for the set edit distance
+    according to the given cost matrix Delta via the given heuristic.
 
-def _seted_matrix(double[:, :] Delta):
+    Starting from deleting all elements of x and inserting all elements of
+    y, replacing x[i] with y[j] changes the cost by the reduced cost
+    Delta[i, j] - Delta[i, n] - Delta[m, j], such that the remaining
+    problem is an assignment problem on the reduced costs.
+    """
+    Delta = np.asarray(Delta)
+    m = Delta.shape[0] - 1
+    n = Delta.shape[1] - 1
+    if not _finite_gaps(Delta):
+        # the reduced costs are undefined, so we solve the problem exactly
+        d, _ = _seted_padded(Delta)
+        return d, d
+    base = np.sum(Delta[:m, n]) + np.sum(Delta[m, :n])
+    R = Delta[:m, :n] - np.expand_dims(Delta[:m, n], 1) - np.expand_dims(Delta[m, :n], 0)
+    upper, lower, pi = approximate_assignment(R, approx)
+    return base + upper, base + lower
+
+def _seted_matrix(Delta):
     """ Computes the set edit distance between the input set x and the input
     set y, given the pairwise replacement costs as well as deletion and
     insertion costs.
@@ -112,9 +154,14 @@ def _seted_matrix(double[:, :] Delta):
     any j, and j is said to be not in M if there exists no tuple (i, j) in M
     for any i.
 
-    This problem can be solved via the Hungarian or Munkres algorithm in
-    O([len(x) + len(y)]^3). So be advised that this method can become very slow
-    for large input sets.
+    Starting from deleting all elements of x and inserting all elements of
+    y, replacing x[i] with y[j] changes the cost by the reduced cost
+    Delta[i, j] - Delta[i, n] - Delta[m, j]. Only negative reduced costs can
+    help, such that we solve the rectangular m x n assignment problem on
+    the reduced costs clamped at zero via the Hungarian algorithm in
+    O(m * n * min(m, n)), which avoids the (m + n) x (m + n) matrix of the
+    classic reduction. If some deletion or insertion cost is infinite, the
+    reduced costs are undefined and we fall back to the classic reduction.
 
     Parameters
     ----------
@@ -132,6 +179,46 @@ def _seted_matrix(double[:, :] Delta):
         is deleted. Inversely, if some index j is not contained in J, it is
         inserted.
 
+    """
+    Delta = np.asarray(Delta)
+    if not _finite_gaps(Delta):
+        return _seted_padded(Delta)
+    # retrieve
+    cdef int m = Delta.shape[0] - 1
+    cdef int n = Delta.shape[1] - 1
+    # per default, we delete every i and insert every j, i.e. we map i to
+    # n + i and m + j to j
+    J = np.concatenate((n + np.arange(m), np.arange(n)))
+    costs = np.concatenate((Delta[:m, n], Delta[m, :n]))
+    if m > 0 and n > 0:
+        # compute the reduced costs, clamped at zero
+        R = np.minimum(Delta[:m, :n] - np.expand_dims(Delta[:m, n], 1) - np.expand_dims(Delta[m, :n], 0), 0.)
+        # apply the Hungarian algorithm to the rectangular problem
+        I, L = linear_sum_assignment(R)
+        # replace wherever this saves costs
+        rep = R[I, L] < 0.
+        I = I[rep]
+        L = L[rep]
+        J[I] = L
+        J[m + L] = n + I
+        costs[I] = Delta[I, L]
+        costs[m + L] = 0.
+    # and recover the edit distance
+    d = np.sum(costs)
+    return d, J
+
+def _finite_gaps(Delta):
+    """ Returns True if all deletion and insertion costs in the given
+    m + 1 x n + 1 cost matrix are finite.
+    """
+    m = Delta.shape[0] - 1
+    n = Delta.shape[1] - 1
+    return np.all(np.isfinite(Delta[:m, n])) and np.all(np.isfinite(Delta[m, :n]))
+
+def _seted_padded(double[:, :] Delta):
+    """ Computes the set edit distance like _seted_matrix, but via the
+    (m + n) x (m + n) cost matrix of the classic reduction, which also
+    supports infinite deletion and insertion costs.
     """
     # retrieve
     cdef int m = Delta.shape[0] - 1
@@ -221,7 +308,7 @@ def _to_alignment(long long[:] J, int m, int n):
             alignment.append_tuple(-1, j)
     return alignment
 
-def standard_seted(x, y):
+def standard_seted(x, y, approx = None):
     """ Computes the standard set edit distance between the input set x and
     the input set y according to the Kronecker distance, i.e. the replacement
     cost is zero if two elements are equal and one otherwise.
@@ -237,8 +324,8 @@ def standard_seted(x, y):
     for any i.
 
     This problem can be solved via the Hungarian or Munkres algorithm in
-    O([len(x) + len(y)]^3). So be advised that this method can become very slow
-    for large input sets.
+    O(len(x) * len(y) * min(len(x), len(y))). So be advised that this method
+    can become very slow for large input sets.
 
     Parameters
     ----------
@@ -246,19 +333,31 @@ def standard_seted(x, y):
         a set of objects.
     y: list-like
         another set of objects.
+    approx: str (default = None)
+        if given, this function returns an upper and a lower bound for the
+        set edit distance via the given heuristic instead; see seted.
 
     Returns
     -------
     d: float
-        the set edit distance between x and y according to delta.
+        the set edit distance between x and y according to delta. If
+        approx is given, this is a tuple (upper, lower) of bounds instead.
 
     """
+    if approx is not None:
+        return _seted_bounds(_standard_seted_costs(x, y), approx)
     d, J = _standard_seted(x, y)
     return d
 
 def _standard_seted(x, y):
     """ Internal function, use standard_seted instead.
     """
+    return _seted_matrix(_standard_seted_costs(x, y))
+
+def _standard_seted_costs(x, y):
+    """ Computes the (len(x) + 1) x (len(y) + 1) matrix of all unit
+    replacement, deletion, and insertion costs.
+    """
 
     cdef int m = len(x)
     cdef int n = len(y)
@@ -273,7 +372,7 @@ def _standard_seted(x, y):
                 Delta_view[i, j] = 1.
     Delta_view[:, n] = 1.
     Delta_view[m, :] = 1.
-    return _seted_matrix(Delta)
+    return Delta
 
 def standard_seted_backtrace(x, y):
     """ Computes a co-optimal alignment between the two input sequences
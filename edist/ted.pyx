@@ -30,6 +30,9 @@ from libc.math cimport sqrt
 from cpython cimport bool
 cimport cython
 from edist.alignment import Alignment
+from edist._fused cimport real_t, int_t, min3, min3_int
+from edist._precision import REAL_DTYPES, INT_DTYPES, check_dtype
+from edist.sed import encode_labels
 
 __author__ = 'Benjamin Paaßen'
 __copyright__ = 'Copyright (C) 2019-2021, Benjamin Paaßen'
@@ -41,7 +44,7 @@ __email__  = 'bpaassen@techfak.uni-bielefeld.de'
 # Edit Distance with Custom Delta #
 ###################################
 
-def ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
+def ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None, dtype = np.float64):
     """ Computes the tree edit distance between the trees x and y, each
     described by a list of nodes and an adjacency list adj, where adj[i]
     is a list of indices pointing to children of node i.
@@ -65,6 +68,12 @@ def ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
         distance, where delta(x, None) should be the cost of deleting x and
         delta(None, y) should be the cost of inserting y. If undefined, this
         method calls standard_ted instead.
+    dtype: numpy dtype (default = np.float64)
+        the precision of the edit costs and the dynamic programming
+        matrices, either np.float64 or np.float32. Single precision halves
+        the memory footprint of the three (m+1) x (n+1) matrices for large
+        trees. If delta is None, np.int16, np.int32, and np.int64 are
+        supported as well; see standard_ted.
 
     Returns
     -------
@@ -73,7 +82,10 @@ def ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
 
     """
     if(delta is None):
-        return float(standard_ted(x_nodes, x_adj, y_nodes, y_adj))
+        if np.dtype(dtype).kind == 'f':
+            dtype = np.int64
+        return float(standard_ted(x_nodes, x_adj, y_nodes, y_adj, dtype))
+    dtype = check_dtype(dtype, REAL_DTYPES)
 
     if(isinstance(x_nodes, tuple)):
         x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
@@ -92,10 +104,10 @@ def ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
             d += delta(x_nodes[i], None)
         return d
     # otherwise, compute the actual tree edit distance
-    _, _, _, _, _, _, D_tree = _ted(x_nodes, x_adj, y_nodes, y_adj, delta)
-    return D_tree[0,0]
+    _, _, _, _, _, _, D_tree = _ted(x_nodes, x_adj, y_nodes, y_adj, delta, dtype)
+    return float(D_tree[0,0])
 
-def _ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
+def _ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None, dtype = np.float64):
     """ Internal function; call ted instead. """
     if(isinstance(x_nodes, tuple)):
         x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
@@ -104,34 +116,40 @@ def _ted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
     cdef int m = len(x_nodes)
     cdef int n = len(y_nodes)
     # An array to store all edit costs for replacements, deletions, and
-    # insertions
-    Delta = np.zeros((m+1, n+1))
-    cdef double[:,:] Delta_view = Delta
-    # First, compute all pairwise replacement costs
+    # insertions, which we fill row by row via a double precision buffer
+    Delta = np.zeros((m+1, n+1), dtype=dtype)
+    row = np.zeros(n+1)
+    cdef double[:] row_view = row
+    # First, compute all pairwise replacement costs and the deletion costs
     cdef int i
     cdef int j
     for i in range(m):
         for j in range(n):
-            Delta_view[i,j] = delta(x_nodes[i], y_nodes[j])
+            row_view[j] = delta(x_nodes[i], y_nodes[j])
+        row_view[n] = delta(x_nodes[i], None)
+        Delta[i, :] = row
 
-    # Then, compute the deletion and insertion costs
-    for i in range(m):
-        Delta_view[i,n] = delta(x_nodes[i], None)
+    # Then, compute the insertion costs
     for j in range(n):
-        Delta_view[m,j] = delta(None, y_nodes[j])
+        row_view[j] = delta(None, y_nodes[j])
+    row_view[n] = 0.
+    Delta[m, :] = row
 
     # Compute the keyroots and outermost right leaves for both trees.
-    x_orl = outermost_right_leaves(x_adj)
-    x_kr  = keyroots(x_orl)
-    y_orl = outermost_right_leaves(y_adj)
-    y_kr  = keyroots(y_orl)
+    x_orl, x_kr = _tree_index(x_adj)
+    y_orl, y_kr = _tree_index(y_adj)
 
     # Finally, compute the actual tree edit distance
-    D_forest = np.zeros((m+1,n+1))
-    D_tree = np.zeros((m,n))
-    _ted_c(x_orl, x_kr, y_orl, y_kr, Delta, D_forest, D_tree)
+    D_forest = np.zeros((m+1,n+1), dtype=dtype)
+    D_tree = np.zeros((m,n), dtype=dtype)
+    _ted_dp(x_orl, x_kr, y_orl, y_kr, Delta, D_forest, D_tree)
     return x_orl, x_kr, y_orl, y_kr, Delta, D_forest, D_tree
 
+def _ted_dp(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr,
+    const real_t[:,:] Delta, real_t[:,:] D, real_t[:,:] D_tree):
+    """ Calls _ted_c in the precision of the given arrays. """
+    _ted_c(x_orl, x_kr, y_orl, y_kr, Delta, D, D_tree)
+
 def extract_from_tuple_input(x, y):
     """ Assumes that both x and y are tuples and unpacks those tuples.
 
@@ -171,6 +189,16 @@ def extract_from_tuple_input(x, y):
     y_adj   = y[1]
     return x_nodes, x_adj, y_nodes, y_adj
 
+def _tree_index(adj):
+    """ Returns the outermost right leaves and the keyroots of a tree with
+    the given adjacency. If adj already provides both arrays, e.g. for
+    items of dataset.PackedTrees, we use them directly.
+    """
+    if hasattr(adj, 'orl') and hasattr(adj, 'keyroots'):
+        return adj.orl, adj.keyroots
+    orl = outermost_right_leaves(adj)
+    return orl, keyroots(orl)
+
 def outermost_right_leaves(list adj):
     """ Computes the outermost right leaves of a tree based on its adjacency
     list. The outermost right leaf of a tree is defined as recursively
@@ -288,7 +316,7 @@ def keyroots(long long[:] orl):
 
 
 @cython.boundscheck(False)
-cdef void _ted_c(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const double[:,:] Delta, double[:,:] D, double[:,:] D_tree) noexcept nogil:
+cdef void _ted_c(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const real_t[:,:] Delta, real_t[:,:] D, real_t[:,:] D_tree) noexcept nogil:
     """ This method is internal and performs the actual tree edit distance
     computation for trees x and y in pure C.
 
@@ -307,13 +335,13 @@ cdef void _ted_c(const long long[:] x_orl, const long long[:] x_kr, const long l
         the outermost right leaves for tree y (int array of length n).
     y_kr: long long array
         the keyroots for tree y in descending order (int array).
-    Delta: double matrix
+    Delta: float or double matrix
         an (m+1) x (n+1) matrix, where Delta[i,j] for i < m, j < n is the
         cost of replacing x[i] with y[j], where Delta[i,n] is the cost of
         deleting x[i], and where Delta[m,j] is the cost of inserting y[j].
-    D: double matrix
+    D: float or double matrix
         an empty (m+1) x (n+1) matrix used for temporary computations.
-    D_tree: double matrix
+    D_tree: float or double matrix
         an empty m x n matrix. After this method has run, D_tree[i,j] will
         be the tree edit distance between the subtree rooted at i and the
         subtree rooted at j.
@@ -384,35 +412,6 @@ cdef void _ted_c(const long long[:] x_orl, const long long[:] x_kr, const long l
                                  )
 
 
-cdef double min3(double a, double b, double c) nogil:
-    """ Computes the minimum of three numbers.
-
-    Parameters
-    ----------
-    a: double
-        a number
-    b: double
-        another number
-    c: double
-        yet another number
-
-    Returns
-    -------
-    min3: double
-        min({a, b, c})
-
-    """
-    if(a < b):
-        if(a < c):
-            return a
-        else:
-            return c
-    else:
-        if(b < c):
-            return b
-        else:
-            return c
-
 #########################
 # Backtracing Functions #
 #########################
@@ -864,7 +863,7 @@ def _ted_backtrace_matrix(const long long[:] x_orl, const long long[:] x_kr, con
 # Standard Edit Distance with Kronecker Delta #
 ###############################################
 
-def standard_ted(x_nodes, x_adj, y_nodes = None, y_adj = None):
+def standard_ted(x_nodes, x_adj, y_nodes = None, y_adj = None, dtype = np.int64):
     """ Computes the standard tree edit distance between the trees x and y,
     each described by a list of nodes and an adjacency list adj, where adj[i]
     is a list of indices pointing to children of node i.
@@ -893,6 +892,11 @@ def standard_ted(x_nodes, x_adj, y_nodes = None, y_adj = None):
         a list of nodes for tree y.
     y_adj: list (default = x_adj[1])
         an adjacency list for tree y.
+    dtype: numpy dtype (default = np.int64)
+        the integer type of the dynamic programming matrices, either
+        np.int64, np.int32, or np.int16. Smaller types reduce the memory
+        footprint, but we raise a ValueError if the distance, which is at
+        most len(x_nodes) + len(y_nodes), may not fit.
 
     Returns
     -------
@@ -908,47 +912,84 @@ def standard_ted(x_nodes, x_adj, y_nodes = None, y_adj = None):
     cdef int n = len(y_nodes)
     # if the left tree is empty, the standard edit distance is n, and vice
     # versa
+    dtype = check_dtype(dtype, INT_DTYPES, m + n)
     if(m == 0):
         return n
     if(n == 0):
         return m
 
-    _, _, _, _, _, _, D_tree = _standard_ted(x_nodes, x_adj, y_nodes, y_adj)
-    return D_tree[0,0]
+    _, _, _, _, _, _, _, D_tree = _standard_ted_labels(x_nodes, x_adj, y_nodes, y_adj, dtype)
+    return int(D_tree[0,0])
 
-def _standard_ted(x_nodes, x_adj, y_nodes = None, y_adj = None):
+def _standard_ted_labels(x_nodes, x_adj, y_nodes = None, y_adj = None, dtype = np.int64):
     """ Internal function; call standard_ted instead. """
     if(isinstance(x_nodes, tuple)):
         x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
 
+    # the number of nodes in both trees
+    cdef int m = len(x_nodes)
+    cdef int n = len(y_nodes)
+    # Encode the nodes as integer labels, such that the kernel can compare
+    # them inline
+    x_labels, y_labels = encode_labels(x_nodes, y_nodes)
+
+    # Compute the keyroots and outermost right leaves for both trees.
+    x_orl, x_kr = _tree_index(x_adj)
+    y_orl, y_kr = _tree_index(y_adj)
+
+    # Finally, compute the actual tree edit distance
+    D_forest = np.zeros((m+1,n+1), dtype=dtype)
+    D_tree = np.zeros((m,n), dtype=dtype)
+    _std_ted_labels_dp(x_orl, x_kr, y_orl, y_kr, x_labels, y_labels, D_forest, D_tree)
+
+    return x_orl, x_kr, y_orl, y_kr, x_labels, y_labels, D_forest, D_tree
+
+def _std_ted_labels_dp(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr,
+    const long long[:] x, const long long[:] y, int_t[:,:] D, int_t[:,:] D_tree):
+    """ Calls _std_ted_labels_c in the precision of the given arrays. """
+    _std_ted_labels_c(x_orl, x_kr, y_orl, y_kr, x, y, D, D_tree)
+
+def _standard_ted(x_nodes, x_adj, y_nodes = None, y_adj = None, dtype = np.int64):
+    """ Computes the standard tree edit distance via a matrix of Kronecker
+    distances. Kept for compatibility; standard_ted compares integer labels
+    instead. """
+    if(isinstance(x_nodes, tuple)):
+        x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
+
     # the number of nodes in both trees
     cdef int m = len(x_nodes)
     cdef int n = len(y_nodes)
     # An array to store which pairs of symbols in x and y are equal
-    Delta = np.zeros((m, n), dtype=int)
-    cdef long long[:,:] Delta_view = Delta
-    cdef int i
-    cdef int j
-    for i in range(m):
-        for j in range(n):
-            if(x_nodes[i] != y_nodes[j]):
-                Delta_view[i,j] = 1
+    Delta = np.zeros((m, n), dtype=dtype)
+    _kronecker_costs(x_nodes, y_nodes, Delta)
 
     # Compute the keyroots and outermost right leaves for both trees.
-    x_orl = outermost_right_leaves(x_adj)
-    x_kr  = keyroots(x_orl)
-    y_orl = outermost_right_leaves(y_adj)
-    y_kr  = keyroots(y_orl)
+    x_orl, x_kr = _tree_index(x_adj)
+    y_orl, y_kr = _tree_index(y_adj)
 
     # Finally, compute the actual tree edit distance
-    D_forest = np.zeros((m+1,n+1), dtype=int)
-    D_tree = np.zeros((m,n), dtype=int)
-    _std_ted_c(x_orl, x_kr, y_orl, y_kr, Delta, D_forest, D_tree)
+    D_forest = np.zeros((m+1,n+1), dtype=dtype)
+    D_tree = np.zeros((m,n), dtype=dtype)
+    _std_ted_dp(x_orl, x_kr, y_orl, y_kr, Delta, D_forest, D_tree)
 
     return x_orl, x_kr, y_orl, y_kr, Delta, D_forest, D_tree
 
+def _std_ted_dp(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr,
+    const int_t[:,:] Delta, int_t[:,:] D, int_t[:,:] D_tree):
+    """ Calls _std_ted_c in the precision of the given arrays. """
+    _std_ted_c(x_orl, x_kr, y_orl, y_kr, Delta, D, D_tree)
+
+def _kronecker_costs(x, y, int_t[:,:] Delta):
+    """ Sets Delta[i, j] to one wherever x[i] != y[j]. """
+    cdef int i
+    cdef int j
+    for i in range(Delta.shape[0]):
+        for j in range(Delta.shape[1]):
+            if(x[i] != y[j]):
+                Delta[i, j] = 1
+
 @cython.boundscheck(False)
-cdef void _std_ted_c(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const long long[:,:] Delta, long long[:,:] D, long long[:,:] D_tree) noexcept nogil:
+cdef void _std_ted_c(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const int_t[:,:] Delta, int_t[:,:] D, int_t[:,:] D_tree) noexcept nogil:
     """ This method is internal and performs the actual standard tree edit
     distance computation for trees x and y in pure C.
 
@@ -967,13 +1008,13 @@ cdef void _std_ted_c(const long long[:] x_orl, const long long[:] x_kr, const lo
         the outermost right leaves for tree y (int array of length n).
     y_kr: long long array
         the keyroots for tree y in descending order (int array).
-    Delta: long long matrix
+    Delta: short, int, or long long matrix
         an (m+1) x (n+1) matrix, where Delta[i,j] for i < m, j < n is the
         cost of replacing x[i] with y[j], where Delta[i,n] is the cost of
         deleting x[i], and where Delta[m,j] is the cost of inserting y[j].
-    D: long long matrix
+    D: short, int, or long long matrix
         an empty (m+1) x (n+1) matrix used for temporary computations.
-    D_tree: long long matrix
+    D_tree: short, int, or long long matrix
         an empty m x n matrix. After this method has run, D_tree[i,j] will
         be the tree edit distance between the subtree rooted at i and the
         subtree rooted at j.
@@ -1043,34 +1084,98 @@ cdef void _std_ted_c(const long long[:] x_orl, const long long[:] x_kr, const lo
                                       1 + D[i,j+1] # insertion
                                  )
 
-cdef long long min3_int(long long a, long long b, long long c) nogil:
-    """ Computes the minimum of three numbers.
+@cython.boundscheck(False)
+cdef void _std_ted_labels_c(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const long long[:] x, const long long[:] y, int_t[:,:] D, int_t[:,:] D_tree) noexcept nogil:
+    """ This method is internal and performs the standard tree edit
+    distance computation like _std_ted_c, but compares the integer labels
+    of the nodes inline instead of reading a m x n matrix of Kronecker
+    distances.
 
     Parameters
     ----------
-    a: int
-        a number
-    b: int
-        another number
-    c: int
-        yet another number
-
-    Returns
-    -------
-    min3: int
-        min({a, b, c})
+    x_orl: long long array
+        the outermost right leaves for tree x (int array of length m).
+    x_kr: long long array
+        the keyroots for tree x in descending order (int array).
+    y_orl: long long array
+        the outermost right leaves for tree y (int array of length n).
+    y_kr: long long array
+        the keyroots for tree y in descending order (int array).
+    x: long long array
+        the labels of the nodes of tree x (int array of length m).
+    y: long long array
+        the labels of the nodes of tree y (int array of length n).
+    D: short, int, or long long matrix
+        an empty (m+1) x (n+1) matrix used for temporary computations.
+    D_tree: short, int, or long long matrix
+        an empty m x n matrix. After this method has run, D_tree[i,j] will
+        be the tree edit distance between the subtree rooted at i and the
+        subtree rooted at j.
 
     """
-    if(a < b):
-        if(a < c):
-            return a
-        else:
-            return c
-    else:
-        if(b < c):
-            return b
-        else:
-            return c
+    # the number of nodes in both trees
+    cdef int m = len(x_orl)
+    cdef int n = len(y_orl)
+    # the number of keyroots in both trees
+    cdef int K = len(x_kr)
+    cdef int L = len(y_kr)
+
+    # set up iteration variables
+    # for the keyroots
+    cdef int k
+    cdef int l
+    # for the nodes in the subtrees rooted at the keyroots
+    cdef long long i
+    cdef long long j
+    # and temporary variables for the keyroots and the outermost right leaves
+    cdef long long i_0
+    cdef long long j_0
+    cdef long long i_max
+    cdef long long j_max
+
+    # iterate over all pairwise combinations of keyroots
+    for k in range(K):
+        for l in range(L):
+            # We consider now the subtree rooted at x_kr[k] versus the subtree
+            # rooted at y_kr[l]. The forest edit distances between these
+            # subtrees correspond exactly to the matrix block
+            # D[x_kr[k]:x_orl[x_kr[k]]+1, y_kr[l]:y_orl[y_kr[l]]+1],
+            # which we compute now.
+            i_0 = x_kr[k]
+            j_0 = y_kr[l]
+            i_max = x_orl[i_0] + 1
+            j_max = y_orl[j_0] + 1
+            # first, initialize the last entry for the current subtree
+            # computation
+            D[i_max, j_max] = 0
+            # then, initialize the last column
+            for i in range(i_max-1, i_0-1, -1):
+                D[i, j_max] = 1 + D[i+1, j_max]
+            # then, initialize the last row
+            for j in range(j_max-1, j_0-1, -1):
+                D[i_max, j] = 1 + D[i_max, j+1]
+            # finally, compute the remaining forest edit distances
+            for i in range(i_max-1, i_0-1, -1):
+                for j in range(j_max-1, j_0-1, -1):
+                    if(x_orl[i] == x_orl[i_0] and y_orl[j] == y_orl[j_0]):
+                        # if we consider a complete subtree, the forest edit
+                        # distance D[i,j] is equal to the tree edit distance
+                        # at that position and we can compute it via the
+                        # standard edit distance recurrence
+                        D[i,j] = min3_int((x[i] != y[j]) + D[i+1,j+1], # replacement
+                                      1 + D[i+1,j], # deletion
+                                      1 + D[i,j+1] # insertion
+                                 )
+                        # store the newly computed tree edit distance as well
+                        D_tree[i,j] = D[i,j]
+                    else:
+                        # if we do _not_ consider a complete subtree, replacements
+                        # are only possible between entire subtrees, which we have
+                        # to consider in recurrence
+                        D[i,j] = min3_int(D_tree[i,j] + D[x_orl[i]+1,y_orl[j]+1], # tree replacement
+                                      1 + D[i+1,j], # deletion
+                                      1 + D[i,j+1] # insertion
+                                 )
 
 #########################
 # Backtracing Functions #
@@ -1116,14 +1221,14 @@ def standard_ted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None):
     """
     if(isinstance(x_nodes, tuple)):
         x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
-    x_orl, x_kr, y_orl, y_kr, Delta, D, D_tree = _standard_ted(x_nodes, x_adj, y_nodes, y_adj)
+    x_orl, x_kr, y_orl, y_kr, x_labels, y_labels, D, D_tree = _standard_ted_labels(x_nodes, x_adj, y_nodes, y_adj)
     # initialize the alignment
     ali = Alignment()
     # start backtracing recursively
-    _standard_ted_backtrace(x_orl, y_orl, Delta, D, D_tree, ali, 0, 0)
+    _standard_ted_backtrace(x_orl, y_orl, x_labels, y_labels, D, D_tree, ali, 0, 0)
     return ali
 
-def _standard_ted_backtrace(const long long[:] x_orl, const long long[:] y_orl, const long long[:,:] Delta, long long[:,:] D, const long long[:,:] D_tree, ali, int k, int l):
+def _standard_ted_backtrace(const long long[:] x_orl, const long long[:] y_orl, const long long[:] x, const long long[:] y, long long[:,:] D, const long long[:,:] D_tree, ali, int k, int l):
     """ Internal function; call standard_ted_backtrace instead.
 
         Performs the backtracing for the subtree rooted at k in x versus the
@@ -1183,7 +1288,7 @@ def _standard_ted_backtrace(const long long[:] x_orl, const long long[:] y_orl,
         if(x_orl[i] == x_orl[k] and y_orl[j] == y_orl[l]):
             # If we are at the root of postfix-subtrees for subtree k and l,
             # we consider the standard replacement case
-            if(D[i,j] == Delta[i,j] + D[i+1,j+1]):
+            if(D[i,j] == (x[i] != y[j]) + D[i+1,j+1]):
                 # append a replacement operation, increment i and j, and
                 # continue
                 ali.append_tuple(i, j)
@@ -1195,7 +1300,7 @@ def _standard_ted_backtrace(const long long[:] x_orl, const long long[:] y_orl,
                 # Otherwise, we consider the case where we replace the entire
                 # subtree rooted at i with the entire subtree rooted at j.
                 # For this case, we call the backtracing recursively
-                _standard_ted_backtrace(x_orl, y_orl, Delta, D, D_tree, ali, i, j)
+                _standard_ted_backtrace(x_orl, y_orl, x, y, D, D_tree, ali, i, j)
                 i = x_orl[i]+1
                 j = y_orl[j]+1
                 continue
@@ -1249,7 +1354,7 @@ def standard_ted_backtrace_matrix(x_nodes, x_adj, y_nodes = None, y_adj = None):
     m = len(x_nodes)
     n = len(y_nodes)
     # compute tree edit distance first
-    x_orl, x_kr, y_orl, y_kr, Delta, D, D_tree = _standard_ted(x_nodes, x_adj, y_nodes, y_adj)
+    x_orl, x_kr, y_orl, y_kr, x_labels, y_labels, D, D_tree = _standard_ted_labels(x_nodes, x_adj, y_nodes, y_adj)
 
     # set up a dictionary to sparsely store the counting matrices for all subtrees
     Ks = {}
@@ -1257,7 +1362,7 @@ def standard_ted_backtrace_matrix(x_nodes, x_adj, y_nodes = None, y_adj = None):
     Kappa = np.zeros((m, n), dtype=int)
 
     # start the recursive backtrace computation
-    _standard_ted_backtrace_matrix(x_orl, x_kr, y_orl, y_kr, Delta, D, D_tree, Ks, Kappa, 0, 0)
+    _standard_ted_backtrace_matrix(x_orl, x_kr, y_orl, y_kr, x_labels, y_labels, D, D_tree, Ks, Kappa, 0, 0)
 
     # extract results
     K = Ks[(0,0)]
@@ -1271,7 +1376,7 @@ def standard_ted_backtrace_matrix(x_nodes, x_adj, y_nodes = None, y_adj = None):
     # return results
     return P, K, k
 
-def _standard_ted_backtrace_matrix(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const long long[:,:] Delta, long long[:,:] D, const long long[:,:] D_tree, Ks, long long[:,:] Kappa, int k, int l):
+def _standard_ted_backtrace_matrix(const long long[:] x_orl, const long long[:] x_kr, const long long[:] y_orl, const long long[:] y_kr, const long long[:] x, const long long[:] y, long long[:,:] D, const long long[:,:] D_tree, Ks, long long[:,:] Kappa, int k, int l):
     """ Internal function; call standard_ted_backtrace_matrix instead.
 
         Performs the backtracing for the subtree rooted at k in x versus the
@@ -1383,7 +1488,7 @@ def _standard_ted_backtrace_matrix(const long long[:] x_orl, const long long[:]
         if(x_orl[k+i] == x_orl[k] and y_orl[l+j] == y_orl[l]):
             # If we are at the root of postfix-subtrees for subtree k and l,
             # we consider the standard replacement case
-            if(D_kl[i,j] == Delta[k+i,l+j] + D_kl[i+1,j+1]):
+            if(D_kl[i,j] == (x[k+i] != y[l+j]) + D_kl[i+1,j+1]):
                 # replacement is co-optimal
                 Alpha_view[i+1, j+1] += num_coopts
                 heapq.heappush(q, (i+1, j+1))
@@ -1396,7 +1501,7 @@ def _standard_ted_backtrace_matrix(const long long[:] x_orl, const long long[:]
                 # subtree rooted at i with the entire subtree rooted at j.
                 # For this case, we call the backtracing recursively
                 if((k+i, l+j) not in Ks):
-                    _standard_ted_backtrace_matrix(x_orl, x_kr, y_orl, y_kr, Delta, D, D_tree, Ks, Kappa, k+i, l+j)
+                    _standard_ted_backtrace_matrix(x_orl, x_kr, y_orl, y_kr, x, y, D, D_tree, Ks, Kappa, k+i, l+j)
                 # then, we can use the number of paths during recursion,
                 # multiplied with the number of coopts we have accumulated so
                 # far
@@ -1449,7 +1554,7 @@ def _standard_ted_backtrace_matrix(const long long[:] x_orl, const long long[:]
         if(x_orl[k+i] == x_orl[k] and y_orl[l+j] == y_orl[l]):
             # If we are at the root of postfix-subtrees for subtree k and l,
             # we consider the standard replacement case
-            if(D_kl[i,j] == Delta[k+i,l+j] + D_kl[i+1,j+1]):
+            if(D_kl[i,j] == (x[k+i] != y[l+j]) + D_kl[i+1,j+1]):
                 # replacement is co-optimal
                 Beta_view[i, j] += Beta_view[i+1, j+1]
                 found_coopt = True
@@ -1482,7 +1587,7 @@ def _standard_ted_backtrace_matrix(const long long[:] x_orl, const long long[:]
             # If we are at the root of postfix-subtrees for subtree k and l
             # _or_ if replacements are as expensive as deletions plus insertions,
             # we count replacements directly
-            if(D_kl[i,j] == Delta[k+i,l+j] + D_kl[i+1,j+1]):
+            if(D_kl[i,j] == (x[k+i] != y[l+j]) + D_kl[i+1,j+1]):
                 K_view[i, j] += Alpha_view[i,j] * Beta_view[i+1,j+1]
         else:
             itar = x_orl[k+i]-k+1
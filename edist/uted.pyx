@@ -27,6 +27,8 @@ from edist.ted import extract_from_tuple_input
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 from edist.alignment import Alignment
+from libc.stdlib cimport malloc, calloc, realloc, free, qsort
+from libc.math cimport exp, log
 cimport cython
 
 __author__ = 'Benjamin Paaßen'
@@ -39,11 +41,43 @@ __email__  = 'bpaassen@techfak.uni-bielefeld.de'
 cdef extern from "math.h":
     float INFINITY
 
+# the available solvers for the assignment problems between child forests
+_SOLVERS = {'munkres' : 0, 'jv' : 1}
+cdef int _SOLVER_JV = 1
+# the maximum size m_i + n_j of child forest assignments which we solve
+# with the dense Munkres algorithm; larger ones use the sparse solver
+cdef int _DENSE_MAX_SIZE = 64
+
+# the available heuristics for approximate assignments between child forests
+_APPROX = {'greedy' : 1, 'sorted' : 2, 'sinkhorn' : 3}
+cdef int _APPROX_GREEDY = 1
+cdef int _APPROX_SORTED = 2
+cdef int _APPROX_SINKHORN = 3
+# the number of iterations and the regularization strength (relative to the
+# largest possible saving) of the Sinkhorn heuristic
+cdef int _SINKHORN_ITERATIONS = 50
+cdef double _SINKHORN_EPSILON = 0.05
+
+def _solver_index(solver):
+    """ Translates a solver name into its internal index. """
+    if solver not in _SOLVERS:
+        raise ValueError('Unknown assignment solver %s; expected one of %s' % (str(solver), str(list(_SOLVERS.keys()))))
+    return _SOLVERS[solver]
+
+def _approx_index(approx):
+    """ Translates a heuristic name into its internal index, where None
+    means that we solve all assignments exactly. """
+    if approx is None:
+        return 0
+    if approx not in _APPROX:
+        raise ValueError('Unknown approximation %s; expected one of %s' % (str(approx), str(list(_APPROX.keys()))))
+    return _APPROX[approx]
+
 ###################################
 # Edit Distance with Custom Delta #
 ###################################
 
-def uted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
+def uted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None, solver = 'munkres', approx = None):
     """ Computes the constrained, unordered tree edit distance between the
      trees x and y, each described by a list of nodes and an adjacency list
     adj, where adj[i] is a list of indices pointing to children of node i.
@@ -67,15 +101,38 @@ def uted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
         distance, where delta(x, None) should be the cost of deleting x and
         delta(None, y) should be the cost of inserting y. If undefined, this
         method uses unit costs.
+    solver: str (default = 'munkres')
+        the solver for the assignment problems between child forests with
+        more than two children on at least one side; for two children on
+        both sides, both solvers use a closed form. 'munkres' uses the
+        Munkres/Hungarian algorithm for child forests up to 64 children in
+        total and the shortest augmenting path algorithm of Jonker and
+        Volgenant (1987) beyond. 'jv' always uses the latter. Whenever the
+        latter is used, we skip the assignment if a lower bound shows that
+        it can not beat deleting or inserting all but one subtree. Both
+        solvers yield the same distance.
+    approx: str (default = None)
+        if given, the assignment problems between child forests with more
+        than two children on both sides are not solved exactly but with a
+        heuristic, and this function returns an upper and a lower bound for
+        the tree edit distance instead of the exact value. 'greedy' assigns
+        each child of x to the best remaining child of y in order,
+        'sorted' accepts replacements in order of increasing cost, and
+        'sinkhorn' rounds an entropy-regularized assignment. The lower bound
+        stems from feasible dual variables of each assignment problem.
 
     Returns
     -------
     d: float
-        the tree edit distance between x and y according to delta.
+        the tree edit distance between x and y according to delta. If
+        approx is given, this is a tuple (upper, lower) of bounds instead,
+        where upper is the cost of an actual edit script.
 
     """
     if isinstance(x_nodes, tuple):
         x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
+    solver_idx = _solver_index(solver)
+    approx_idx = _approx_index(approx)
 
     # the number of nodes in both trees
     cdef int m = len(x_nodes)
@@ -86,20 +143,19 @@ def uted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
     cdef double d = 0
     cdef int i
     cdef int j
-    if m == 0:
-        if delta is None:
-            return n
-        else:
-            for j in range(n):
-                d += delta(None, y_nodes[j])
-            return d
-    if n == 0:
+    if m == 0 or n == 0:
         if delta is None:
-            return m
-        else:
-            for i in range(m):
-                d += delta(x_nodes[i], None)
-            return d
+            # unit costs yield the integer size of the non-empty tree
+            if approx_idx > 0:
+                return m + n, m + n
+            return m + n
+        for i in range(m):
+            d += delta(x_nodes[i], None)
+        for j in range(n):
+            d += delta(None, y_nodes[j])
+        if approx_idx > 0:
+            return d, d
+        return d
 
     # Set up an array to store edit costs for replacements,
     # deletions, and insertions
@@ -122,23 +178,34 @@ def uted(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
         for j in range(n):
             Delta_view[m,j] = delta(None, y_nodes[j])
 
+    if approx_idx > 0:
+        # compute the cost of an actual edit script as upper bound and
+        # relax all assignments for the lower bound
+        D_forest, D_tree = _uted(x_nodes, x_adj, y_nodes, y_adj, Delta, solver_idx, approx_idx)
+        upper = D_tree[0,0]
+        D_forest, D_tree = _uted(x_nodes, x_adj, y_nodes, y_adj, Delta, solver_idx, approx_idx, True)
+        return upper, D_tree[0,0]
+
     # compute the actual tree edit distance
-    D_forest, D_tree = _uted(x_nodes, x_adj, y_nodes, y_adj, Delta)
+    D_forest, D_tree = _uted(x_nodes, x_adj, y_nodes, y_adj, Delta, solver_idx)
 
     return D_tree[0,0]
 
-def _uted(x_nodes, x_adj, y_nodes, y_adj, Delta):
+def _uted(x_nodes, x_adj, y_nodes, y_adj, Delta, int solver = 0, int approx = 0, bint lower = False):
     """ Internal function; call uted instead. """
     # the number of nodes in both trees
     cdef int m = len(x_nodes)
     cdef int n = len(y_nodes)
 
-    # convert adjacency lists to array form
-    A_x, deg_x = adjmat_(x_adj)
-    A_y, deg_y = adjmat_(y_adj)
+    # convert adjacency lists to compressed sparse row form
+    ch_x, ptr_x = adjcsr_(x_adj)
+    ch_y, ptr_y = adjcsr_(y_adj)
 
-    # set up temporary matrices for the munkres algorithm
-    cdef int max_deg = A_x.shape[1] + A_y.shape[1]
+    # set up temporary matrices for the munkres algorithm, which we only
+    # apply to small child forests
+    cdef int max_deg = 0
+    if solver != _SOLVER_JV and approx == 0:
+        max_deg = min(np.max(np.diff(ptr_x)) + np.max(np.diff(ptr_y)), _DENSE_MAX_SIZE)
     C = np.zeros((max_deg, max_deg))
     Stars  = np.zeros((max_deg, max_deg), dtype=np.intc)
     Primes = np.zeros((max_deg, max_deg), dtype=np.intc)
@@ -150,38 +217,48 @@ def _uted(x_nodes, x_adj, y_nodes, y_adj, Delta):
     # initialize dynamic programming matrices for forest and tree edit distance
     D_forest = np.zeros((m+1,n+1))
     D_tree = np.zeros((m+1,n+1))
-    
+
+    # scratch memory for the sparse solver, which grows as needed
+    cdef AssignmentScratch scratch
+    scratch.dbl = NULL
+    scratch.dbl_size = 0
+    scratch.ints = NULL
+    scratch.ints_size = 0
+
     # call the c routine
-    uted_c_(A_x, deg_x, A_y, deg_y, Delta, D_forest, D_tree, C, Stars, Primes, row_covers, col_covers, path, pi)
+    try:
+        uted_c_(ch_x, ptr_x, ch_y, ptr_y, Delta, D_forest, D_tree, C, Stars, Primes, row_covers, col_covers, path, pi, solver, &scratch, approx, lower)
+    finally:
+        free(scratch.dbl)
+        free(scratch.ints)
 
     return D_forest, D_tree
 
-def adjmat_(adj):
-    """ Converts an adjacency list into an int array """
+def adjcsr_(adj):
+    """ Converts an adjacency list into compressed sparse row form, i.e.
+    a child array and a pointer array, such that the children of i are
+    children[ptr[i]:ptr[i+1]]. If adj already is in this form, e.g. for
+    items of dataset.PackedTrees, we return its arrays directly.
+    """
+    if hasattr(adj, 'children') and hasattr(adj, 'ptr'):
+        return adj.children, adj.ptr
     cdef int m = len(adj)
-    degs = np.zeros(m, dtype=int)
-    cdef long long[:] deg_view = degs
+    ptr = np.zeros(m + 1, dtype=np.int64)
     cdef int i
     for i in range(m):
-        deg_view[i] = len(adj[i])
-
-    cdef long long max_deg = np.max(degs)
-    Adj = np.zeros((m, max_deg), dtype=int)
-    cdef long long[:, :] Adj_view = Adj
-
-    cdef int k
+        ptr[i+1] = ptr[i] + len(adj[i])
+    children = np.zeros(ptr[m], dtype=np.int64)
     for i in range(m):
-        for k in range(deg_view[i]):
-            Adj_view[i, k] = adj[i][k]
-
-    return Adj, degs
+        children[ptr[i]:ptr[i+1]] = adj[i]
+    return children, ptr
 
 
 @cython.boundscheck(False)
-cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long long[:,:] A_y, const long long[:] deg_y, 
+cdef int uted_c_(const long long[:] ch_x, const long long[:] ptr_x, const long long[:] ch_y, const long long[:] ptr_y,
     const double[:,:] Delta, double[:,:] D_forest, double[:,:] D_tree,
     double[:, :] C, int[:, :] Stars, int[:, :] Primes,
-    int[:] row_covers, int[:] col_covers, long long[:, :] path, long long[:] pi) noexcept nogil:
+    int[:] row_covers, int[:] col_covers, long long[:, :] path, long long[:] pi, int solver,
+    AssignmentScratch* scratch, int approx = 0, bint lower = False) except -1 nogil:
     """ This method is internal and performs the actual tree edit distance
     computation for trees x and y in pure C.
 
@@ -189,10 +266,22 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
     'A Constrained Edit Distance Between Unordered Labeled Trees'
     by Zhang (1996).
 
+    The children of each node are given in compressed sparse row form,
+    i.e. the children of node i in x are ch_x[ptr_x[i]:ptr_x[i+1]]. The
+    Munkres scratch matrices only need to fit child forests up to
+    _DENSE_MAX_SIZE; all larger assignments use the sparse solver, which
+    grows the given scratch memory as needed and raises a MemoryError if
+    it can not.
+
+    If approx > 0, all assignments beyond the closed forms use the
+    respective heuristic, such that D_tree contains the costs of actual edit
+    scripts, or, if lower is True, lower bounds for the assignment costs,
+    such that D_tree contains lower bounds for the tree edit distances.
+
     """
     # the number of nodes in both trees
-    cdef int m = A_x.shape[0]
-    cdef int n = A_y.shape[0]
+    cdef int m = ptr_x.shape[0] - 1
+    cdef int n = ptr_y.shape[0] - 1
 
     # for the nodes in x and y
     cdef int i
@@ -216,8 +305,8 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
     for i in range(m-1, -1, -1):
         # Compute the subforest deletion cost for i, i.e. the cost
         # for deleting all of i's child subtrees
-        for k in range(deg_x[i]):
-            i_k = A_x[i, k]
+        for k in range(ptr_x[i+1] - ptr_x[i]):
+            i_k = ch_x[ptr_x[i] + k]
             D_forest[i, n] += D_tree[i_k, n]
         # Deleting the tree rooted at i means deleting node i and all its
         # children
@@ -226,8 +315,8 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
     for j in range(n-1, -1, -1):
         # Compute the subforest insertion cost for j, i.e. the cost
         # for inserting all of j's child subtrees
-        for l in range(deg_y[j]):
-            j_l = A_y[j, l]
+        for l in range(ptr_y[j+1] - ptr_y[j]):
+            j_l = ch_y[ptr_y[j] + l]
             D_forest[m, j] += D_tree[m, j_l]
         # Inserting the tree rooted at j means inserting node j and all its
         # children
@@ -236,8 +325,8 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
     # now, start the actual recursion
     for i in range(m-1, -1, -1):
         for j in range(n-1, -1, -1):
-            m_i = deg_x[i]
-            n_j = deg_y[j]
+            m_i = ptr_x[i+1] - ptr_x[i]
+            n_j = ptr_y[j+1] - ptr_y[j]
             # First, we compute the forest edit distance, i.e. the cost for
             # editing all children of i into all children of j.
 
@@ -255,7 +344,7 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
                 # subtree
                 del_cost = INFINITY
                 for k in range(m_i):
-                    i_k = A_x[i, k]
+                    i_k = ch_x[ptr_x[i] + k]
                     # accordingly, we need to consider the cost of editing
                     # the children of node i_k with the children of j,
                     # plus the cost of deleting all other children of i.
@@ -266,7 +355,7 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
                 # subtree
                 ins_cost = INFINITY
                 for l in range(n_j):
-                    j_l = A_y[j, l]
+                    j_l = ch_y[ptr_y[j] + l]
                     # accordingly, we need to consider the cost of editing
                     # the children of node i to the children of j_l,
                     # plus the cost of inserting all other children of j.
@@ -284,9 +373,9 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
                     # minus the cost of inserting one child,
                     # but replacing it with i_k
                     rep_cost = INFINITY
-                    i_k = A_x[i, 0]
+                    i_k = ch_x[ptr_x[i]]
                     for l in range(n_j):
-                        j_l = A_y[j, l]
+                        j_l = ch_y[ptr_y[j] + l]
                         tmp_cost = D_tree[i_k, j_l] + D_forest[m, j] - D_tree[m, j_l]
                         if tmp_cost < rep_cost:
                             rep_cost = tmp_cost
@@ -296,21 +385,35 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
                     # minus the cost of deleting one child,
                     # but replacing it with j_k
                     rep_cost = INFINITY
-                    j_l = A_y[j, 0]
+                    j_l = ch_y[ptr_y[j]]
                     for k in range(m_i):
-                        i_k = A_x[i, k]
+                        i_k = ch_x[ptr_x[i] + k]
                         tmp_cost = D_tree[i_k, j_l] + D_forest[i, n] - D_tree[i_k, n]
                         if tmp_cost < rep_cost:
                             rep_cost = tmp_cost
+                elif m_i == 2 and n_j == 2:
+                    # for two children on both sides, we can enumerate
+                    # all assignments in closed form
+                    rep_cost = forest_assignment_2x2_(D_tree[ch_x[ptr_x[i]], ch_y[ptr_y[j]]], D_tree[ch_x[ptr_x[i]], ch_y[ptr_y[j] + 1]],
+                        D_tree[ch_x[ptr_x[i] + 1], ch_y[ptr_y[j]]], D_tree[ch_x[ptr_x[i] + 1], ch_y[ptr_y[j] + 1]],
+                        D_tree[ch_x[ptr_x[i]], n], D_tree[ch_x[ptr_x[i] + 1], n], D_tree[m, ch_y[ptr_y[j]]], D_tree[m, ch_y[ptr_y[j] + 1]])
+                elif solver == _SOLVER_JV or approx > 0 or m_i + n_j > C.shape[0]:
+                    if forest_assignment_bound_(ch_x, ptr_x, ch_y, ptr_y, D_tree, i, j) >= min3(del_cost, ins_cost, INFINITY):
+                        # if even a lower bound on the assignment cost can
+                        # not beat deletion or insertion, we skip the
+                        # assignment
+                        rep_cost = INFINITY
+                    else:
+                        rep_cost = forest_assignment_sparse_(ch_x, ptr_x, ch_y, ptr_y, D_tree, i, j, scratch, approx, lower)
                 else:
                     # if there is more than one child on both sides, we use
                     # the Munkres/Hungarian algorithm.
 
                     # prepare a cost matrix for the Hungarian algorithm
                     for k in range(m_i):
-                        i_k = A_x[i, k]
+                        i_k = ch_x[ptr_x[i] + k]
                         for l in range(n_j):
-                            j_l = A_y[j, l]
+                            j_l = ch_y[ptr_y[j] + l]
                             # matching ci with cj means editing the ci'th
                             # child of i to the cj'th child of j.
                             C[k, l] = D_tree[i_k, j_l]
@@ -318,13 +421,13 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
                     for k in range(m_i):
                         # matching c with n_j + c means deleting the
                         # c'th child of i
-                        i_k = A_x[i, k]
+                        i_k = ch_x[ptr_x[i] + k]
                         C[k, n_j + k] = D_tree[i_k, n]
                     C[m_i:m_i+n_j, :n_j] = INFINITY
                     for l in range(n_j):
                         # matching m_i + c with c means inserting the
                         # c'th child of j
-                        j_l = A_y[j, l]
+                        j_l = ch_y[ptr_y[j] + l]
                         C[m_i + l, l] = D_tree[m, j_l]
                     C[m_i:m_i+n_j, n_j:m_i+n_j] = 0.
                     # print('i = %d, j = %d' % (i, j))
@@ -338,18 +441,18 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
                     # reconstruct the cost of the assignment from pi
                     rep_cost = 0.
                     for k in range(m_i):
-                        i_k = A_x[i, k]
+                        i_k = ch_x[ptr_x[i] + k]
                         if pi[k] >= n_j:
                             # if pi[k] >= n_j, tree i_k should be deleted
                             rep_cost += D_tree[i_k, n]
                             # print('delete %d for %g' % (i_k, D_tree[i_k, n]))
                         else:
                             # otherwise we replace i_k with j_pi[k]
-                            j_l = A_y[j, pi[k]]
+                            j_l = ch_y[ptr_y[j] + pi[k]]
                             rep_cost += D_tree[i_k, j_l]
                             # print('replace %d with %d for %g' % (i_k, j_l, D_tree[i_k, j_l]))
                     for l in range(n_j):
-                        j_l = A_y[j, l]
+                        j_l = ch_y[ptr_y[j] + l]
                         if pi[m_i + l] < n_j:
                             # if pi[m_i + l] < n_j, tree j_l should be inserted
                             rep_cost += D_tree[m, j_l]
@@ -371,7 +474,7 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
             else:
                 del_cost = INFINITY
                 for k in range(m_i):
-                    i_k = A_x[i, k]
+                    i_k = ch_x[ptr_x[i] + k]
                     # accordingly, we need to consider the cost of editing
                     # tree i_k into tree j plus the cost of deleting all other
                     # children of i.
@@ -387,7 +490,7 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
             else:
                 ins_cost = INFINITY
                 for l in range(n_j):
-                    j_l = A_y[j, l]
+                    j_l = ch_y[ptr_y[j] + l]
                     # accordingly, we need to consider the cost of editing
                     # tree i into tree j_l plus the cost o inserting all other
                     # children of j.
@@ -399,6 +502,176 @@ cdef void uted_c_(const long long[:,:] A_x, const long long[:] deg_x, const long
             rep_cost = Delta[i, j] + D_forest[i, j]
             # compute minimum across deletion, insertion, and replacement
             D_tree[i, j] = min3(del_cost, ins_cost, rep_cost)
+    return 0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double forest_assignment_bound_(const long long[:] ch_x, const long long[:] ptr_x,
+    const long long[:] ch_y, const long long[:] ptr_y, const double[:,:] D_tree, int i, int j) noexcept nogil:
+    """ Computes a lower bound for the cost of optimally assigning the
+    children of i to the children of j, namely the maximum of the sum of row
+    minima and the sum of column minima of the assignment cost matrix.
+    """
+    cdef int m = D_tree.shape[0] - 1
+    cdef int n = D_tree.shape[1] - 1
+    cdef int k
+    cdef int l
+    cdef double row_bound = 0.
+    cdef double col_bound = 0.
+    cdef double h
+    for k in range(ptr_x[i+1] - ptr_x[i]):
+        h = D_tree[ch_x[ptr_x[i] + k], n]
+        for l in range(ptr_y[j+1] - ptr_y[j]):
+            if D_tree[ch_x[ptr_x[i] + k], ch_y[ptr_y[j] + l]] < h:
+                h = D_tree[ch_x[ptr_x[i] + k], ch_y[ptr_y[j] + l]]
+        row_bound += h
+    for l in range(ptr_y[j+1] - ptr_y[j]):
+        h = D_tree[m, ch_y[ptr_y[j] + l]]
+        for k in range(ptr_x[i+1] - ptr_x[i]):
+            if D_tree[ch_x[ptr_x[i] + k], ch_y[ptr_y[j] + l]] < h:
+                h = D_tree[ch_x[ptr_x[i] + k], ch_y[ptr_y[j] + l]]
+        col_bound += h
+    if row_bound > col_bound:
+        return row_bound
+    return col_bound
+
+cdef struct AssignmentScratch:
+    double* dbl
+    long long dbl_size
+    long long* ints
+    long long ints_size
+
+cdef int reserve_(AssignmentScratch* scratch, long long dbl_size, long long ints_size) except -1 nogil:
+    """ Ensures that the given scratch memory has at least the given sizes.
+    If an allocation fails, the scratch memory stays as it was, such that
+    the caller can still free it.
+    """
+    cdef double* dbl
+    cdef long long* ints
+    if dbl_size > scratch.dbl_size:
+        dbl = <double*> realloc(scratch.dbl, dbl_size * sizeof(double))
+        if dbl == NULL:
+            raise MemoryError('Could not allocate scratch memory for the assignment solver')
+        scratch.dbl = dbl
+        scratch.dbl_size = dbl_size
+    if ints_size > scratch.ints_size:
+        ints = <long long*> realloc(scratch.ints, ints_size * sizeof(long long))
+        if ints == NULL:
+            raise MemoryError('Could not allocate scratch memory for the assignment solver')
+        scratch.ints = ints
+        scratch.ints_size = ints_size
+    return 0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double forest_assignment_sparse_(const long long[:] ch_x, const long long[:] ptr_x,
+    const long long[:] ch_y, const long long[:] ptr_y, const double[:,:] D_tree, int i, int j,
+    AssignmentScratch* scratch, int approx = 0, bint lower = False) except? -1 nogil:
+    """ Computes the optimal cost of assigning the children of i to the
+    children of j without the (m_i + n_j) x (m_i + n_j) matrix of the
+    Munkres algorithm.
+
+    Starting from deleting all children of i and inserting all children of
+    j, replacing child k with child l changes the cost by the reduced cost
+    D_tree[k, l] - D_tree[k, n] - D_tree[m, l]. Only negative reduced costs
+    can help, so we restrict the problem to the children with at least one
+    negative reduced cost and solve the remaining (typically small)
+    rectangular assignment problem with reduced costs clamped at zero via
+    the Jonker-Volgenant algorithm. If approx > 0, we use the respective
+    heuristic instead or, if lower is True, a lower bound.
+    """
+    cdef int m = D_tree.shape[0] - 1
+    cdef int n = D_tree.shape[1] - 1
+    cdef long long m_i = ptr_x[i+1] - ptr_x[i]
+    cdef long long n_j = ptr_y[j+1] - ptr_y[j]
+    cdef long long k
+    cdef long long l
+    cdef long long a
+    cdef long long b
+    cdef double red
+    cdef double cost = 0.
+    # find the children with at least one negative reduced cost
+    reserve_(scratch, 0, m_i + n_j)
+    cdef long long* rows = scratch.ints
+    cdef long long* cols = scratch.ints + m_i
+    cdef long long R = 0
+    cdef long long S = 0
+    for k in range(ptr_x[i], ptr_x[i+1]):
+        cost += D_tree[ch_x[k], n]
+    for l in range(ptr_y[j], ptr_y[j+1]):
+        cost += D_tree[m, ch_y[l]]
+    for l in range(n_j):
+        cols[l] = 0
+    for k in range(m_i):
+        rows[R] = -1
+        for l in range(n_j):
+            red = D_tree[ch_x[ptr_x[i] + k], ch_y[ptr_y[j] + l]] - D_tree[ch_x[ptr_x[i] + k], n] - D_tree[m, ch_y[ptr_y[j] + l]]
+            if red < 0.:
+                rows[R] = k
+                cols[l] = 1
+        if rows[R] >= 0:
+            R += 1
+    for l in range(n_j):
+        if cols[l] > 0:
+            cols[S] = l
+            S += 1
+    if R == 0:
+        return cost
+    # set up the rectangular problem with at most as many rows as columns
+    cdef bint transpose = R > S
+    cdef long long P = S if transpose else R
+    cdef long long Q = R if transpose else S
+    reserve_(scratch, P * Q + 3 * (Q + 1), m_i + n_j + P + 3 * (Q + 1))
+    rows = scratch.ints
+    cols = scratch.ints + m_i
+    cdef double* C = scratch.dbl
+    cdef long long* pi = scratch.ints + m_i + n_j
+    for a in range(R):
+        k = rows[a]
+        for b in range(S):
+            l = cols[b]
+            red = D_tree[ch_x[ptr_x[i] + k], ch_y[ptr_y[j] + l]] - D_tree[ch_x[ptr_x[i] + k], n] - D_tree[m, ch_y[ptr_y[j] + l]]
+            if red > 0.:
+                red = 0.
+            if transpose:
+                C[b * Q + a] = red
+            else:
+                C[a * Q + b] = red
+    if approx == 0:
+        lapjv_(C, P, Q, pi, scratch.dbl + P * Q, pi + P)
+        for a in range(P):
+            cost += C[a * Q + pi[a]]
+    elif lower:
+        cost += assignment_lower_bound_(C, P, Q, approx)
+    else:
+        cost += assignment_heuristic_(C, P, Q, approx, pi)
+    return cost
+
+cdef double forest_assignment_2x2_(double rep_00, double rep_01, double rep_10, double rep_11,
+    double del_0, double del_1, double ins_0, double ins_1) noexcept nogil:
+    """ Computes the optimal cost of assigning two children to two children
+    in closed form. Starting from deleting and inserting everything, each
+    replacement (k, l) saves del_k + ins_l - rep_kl, and we pick the best
+    among no replacement, a single replacement, or two disjoint ones.
+    """
+    cdef double s_00 = del_0 + ins_0 - rep_00
+    cdef double s_01 = del_0 + ins_1 - rep_01
+    cdef double s_10 = del_1 + ins_0 - rep_10
+    cdef double s_11 = del_1 + ins_1 - rep_11
+    cdef double best = 0.
+    if s_00 > best:
+        best = s_00
+    if s_01 > best:
+        best = s_01
+    if s_10 > best:
+        best = s_10
+    if s_11 > best:
+        best = s_11
+    if s_00 + s_11 > best:
+        best = s_00 + s_11
+    if s_01 + s_10 > best:
+        best = s_01 + s_10
+    return del_0 + del_1 + ins_0 + ins_1 - best
 
 cdef double min3(double a, double b, double c) nogil:
     """ Computes the minimum of three numbers.
@@ -652,13 +925,474 @@ def munkres(C):
 
 
 
+##################################
+# Jonker-Volgenant algorithm     #
+##################################
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void lapjv_(const double* C, long long P, long long Q, long long* pi, double* work, long long* iwork) noexcept nogil:
+    """ Implements the shortest augmenting path algorithm of Jonker and
+    Volgenant (1987) to find a minimal matching for the P x Q cost matrix
+    C, stored in row-major order, where P <= Q and where C must admit a
+    matching with finite cost.
+
+    For square matrices, we warm-start the dual variables via the column
+    reduction of Jonker and Volgenant, which also assigns every row that is
+    the minimum of a column. If that covers all rows, we are done right
+    away. Otherwise, we
+    augment the remaining rows one by one along shortest paths with respect
+    to the reduced costs (via Dijkstra's algorithm).
+
+    work needs space for 3 * (Q + 1) doubles and iwork for 3 * (Q + 1)
+    integers. The final assignment is stored in pi afterwards, i.e. row i
+    is assigned to column pi[i].
+    """
+    # dual variables for rows (u) and columns (v) and the shortest path
+    # distances (minv), all 1-indexed
+    cdef double* u = work
+    cdef double* v = work + Q + 1
+    cdef double* minv = work + 2 * (Q + 1)
+    # the row assigned to each column (p), the predecessor of each column on
+    # the shortest path (way), and the visited columns (used)
+    cdef long long* p = iwork
+    cdef long long* way = iwork + Q + 1
+    cdef long long* used = iwork + 2 * (Q + 1)
+    cdef long long i
+    cdef long long j
+    cdef long long i0
+    cdef long long j0
+    cdef long long j1
+    cdef long long i_min
+    cdef double h
+    cdef double cur
+    cdef double delta
+    for j in range(Q + 1):
+        u[j] = 0.
+        v[j] = 0.
+        p[j] = 0
+    for i in range(P):
+        pi[i] = -1
+    # column reduction, which is only valid for square matrices because
+    # unassigned columns need zero dual variables
+    for j in range(1, Q + 1):
+        if P < Q:
+            break
+        h = INFINITY
+        i_min = 0
+        for i in range(1, P + 1):
+            if C[(i-1) * Q + j-1] < h:
+                h = C[(i-1) * Q + j-1]
+                i_min = i
+        v[j] = h
+        if i_min > 0 and pi[i_min-1] < 0:
+            p[j] = i_min
+            pi[i_min-1] = j - 1
+    # augment all remaining rows
+    for i in range(1, P + 1):
+        if pi[i-1] >= 0:
+            continue
+        p[0] = i
+        j0 = 0
+        for j in range(Q + 1):
+            minv[j] = INFINITY
+            used[j] = 0
+        while True:
+            used[j0] = 1
+            i0 = p[j0]
+            delta = INFINITY
+            j1 = 0
+            for j in range(1, Q + 1):
+                if used[j]:
+                    continue
+                cur = C[(i0-1) * Q + j-1] - u[i0] - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            if j1 == 0:
+                # no finite augmenting path exists
+                return
+            for j in range(Q + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # flip the augmenting path
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+        pi[i-1] = 0
+    # recover the assignment
+    for j in range(1, Q + 1):
+        if p[j] > 0:
+            pi[p[j]-1] = j - 1
+
+def lapjv(C):
+    """ This calls the Jonker-Volgenant algorithm to find a minimal
+    matching for the given cost matrix C. Note that this function is more
+    for debugging purposes. If you want to call this algorithm from Python,
+    you are better served by calling scipy.optimize.linear_sum_assignment.
+
+    Parameters
+    ----------
+    C: ndarray
+        An m x n cost matrix.
+
+    Returns
+    -------
+    pi: ndarray
+        An m-element array where pi[i] is the index to which i is
+        assigned. If m > n, unassigned rows are marked with -1.
+
+    """
+    C = np.asarray(C, dtype=float)
+    cdef bint transpose = C.shape[0] > C.shape[1]
+    if transpose:
+        C = C.T
+    C = np.ascontiguousarray(C)
+    cdef long long P = C.shape[0]
+    cdef long long Q = C.shape[1]
+    cdef double[:, ::1] C_view = C
+    pi = np.zeros(P, dtype=np.int64)
+    cdef long long[::1] pi_view = pi
+    cdef double* work = <double*> malloc(3 * (Q + 1) * sizeof(double))
+    cdef long long* iwork = <long long*> malloc(3 * (Q + 1) * sizeof(long long))
+    try:
+        if work == NULL or iwork == NULL:
+            raise MemoryError('Could not allocate the Jonker-Volgenant work arrays')
+        if P > 0:
+            lapjv_(&C_view[0, 0], P, Q, &pi_view[0], work, iwork)
+    finally:
+        free(work)
+        free(iwork)
+    if transpose:
+        # invert the assignment
+        pi_inv = np.full(Q, -1, dtype=np.int64)
+        pi_inv[pi] = np.arange(P)
+        return pi_inv
+    return pi
+
+def _sparse_forest_assignment(Rep, dels, inss):
+    """ Computes an optimal assignment between two child forests, like
+    forest_assignment_sparse_, and returns it in the format of munkres, i.e.
+    pi[k] >= n_j if the k-th child of i gets deleted, pi[k] = l if it gets
+    replaced with the l-th child of j, and pi[m_i + l] < n_j if the l-th
+    child of j gets inserted.
+    """
+    m_i, n_j = Rep.shape
+    pi = np.concatenate((n_j + np.arange(m_i), np.arange(n_j)))
+    # restrict the problem to children with negative reduced costs
+    Red = np.minimum(Rep - np.expand_dims(dels, 1) - np.expand_dims(inss, 0), 0.)
+    rows = np.where(np.any(Red < 0., axis=1))[0]
+    cols = np.where(np.any(Red < 0., axis=0))[0]
+    if len(rows) == 0:
+        return pi
+    Red = Red[np.ix_(rows, cols)]
+    assignment = lapjv(Red)
+    for a in range(len(rows)):
+        b = assignment[a]
+        if b >= 0 and Red[a, b] < 0.:
+            pi[rows[a]] = cols[b]
+            pi[m_i + cols[b]] = n_j + rows[a]
+    return pi
+
+##################################
+# Approximate assignments        #
+##################################
+
+cdef struct KeyIndex:
+    double key
+    long long idx
+
+cdef int compare_keys_(const void* a, const void* b) noexcept nogil:
+    """ Compares two KeyIndex entries by their keys. """
+    cdef double key_a = (<KeyIndex*> a).key
+    cdef double key_b = (<KeyIndex*> b).key
+    return (key_a > key_b) - (key_a < key_b)
+
+cdef double accept_sorted_(const double* R, long long P, long long Q, KeyIndex* keys, long long K,
+    long long* pi) except? -1 nogil:
+    """ Sorts the K candidate pairs in keys by ascending key and accepts
+    every pair whose row and column are both still free. Returns the sum of
+    R over all accepted pairs.
+    """
+    qsort(keys, K, sizeof(KeyIndex), compare_keys_)
+    cdef char* used = <char*> calloc(Q + 1, sizeof(char))
+    cdef long long i
+    cdef long long j
+    cdef long long k
+    cdef double cost = 0.
+    if used == NULL:
+        raise MemoryError('Could not allocate scratch memory for the approximate assignment')
+    for i in range(P):
+        pi[i] = -1
+    for k in range(K):
+        i = keys[k].idx // Q
+        j = keys[k].idx % Q
+        if pi[i] < 0 and not used[j]:
+            pi[i] = j
+            used[j] = 1
+            cost += R[keys[k].idx]
+    free(used)
+    return cost
+
+@cython.cdivision(True)
+cdef void sinkhorn_(const double* R, long long P, long long Q, double* f, double* g) noexcept nogil:
+    """ Computes the dual potentials f (P + 1 entries) and g (Q + 1 entries)
+    of an entropy-regularized transport between the rows and the columns of
+    R via log-domain Sinkhorn iterations. Every row and column has unit
+    mass, and an additional dummy row (column) with mass Q (P) absorbs all
+    unassigned columns (rows) at zero cost.
+    """
+    cdef long long i
+    cdef long long j
+    cdef int it
+    cdef double scale = 0.
+    cdef double eps
+    cdef double h
+    cdef double s
+    cdef double c
+    for i in range(P * Q):
+        if -R[i] > scale:
+            scale = -R[i]
+    for i in range(P + 1):
+        f[i] = 0.
+    for j in range(Q + 1):
+        g[j] = 0.
+    if scale <= 0.:
+        return
+    eps = _SINKHORN_EPSILON * scale
+    for it in range(_SINKHORN_ITERATIONS):
+        for i in range(P + 1):
+            # compute a stable log-sum-exp over all columns
+            h = -INFINITY
+            for j in range(Q + 1):
+                c = R[i * Q + j] if i < P and j < Q else 0.
+                if g[j] - c > h:
+                    h = g[j] - c
+            s = 0.
+            for j in range(Q + 1):
+                c = R[i * Q + j] if i < P and j < Q else 0.
+                s += exp((g[j] - c - h) / eps)
+            f[i] = eps * log(1. if i < P else <double> Q) - h - eps * log(s)
+        for j in range(Q + 1):
+            h = -INFINITY
+            for i in range(P + 1):
+                c = R[i * Q + j] if i < P and j < Q else 0.
+                if f[i] - c > h:
+                    h = f[i] - c
+            s = 0.
+            for i in range(P + 1):
+                c = R[i * Q + j] if i < P and j < Q else 0.
+                s += exp((f[i] - c - h) / eps)
+            g[j] = eps * log(1. if j < Q else <double> P) - h - eps * log(s)
+
+cdef double assignment_heuristic_(const double* R, long long P, long long Q, int approx,
+    long long* pi) except? -1 nogil:
+    """ Heuristically assigns the rows of the P x Q reduced cost matrix R
+    (in row-major order) to its columns, where rows and columns may also
+    stay unassigned at zero cost. The assignment is stored in pi, where
+    pi[i] = -1 marks unassigned rows, and its cost is returned, which is an
+    upper bound for the optimal cost.
+    """
+    cdef long long i
+    cdef long long j
+    cdef long long K = 0
+    cdef long long j_min
+    cdef double h
+    cdef double cost = 0.
+    cdef char* used
+    cdef KeyIndex* keys
+    cdef double* f
+    cdef double* g
+    if approx == _APPROX_GREEDY:
+        # assign each row to the best remaining column
+        used = <char*> calloc(Q + 1, sizeof(char))
+        if used == NULL:
+            raise MemoryError('Could not allocate scratch memory for the approximate assignment')
+        for i in range(P):
+            pi[i] = -1
+            h = 0.
+            j_min = -1
+            for j in range(Q):
+                if not used[j] and R[i * Q + j] < h:
+                    h = R[i * Q + j]
+                    j_min = j
+            if j_min >= 0:
+                pi[i] = j_min
+                used[j_min] = 1
+                cost += h
+        free(used)
+        return cost
+    keys = <KeyIndex*> malloc(P * Q * sizeof(KeyIndex) + 1)
+    if keys == NULL:
+        raise MemoryError('Could not allocate scratch memory for the approximate assignment')
+    if approx == _APPROX_SINKHORN:
+        # prefer pairs with high transport mass, i.e. low R - f - g
+        f = <double*> malloc((P + Q + 2) * sizeof(double))
+        if f == NULL:
+            free(keys)
+            raise MemoryError('Could not allocate scratch memory for the approximate assignment')
+        g = f + P + 1
+        sinkhorn_(R, P, Q, f, g)
+        for i in range(P):
+            for j in range(Q):
+                if R[i * Q + j] < 0.:
+                    keys[K].key = R[i * Q + j] - f[i] - g[j]
+                    keys[K].idx = i * Q + j
+                    K += 1
+        free(f)
+    else:
+        # prefer pairs with low cost
+        for i in range(P * Q):
+            if R[i] < 0.:
+                keys[K].key = R[i]
+                keys[K].idx = i
+                K += 1
+    try:
+        cost = accept_sorted_(R, P, Q, keys, K, pi)
+    finally:
+        free(keys)
+    return cost
+
+cdef double dual_bound_(const double* R, long long P, long long Q, long long row_stride, long long col_stride,
+    double* u, double* v) noexcept nogil:
+    """ Completes the given row duals u to the best feasible column duals v
+    and improves u in turn, where entry (i, j) of R is stored at
+    i * row_stride + j * col_stride. Because all duals are non-positive and
+    u[i] + v[j] <= R[i, j], the returned sum over u and v is a lower bound
+    for the assignment cost by weak linear programming duality.
+    """
+    cdef long long i
+    cdef long long j
+    cdef double r
+    cdef double bound = 0.
+    for j in range(Q):
+        v[j] = 0.
+        for i in range(P):
+            r = R[i * row_stride + j * col_stride] - u[i]
+            if r < v[j]:
+                v[j] = r
+        bound += v[j]
+    for i in range(P):
+        u[i] = 0.
+        for j in range(Q):
+            r = R[i * row_stride + j * col_stride] - v[j]
+            if r < u[i]:
+                u[i] = r
+        bound += u[i]
+    return bound
+
+cdef double assignment_lower_bound_(const double* R, long long P, long long Q, int approx) except? -1 nogil:
+    """ Computes a lower bound for the optimal cost of assigning the rows
+    of the P x Q reduced cost matrix R (in row-major order) to its columns,
+    where rows and columns may also stay unassigned at zero cost. We start
+    the dual ascent of dual_bound_ from the row minima and from the column
+    minima and, for the Sinkhorn heuristic, also from its potentials.
+    """
+    cdef double* u = <double*> malloc((P + Q + 2) * sizeof(double))
+    cdef double* v = u + P + 1
+    cdef double* g
+    cdef long long i
+    cdef long long j
+    cdef double bound
+    cdef double h
+    if u == NULL:
+        raise MemoryError('Could not allocate scratch memory for the approximate assignment')
+    for i in range(P):
+        u[i] = 0.
+        for j in range(Q):
+            if R[i * Q + j] < u[i]:
+                u[i] = R[i * Q + j]
+    bound = dual_bound_(R, P, Q, Q, 1, u, v)
+    for j in range(Q):
+        v[j] = 0.
+        for i in range(P):
+            if R[i * Q + j] < v[j]:
+                v[j] = R[i * Q + j]
+    h = dual_bound_(R, Q, P, 1, Q, v, u)
+    if h > bound:
+        bound = h
+    if approx == _APPROX_SINKHORN:
+        g = <double*> malloc((Q + 1) * sizeof(double))
+        if g == NULL:
+            free(u)
+            raise MemoryError('Could not allocate scratch memory for the approximate assignment')
+        sinkhorn_(R, P, Q, u, g)
+        for i in range(P):
+            u[i] += g[Q]
+        free(g)
+        h = dual_bound_(R, P, Q, Q, 1, u, v)
+        if h > bound:
+            bound = h
+    free(u)
+    return bound
+
+def approximate_assignment(R, approx = 'greedy'):
+    """ Approximately solves the assignment problem for the given reduced
+    cost matrix R, where every row and every column may also stay
+    unassigned at zero cost, and bounds the optimal cost from both sides.
+
+    For the set edit distance between x and y, the reduced cost for
+    replacing x[i] with y[j] is delta(x[i], y[j]) - delta(x[i], None) -
+    delta(None, y[j]), i.e. the saving compared to deleting x[i] and
+    inserting y[j].
+
+    Parameters
+    ----------
+    R: ndarray
+        An m x n reduced cost matrix.
+    approx: str (default = 'greedy')
+        the heuristic to use. 'greedy' assigns every row in order to the
+        best remaining column, 'sorted' accepts pairs in order of
+        increasing cost, and 'sinkhorn' accepts pairs in order of their
+        mass in an entropy-regularized assignment.
+
+    Returns
+    -------
+    upper: float
+        the cost of the heuristic assignment.
+    lower: float
+        a lower bound for the optimal assignment cost.
+    pi: ndarray
+        An m-element array where pi[i] is the index to which i is
+        assigned or -1 if i is unassigned.
+
+    """
+    cdef int approx_idx = _approx_index(approx)
+    if approx_idx == 0:
+        raise ValueError('approx must not be None')
+    # only negative reduced costs can ever help
+    R = np.ascontiguousarray(np.minimum(R, 0.), dtype=float)
+    cdef long long P = R.shape[0]
+    cdef long long Q = R.shape[1]
+    pi = np.full(P, -1, dtype=np.int64)
+    if P == 0 or Q == 0:
+        return 0., 0., pi
+    cdef double[:, ::1] R_view = R
+    cdef long long[::1] pi_view = pi
+    cdef double upper
+    cdef double lower
+    with nogil:
+        upper = assignment_heuristic_(&R_view[0, 0], P, Q, approx_idx, &pi_view[0])
+        lower = assignment_lower_bound_(&R_view[0, 0], P, Q, approx_idx)
+    return upper, lower, pi
+
 #########################
 # Backtracing Functions #
 #########################
 
 cdef double _BACKTRACE_TOL = 1E-5
 
-def uted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
+def uted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None, solver = 'munkres'):
     """ Computes the unordered tree edit distance between the trees x and y,
     each described by a list of nodes and an adjacency list adj, where adj[i]
     is a list of indices pointing to children of node i. This function
@@ -683,6 +1417,10 @@ def uted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
         distance, where delta(x, None) should be the cost of deleting x and
         delta(None, y) should be the cost of inserting y. If undefined, this
         method calls standard_ted instead.
+    solver: str (default = 'munkres')
+        the solver for the assignment problems between child forests, either
+        'munkres' or 'jv'. Refer to uted for details. Note that different
+        solvers may return different co-optimal alignments.
 
     Returns
     -------
@@ -693,6 +1431,7 @@ def uted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
     """
     if isinstance(x_nodes, tuple):
         x_nodes, x_adj, y_nodes, y_adj = extract_from_tuple_input(x_nodes, x_adj)
+    solver_idx = _solver_index(solver)
 
     # the number of nodes in both trees
     cdef int m = len(x_nodes)
@@ -734,7 +1473,7 @@ def uted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
             Delta_view[m,j] = delta(None, y_nodes[j])
 
     # compute the actual tree edit distance
-    D_forest, D_tree = _uted(x_nodes, x_adj, y_nodes, y_adj, Delta)
+    D_forest, D_tree = _uted(x_nodes, x_adj, y_nodes, y_adj, Delta, solver_idx)
 
 
     # x_nodes_print = [str(x) for x in x_nodes] + ['-']
@@ -886,30 +1625,36 @@ def uted_backtrace(x_nodes, x_adj, y_nodes = None, y_adj = None, delta = None):
             # purpose, perform the Munkres/Hungarian algorithm
             # for an optimal alignment
 
-            # prepare a cost matrix for the algorithm
-            C = np.zeros((m_i + n_j, m_i + n_j))
-            for k in range(m_i):
-                i_k = x_adj[i][k]
+            if solver_idx == _SOLVER_JV or m_i + n_j > _DENSE_MAX_SIZE:
+                # for large child forests (or the jv solver), use the
+                # sparse assignment
+                pi = _sparse_forest_assignment(D_tree[np.ix_(x_adj[i], y_adj[j])],
+                    D_tree[x_adj[i], n], D_tree[m, y_adj[j]])
+            else:
+                # prepare a cost matrix for the algorithm
+                C = np.zeros((m_i + n_j, m_i + n_j))
+                for k in range(m_i):
+                    i_k = x_adj[i][k]
+                    for l in range(n_j):
+                        j_l = y_adj[j][l]
+                        # matching ci with cj means editing the ci'th
+                        # child of i to the cj'th child of j.
+                        C[k, l] = D_tree[i_k, j_l]
+                C[:m_i, n_j:] = INFINITY
+                for k in range(m_i):
+                    # matching c with n_j + c means deleting the
+                    # c'th child of i
+                    i_k = x_adj[i][k]
+                    C[k, n_j + k] = D_tree[i_k, n]
+                C[m_i:, :n_j] = INFINITY
                 for l in range(n_j):
+                    # matching m_i + c with c means inserting the
+                    # c'th child of j
                     j_l = y_adj[j][l]
-                    # matching ci with cj means editing the ci'th
-                    # child of i to the cj'th child of j.
-                    C[k, l] = D_tree[i_k, j_l]
-            C[:m_i, n_j:] = INFINITY
-            for k in range(m_i):
-                # matching c with n_j + c means deleting the
-                # c'th child of i
-                i_k = x_adj[i][k]
-                C[k, n_j + k] = D_tree[i_k, n]
-            C[m_i:, :n_j] = INFINITY
-            for l in range(n_j):
-                # matching m_i + c with c means inserting the
-                # c'th child of j
-                j_l = y_adj[j][l]
-                C[m_i + l, l] = D_tree[m, j_l]
-            C[m_i:, n_j:] = 0.
-            # call the munkres algorithm
-            pi = munkres(C)
+                    C[m_i + l, l] = D_tree[m, j_l]
+                C[m_i:, n_j:] = 0.
+                # call the munkres algorithm
+                pi = munkres(C)
             # compute the cost
             rep_cost = 0.
             for k in range(m_i):
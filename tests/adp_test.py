@@ -80,6 +80,166 @@ class TestADP(unittest.TestCase):
         actual = adp.edit_distance(left, right, skip_gra, deltas)
         self.assertEqual(expected, actual)
 
+    def test_compile(self):
+        gra = adp.Grammar("A", ["A", "Sk"])
+        gra.append_replacement("A", "A", "rep")
+        gra.append_deletion("A", "A", "skdel")
+        gra.append_deletion("A", "Sk", "del")
+        gra.append_insertion("A", "Sk", "ins")
+        gra.append_replacement("Sk", "A", "rep")
+        gra.append_deletion("Sk", "Sk", "skdel")
+        compiled = gra.compile()
+        # check the rule tables
+        self.assertEqual(2, compiled.size())
+        np.testing.assert_array_equal([0, 1], compiled._accepting)
+        np.testing.assert_array_equal([0, 2, 3], compiled._del_ptr)
+        np.testing.assert_array_equal([0, 1, 0], compiled._del_ops)
+        np.testing.assert_array_equal([0, 1, 1], compiled._del_nonts)
+        np.testing.assert_array_equal([0, 1, 1], compiled._ins_ptr)
+        self.assertEqual(gra.adjacency_lists(), compiled.adjacency_lists())
+
+        # the compiled grammar should yield the same result as the original
+        def skcost(x, y):
+            return 0.5
+
+        deltas = {
+            "rep": kron_distance,
+            "del": kron_distance,
+            "ins": kron_distance,
+            "skdel": skcost,
+        }
+        left = ["a", "b", "c"]
+        right = ["a", "d"]
+        # the cheapest option is to replace a, then to replace b with d, and
+        # to delete c via the cheaper of both deletion rules
+        expected = 1.5
+        self.assertEqual(expected, adp.edit_distance(left, right, gra, deltas))
+        self.assertEqual(expected, adp.edit_distance(left, right, compiled, deltas))
+        with self.assertRaises(ValueError):
+            compiled.validate({"rep": kron_distance})
+
+    def test_cache(self):
+        gra = adp.Grammar("A", ["A"])
+        gra.append_replacement("A", "A", "rep")
+        gra.append_deletion("A", "A", "del")
+        # repeated calls should return the memoized results
+        adj = gra.adjacency_lists()
+        self.assertIs(adj, gra.adjacency_lists())
+        inv_adj = gra.inverse_adjacency_lists()
+        self.assertIs(inv_adj, gra.inverse_adjacency_lists())
+        compiled = gra.compile()
+        self.assertIs(compiled, gra.compile())
+        deltas = {"rep": kron_distance, "del": kron_distance}
+        gra.validate(deltas)
+        self.assertIs(deltas, gra._cache["validated"])
+        self.assertEqual(1.0, adp.edit_distance(["a", "b"], ["a"], gra, deltas))
+        # appending a rule should invalidate the cache
+        gra.append_insertion("A", "A", "ins")
+        self.assertEqual([(0, 0)], gra.adjacency_lists()[4][0])
+        self.assertIsNot(adj, gra.adjacency_lists())
+        self.assertIsNot(inv_adj, gra.inverse_adjacency_lists())
+        self.assertIsNot(compiled, gra.compile())
+        with self.assertRaises(ValueError):
+            gra.validate(deltas)
+        deltas["ins"] = kron_distance
+        self.assertEqual(1.0, adp.edit_distance(["a"], ["a", "b"], gra, deltas))
+
+    def test_reduce(self):
+        gra = adp.Grammar("S", ["E"])
+        # A and B are equivalent and should be merged
+        gra.append_replacement("S", "A", "rep")
+        gra.append_replacement("S", "B", "rep")
+        gra.append_replacement("A", "E", "rep")
+        gra.append_replacement("B", "E", "rep")
+        gra.append_deletion("A", "A", "del")
+        gra.append_deletion("B", "B", "del")
+        # U never reaches an accepting nonterminal and should be removed
+        gra.append_insertion("S", "U", "ins")
+        gra.append_insertion("U", "U", "ins")
+        # V is unreachable and should be removed
+        gra.append_replacement("V", "E", "rep")
+        gra.append_insertion("E", "E", "ins")
+        reduced, nont_map = gra.reduce()
+        self.assertEqual(6, gra.size())
+        self.assertEqual(3, reduced.size())
+        expected_map = {"S": "S", "A": "A", "B": "A", "E": "E", "U": None, "V": None}
+        self.assertEqual(expected_map, nont_map)
+        self.assertEqual(["E"], reduced._accepting)
+        self.assertEqual([("rep", "A")], reduced._rules["S"]._reps)
+        self.assertEqual([], reduced._rules["S"]._inss)
+        self.assertEqual([("del", "A")], reduced._rules["A"]._dels)
+        self.assertEqual(3, gra.compile(reduce=True).size())
+        # the edit distance should not change
+        deltas = {"rep": kron_distance, "del": kron_distance, "ins": kron_distance}
+        for x, y in [("abc", "abd"), ("a", "bcd"), ("abc", "a"), ("", "")]:
+            expected = adp._edit_distance(x, y, gra, deltas)[0][0, 0, 0]
+            self.assertEqual(expected, adp.edit_distance(x, y, gra, deltas))
+
+    def test_banded_edit_distance(self):
+        gra = adp.Grammar("A", ["A", "D", "I"])
+        gra.append_replacement("A", "A", "rep")
+        gra.append_deletion("A", "D", "del")
+        gra.append_insertion("A", "I", "ins")
+        gra.append_replacement("D", "A", "rep")
+        gra.append_deletion("D", "D", "skdel")
+        gra.append_replacement("I", "A", "rep")
+        gra.append_insertion("I", "I", "skins")
+        deltas = {
+            "rep": kron_distance,
+            "del": lambda x, y: 1.0,
+            "ins": lambda x, y: 1.0,
+            "skdel": lambda x, y: 0.5,
+            "skins": lambda x, y: 0.5,
+        }
+        rng = np.random.RandomState(0)
+        for _ in range(50):
+            x = rng.randint(3, size=rng.randint(12)).tolist()
+            y = rng.randint(3, size=rng.randint(12)).tolist()
+            expected = adp.edit_distance(x, y, gra, deltas)
+            # the band should be widened until the result is exact
+            for band in [0, 1, 4]:
+                actual = adp.edit_distance(x, y, gra, deltas, band=band)
+                self.assertAlmostEqual(expected, actual)
+            # distances above max_dist should be infinite
+            for max_dist in [0.0, 1.5, 4.0]:
+                actual = adp.edit_distance(x, y, gra, deltas, max_dist=max_dist)
+                if expected <= max_dist:
+                    self.assertAlmostEqual(expected, actual)
+                else:
+                    self.assertEqual(np.inf, actual)
+        # an infinite or huge max_dist should not prune anything
+        expected = adp.edit_distance("abc", "abd", gra, deltas)
+        for max_dist in [np.inf, 1e300]:
+            self.assertAlmostEqual(expected, adp.edit_distance("abc", "abd", gra, deltas, max_dist=max_dist))
+        self.assertAlmostEqual(expected, adp.edit_distance("abc", "abd", gra, deltas, band=0, max_dist=np.inf))
+        with self.assertRaises(ValueError):
+            adp.edit_distance("a", "b", gra, deltas, band=-1)
+
+    def test_edit_distance_batch(self):
+        gra = adp.Grammar("A", ["A", "D"])
+        gra.append_replacement("A", "A", "rep")
+        gra.append_deletion("A", "D", "del")
+        gra.append_deletion("D", "D", "skdel")
+        gra.append_insertion("A", "A", "ins")
+        gra.append_replacement("D", "A", "rep")
+        deltas = {
+            "rep": kron_distance,
+            "del": lambda x, y: 1.0,
+            "skdel": lambda x, y: 0.5,
+            "ins": lambda x, y: 1.0,
+        }
+        rng = np.random.RandomState(0)
+        pairs = [
+            (rng.randint(3, size=rng.randint(8)).tolist(), rng.randint(3, size=rng.randint(8)).tolist())
+            for _ in range(30)
+        ]
+        pairs.append(([], []))
+        expected = [adp.edit_distance(x, y, gra, deltas) for x, y in pairs]
+        actual = adp.edit_distance_batch(pairs, gra, deltas)
+        self.assertEqual((len(pairs),), actual.shape)
+        np.testing.assert_allclose(expected, actual)
+        self.assertEqual((0,), adp.edit_distance_batch([], gra, deltas).shape)
+
     def test_backtrace(self):
         gra = adp.Grammar("A", ["A"])
         gra.append_replacement("A", "A", "rep")
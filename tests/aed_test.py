@@ -24,6 +24,7 @@ Tests affine edit distance computations.
 import unittest
 import numpy as np
 from edist.alignment import Alignment
+import edist.adp as adp
 import edist.aed as aed
 
 __author__ = "Benjamin Paaßen"
@@ -42,6 +43,50 @@ class TestAED(unittest.TestCase):
         actual = aed.aed(x, y)
         self.assertEqual(expected, actual)
 
+    def test_aed_constant_gaps(self):
+        # compare the dedicated affine kernel to the general ADP on random
+        # inputs, both for Kronecker and for matrix replacement costs
+        rng = np.random.RandomState(0)
+        Delta = rng.rand(4, 4)
+        for gap, skip in [(1.0, 0.5), (0.3, 0.9)]:
+            for rep in [None, Delta]:
+                algebra = aed.AffineAlgebra(rep, gap, skip)
+                for _ in range(30):
+                    x = rng.randint(4, size=rng.randint(8)).tolist()
+                    y = rng.randint(4, size=rng.randint(8)).tolist()
+                    expected = adp.edit_distance(x, y, aed._grammar, algebra)
+                    actual = aed.aed(x, y, rep, gap, skip)
+                    self.assertAlmostEqual(expected, actual)
+        # unhashable symbols should fall back to the general ADP
+        self.assertEqual(1.0, aed.aed([[1], [2]], [[1], [3]]))
+
+    def test_aed_batch(self):
+        rng = np.random.RandomState(1)
+        pairs = [
+            (rng.randint(4, size=rng.randint(8)).tolist(), rng.randint(4, size=rng.randint(8)).tolist())
+            for _ in range(30)
+        ]
+        # check the Kronecker distance, a cost matrix, and a general function
+        Delta = rng.rand(4, 4)
+        rep_fun = lambda a, b: 0.0 if a == b else 0.7
+        for rep in [None, Delta, rep_fun]:
+            expected = [aed.aed(x, y, rep) for x, y in pairs]
+            actual = aed.aed_batch(pairs, rep)
+            np.testing.assert_allclose(expected, actual)
+        np.testing.assert_allclose([2.5, 1.0], aed.aed_batch([("abc", "adefc"), ([[1]], [[2]])]))
+
+    def test_aed_band(self):
+        x = "abcdef"
+        y = "abdef"
+        # a general replacement function uses the banded ADP
+        rep = lambda a, b: 0.0 if a == b else 1.0
+        self.assertEqual(1.0, aed.aed(x, y, rep, band=0))
+        self.assertEqual(1.0, aed.aed(x, y, rep, max_dist=1.0))
+        self.assertEqual(np.inf, aed.aed(x, y, rep, max_dist=0.5))
+        # the constant gap kernel should respect max_dist as well
+        self.assertEqual(1.0, aed.aed(x, y, max_dist=1.0))
+        self.assertEqual(np.inf, aed.aed(x, y, max_dist=0.5))
+
     def test_backtrace(self):
 
         x = "abc"
@@ -25,6 +25,7 @@ import unittest
 import numpy as np
 from scipy.spatial.distance import cdist
 import edist.sed as sed
+import edist.ted as ted
 import edist.bedl as bedl
 
 __author__ = "Benjamin Paaßen"
@@ -34,6 +35,14 @@ __maintainer__ = "Benjamin Paaßen"
 __email__ = "bpaassen@techfak.uni-bielefeld.de"
 
 
+def tree_ted(x, y, delta):
+    return ted.ted(x[0], x[1], y[0], y[1], delta)
+
+
+def tree_ted_backtrace(x, y, delta):
+    return ted.ted_backtrace_matrix(x[0], x[1], y[0], y[1], delta)
+
+
 class TestBEDL(unittest.TestCase):
 
     def test_indexing(self):
@@ -48,6 +57,45 @@ class TestBEDL(unittest.TestCase):
         actual_Ys = bedl.index_data(Xs, actual_idx)
         self.assertEqual(expected_Ys, actual_Ys)
 
+    def test_encode_data(self):
+        Xs = ["a", "bac", "", "bbb"]
+        values, offsets, idx = bedl.encode_data(Xs)
+        self.assertEqual({"a": 0, "b": 1, "c": 2}, idx)
+        np.testing.assert_array_equal([0, 1, 0, 2, 1, 1, 1], values)
+        np.testing.assert_array_equal([0, 1, 4, 4, 7], offsets)
+        self.assertEqual(np.int32, values.dtype)
+        # the result should be consistent with index_data
+        Ys = bedl.index_data(Xs, idx)
+        for i in range(len(Xs)):
+            self.assertEqual(Ys[i], values[offsets[i] : offsets[i + 1]].tolist())
+        # encode with a given index
+        values, offsets, _ = bedl.encode_data(["cab", "b"], {"c": 0, "b": 1, "a": 2})
+        np.testing.assert_array_equal([0, 2, 1, 1], values)
+        with self.assertRaises(ValueError):
+            bedl.encode_data(["cad"], idx)
+        # encode symbols which are not scalars
+        values, offsets, idx = bedl.encode_data([[(1, "a"), (0, "b")], [(1, "a")]])
+        self.assertEqual({(0, "b"): 0, (1, "a"): 1}, idx)
+        np.testing.assert_array_equal([1, 0, 1], values)
+        # encode integer symbols
+        values, offsets, idx = bedl.encode_data([[3, 1], [1, 7]])
+        self.assertEqual({1: 0, 3: 1, 7: 2}, idx)
+        np.testing.assert_array_equal([1, 0, 0, 2], values)
+        values, offsets, _ = bedl.encode_data([[7]], idx)
+        np.testing.assert_array_equal([2], values)
+        # encode trees
+        Xs = [(["a", "b", "c"], [[1, 2], [], []]), (["c"], [[]])]
+        values, offsets, idx = bedl.encode_data(Xs)
+        np.testing.assert_array_equal([0, 1, 2, 2], values)
+        np.testing.assert_array_equal([0, 3, 4], offsets)
+        # packed trees should carry the CSR children and keyroots
+        Ys = bedl._unpack(values, offsets, Xs)
+        np.testing.assert_array_equal([0, 1, 2], Ys[0][0])
+        np.testing.assert_array_equal([1, 2], Ys[0][1].children)
+        np.testing.assert_array_equal([0, 2, 2, 2], Ys[0][1].ptr)
+        np.testing.assert_array_equal([2, 1, 2], Ys[0][1].orl)
+        self.assertEqual(Xs[1][1], Ys[1][1].tolist())
+
     def test_initialize_embedding(self):
         n = 8
         # create an embedding with n dimensions
@@ -78,6 +126,22 @@ class TestBEDL(unittest.TestCase):
 
         np.testing.assert_allclose(Phat, expected_Phat, atol=1e-3)
 
+    def test_reduce_backtraces(self):
+        # create a few index lists
+        X = [[0, 0, 0], [1, 2], [2, 0, 1, 1]]
+        Y = [[1], [0, 2, 2]]
+        size = 3
+        # compute all backtrace matrices
+        Ps = [[sed.standard_sed_backtrace_matrix(x, y) for y in Y] for x in X]
+        # compute the batched reduction
+        Phats = bedl.reduce_backtraces(Ps, X, Y, size)
+        self.assertEqual((len(X), len(Y), size + 1, size + 1), Phats.shape)
+        # compare to the reduction of every single pair
+        for k in range(len(X)):
+            for l in range(len(Y)):
+                expected_Phat = bedl.reduce_backtrace(Ps[k][l][0], X[k], Y[l], size)
+                np.testing.assert_allclose(Phats[k, l], expected_Phat)
+
     def test_fit(self):
         # create a very simple string dataset where we need to learn that
         # a <-> b replacements should be cheap and c <-> d replacements
@@ -95,6 +159,72 @@ class TestBEDL(unittest.TestCase):
         self.assertTrue(np.all(Delta[:2, 2:] > 0.1))
         self.assertTrue(np.all(Delta[2:, :2] > 0.1))
 
+    def test_fit_minibatch(self):
+        # use the same dataset as above, but repeated, such that we can
+        # sample mini-batches
+        X = ["ab", "ba", "cd", "dc"] * 5
+        y = np.array([0, 0, 1, 1] * 5)
+        model = bedl.BEDL(
+            1,
+            T=10,
+            batch_size=4,
+            block_size=8,
+            refresh_interval=5,
+            learning_rate=0.05,
+            random_state=0,
+        )
+        model.fit(X, y)
+        # check that we have one prototype per class
+        self.assertEqual(2, len(model._proto_idx))
+        np.testing.assert_array_equal([0, 1], y[model._proto_idx])
+        # check that the loss decreased
+        self.assertTrue(np.mean(model._loss[-5:]) < model._loss[0])
+        # check that every data point is closest to the prototype of its
+        # own class according to the learned distance
+        for i in range(len(X)):
+            d = [sed.sed(X[i], X[w], model._delta) for w in model._proto_idx]
+            self.assertEqual(y[i], np.argmin(d))
+
+    def test_fit_trees(self):
+        # the same dataset as above, but as trees with two nodes each
+        X = [
+            (["a", "b"], [[1], []]),
+            (["b", "a"], [[1], []]),
+            (["c", "d"], [[1], []]),
+            (["d", "c"], [[1], []]),
+        ]
+        y = np.array([0, 0, 1, 1])
+        model = bedl.BEDL(1, distance=tree_ted, distance_backtrace=tree_ted_backtrace)
+        model.fit(X, y)
+        np.testing.assert_array_equal(y, model.predict(X))
+        # the distances should agree with the learned delta on the original
+        # adjacency lists
+        D = model.decision_function(X)
+        for i in range(len(X)):
+            for k in range(len(model._proto_idx)):
+                expected = tree_ted(X[i], X[model._proto_idx[k]], model._delta)
+                self.assertAlmostEqual(expected, D[i, k])
+
+    def test_predict(self):
+        X = ["ab", "ba", "cd", "dc"]
+        y = np.array([0, 0, 1, 1])
+        model = bedl.BEDL(1)
+        model.fit(X, y)
+        # check the distances to the prototypes against the learned delta
+        X_test = ["aab", "b", "dcd", "c", ""]
+        D = model.decision_function(X_test)
+        self.assertEqual((len(X_test), 2), D.shape)
+        for i in range(len(X_test)):
+            for k in range(len(model._proto_idx)):
+                expected = sed.sed(X_test[i], X[model._proto_idx[k]], model._delta)
+                self.assertAlmostEqual(expected, D[i, k])
+        # check the predictions
+        np.testing.assert_array_equal([0, 0, 1, 1], model.predict(X_test[:4]))
+        np.testing.assert_array_equal(y, model.predict(X))
+        # unknown symbols should raise an error
+        with self.assertRaises(ValueError):
+            model.predict(["xyz"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+"""
+Tests the packed sequence and tree containers of edist.dataset.
+
+"""
+# Copyright (C) 2019-2021
+# Benjamin Paaßen
+# AG Machine Learning
+# Bielefeld University
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from edist.dataset import PackedSequences, PackedTrees
+import edist.multiprocess as mp
+import edist.sed as sed
+import edist.ted as ted
+import edist.uted as uted
+
+__author__ = "Benjamin Paaßen"
+__copyright__ = "Copyright (C) 2019-2021, Benjamin Paaßen"
+__license__ = "GPLv3"
+__maintainer__ = "Benjamin Paaßen"
+__email__ = "bpaassen@techfak.uni-bielefeld.de"
+
+
+class TestDataset(unittest.TestCase):
+
+    def test_packed_sequences(self):
+        Xs = ["abc", "", "ba", "cab"]
+        data = PackedSequences.from_list(Xs)
+        self.assertEqual(len(Xs), len(data))
+        for i in range(len(Xs)):
+            self.assertEqual(list(Xs[i]), data[i].tolist())
+        self.assertEqual(list(Xs[-1]), data[-1].tolist())
+        with self.assertRaises(IndexError):
+            data[len(Xs)]
+        # slices should share memory with the original container
+        sliced = data[1:3]
+        self.assertEqual(2, len(sliced))
+        self.assertTrue(np.shares_memory(sliced.values, data.values))
+        self.assertEqual(list(Xs[2]), sliced[1].tolist())
+        # strided access should work as well
+        strided = data[::2]
+        self.assertEqual([list(Xs[0]), list(Xs[2])], [x.tolist() for x in strided])
+        # pickling a slice should only transfer the sliced data
+        unpickled = pickle.loads(pickle.dumps(sliced))
+        self.assertEqual(len(Xs[2]), len(unpickled.values))
+        self.assertEqual(list(Xs[2]), unpickled[1].tolist())
+        # sequences of vectors are supported as well
+        data = PackedSequences.from_list([np.ones((3, 2)), np.zeros((1, 2))])
+        self.assertEqual((3, 2), data[0].shape)
+        self.assertEqual((1, 2), data[1].shape)
+
+    def test_memmap(self):
+        Xs = [[0, 1, 2], [2, 2], [1]]
+        data = PackedSequences.from_list(Xs, dtype=np.int32)
+        with tempfile.TemporaryDirectory() as path:
+            data[1:].save(path)
+            loaded = PackedSequences.load(path)
+            self.assertIsInstance(loaded.values, np.memmap)
+            self.assertEqual([Xs[1], Xs[2]], [x.tolist() for x in loaded])
+            # pickling a memory-mapped slice should only transfer the path
+            sliced = loaded[1:]
+            dump = pickle.dumps(sliced)
+            self.assertNotIn(b"numpy", dump)
+            unpickled = pickle.loads(dump)
+            self.assertIsInstance(unpickled.values, np.memmap)
+            self.assertEqual([Xs[2]], [x.tolist() for x in unpickled])
+            del loaded, sliced, unpickled
+
+    def test_packed_trees(self):
+        Xs = [
+            (["a", "b", "c"], [[1, 2], [], []]),
+            (["a"], [[]]),
+            (["a", "b", "c", "d"], [[1, 3], [2], [], []]),
+        ]
+        data = PackedTrees.from_list(Xs)
+        self.assertEqual(len(Xs), len(data))
+        for i in range(len(Xs)):
+            nodes, adj = data[i]
+            self.assertEqual(Xs[i][0], nodes.tolist())
+            self.assertEqual(Xs[i][1], adj.tolist())
+            self.assertEqual(Xs[i][1], data.adjacency(i))
+            self.assertEqual(Xs[i][1], [list(c) for c in adj])
+            orl = ted.outermost_right_leaves(Xs[i][1])
+            np.testing.assert_array_equal(orl, data.outermost_right_leaves(i))
+            np.testing.assert_array_equal(ted.keyroots(orl), data.keyroots(i))
+        np.testing.assert_array_equal([-1, 0, 1, 0], data.parents(2))
+        # check slicing, pickling, and storage
+        sliced = data[1:]
+        self.assertTrue(np.shares_memory(sliced.labels, data.labels))
+        unpickled = pickle.loads(pickle.dumps(sliced))
+        self.assertEqual(5, len(unpickled.labels))
+        with tempfile.TemporaryDirectory() as path:
+            sliced.save(path)
+            loaded = PackedTrees.load(path, mmap_mode=None)
+            for i in range(len(sliced)):
+                self.assertEqual(Xs[i + 1][1], loaded[i][1].tolist())
+                np.testing.assert_array_equal(sliced.keyroots(i), loaded.keyroots(i))
+
+    def test_distances(self):
+        # packed containers should be valid inputs for multiprocess
+        Xs = ["abc", "", "ba", "cab", "aabbcc"] * 3
+        data = PackedSequences.from_list(Xs)
+        expected = mp.pairwise_distances(Xs, Xs, sed.standard_sed, num_jobs=2)
+        actual = mp.pairwise_distances(data, data, sed.standard_sed, num_jobs=2)
+        np.testing.assert_allclose(expected, actual)
+        actual = mp.pairwise_distances_symmetric(data, sed.standard_sed, num_jobs=2)
+        np.testing.assert_allclose(expected, actual)
+        # and for the indexed sequence edit distance
+        data = PackedSequences.from_list([[0, 1], [], [1, 1, 0]], dtype=np.int32)
+        Delta = 1.0 - np.eye(3)
+        D = sed.sed_indexed_pairwise(data, data, Delta)
+        self.assertEqual(3.0, D[1, 2])
+        Xs = [(["a", "b", "c"], [[1, 2], [], []]), (["a", "c"], [[1], []])]
+        data = PackedTrees.from_list(Xs)
+        expected = mp.pairwise_distances(Xs, Xs, ted.ted, num_jobs=2)
+        actual = mp.pairwise_distances(data, data, ted.ted, num_jobs=2)
+        np.testing.assert_allclose(expected, actual)
+        # the tree distances should use the packed arrays directly
+        delta = lambda a, b: 0.0 if a == b else 1.0
+        for i in range(len(Xs)):
+            for j in range(len(Xs)):
+                self.assertEqual(
+                    ted.standard_ted(*Xs[i], *Xs[j]), ted.standard_ted(*data[i], *data[j])
+                )
+                self.assertEqual(
+                    ted.ted(*Xs[i], *Xs[j], delta), ted.ted(*data[i], *data[j], delta)
+                )
+                self.assertEqual(
+                    uted.uted(*Xs[i], *Xs[j], delta), uted.uted(*data[i], *data[j], delta)
+                )
+                self.assertEqual(
+                    str(ted.standard_ted_backtrace(*Xs[i], *Xs[j])),
+                    str(ted.standard_ted_backtrace(*data[i], *data[j])),
+                )
+                self.assertEqual(
+                    str(uted.uted_backtrace(*Xs[i], *Xs[j], delta)),
+                    str(uted.uted_backtrace(*data[i], *data[j], delta)),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -216,5 +216,307 @@ class TestDTW(unittest.TestCase):
         self.assertEqual(expected_k, k)
 
 
+    def test_dtw_window(self):
+        # a shift by three steps is free for unconstrained dynamic time
+        # warping, but not within a window of radius one
+        x = np.array([0, 0, 0, 0, 1, 2, 3, 4, 5, 5], dtype=float)
+        y = np.array([0, 1, 2, 3, 4, 5, 5, 5, 5, 5], dtype=float)
+        self.assertAlmostEqual(0.0, dtw.dtw_numeric(x, y))
+        self.assertAlmostEqual(0.0, dtw.dtw_numeric(x, y, window=3))
+        self.assertTrue(dtw.dtw_numeric(x, y, window=1) > 0.0)
+        # compare all variants with a reference implementation on the full
+        # matrix, where cells outside the window are infinite
+        rng = np.random.RandomState(0)
+
+        def abs_delta(a, b):
+            return abs(a - b)
+
+        for _ in range(20):
+            m, n = rng.randint(1, 15, size=2)
+            x = rng.randn(m)
+            y = rng.randn(n)
+            for window, slope in [(0, None), (2, None), (None, 2.0), (1, 3.0)]:
+                if m > 1 and n > 1 and slope is not None:
+                    slope = max(slope, (m - 1) / (n - 1), (n - 1) / (m - 1))
+                lo, hi, _ = dtw._window(m, n, window, slope)
+                D = np.full((m + 1, n + 1), np.inf)
+                D[m, n] = 0.0
+                for i in range(m - 1, -1, -1):
+                    for j in range(hi[i], lo[i] - 1, -1):
+                        D[i, j] = abs(x[i] - y[j])
+                        if i < m - 1 or j < n - 1:
+                            D[i, j] += min(D[i + 1, j + 1], D[i, j + 1], D[i + 1, j])
+                expected = D[0, 0]
+                self.assertAlmostEqual(expected, dtw.dtw_numeric(x, y, window, slope))
+                self.assertAlmostEqual(expected, dtw.dtw(x, y, abs_delta, window, slope))
+                self.assertAlmostEqual(
+                    expected,
+                    dtw.dtw_euclidean(
+                        np.expand_dims(x, 1), np.expand_dims(y, 1), window, slope
+                    ),
+                )
+                self.assertAlmostEqual(
+                    expected,
+                    dtw.dtw_manhattan(
+                        np.expand_dims(x, 1), np.expand_dims(y, 1), window, slope
+                    ),
+                )
+                # the backtraces should stay inside the window
+                alignment = dtw.dtw_backtrace(x, y, abs_delta, window, slope)
+                self.assertAlmostEqual(expected, alignment.cost(x, y, abs_delta))
+                for tpl in alignment:
+                    self.assertTrue(lo[tpl._left] <= tpl._right <= hi[tpl._left])
+                alignment = dtw.dtw_backtrace_stochastic(x, y, abs_delta, window, slope)
+                self.assertAlmostEqual(expected, alignment.cost(x, y, abs_delta))
+                P, K, k = dtw.dtw_backtrace_matrix(x, y, abs_delta, window, slope)
+                self.assertAlmostEqual(0.0, np.sum(P[D[:m, :n] == np.inf]))
+        self.assertAlmostEqual(1.0, dtw.dtw_string("aabbccdd", "aaabcccde", window=1))
+        with self.assertRaises(ValueError):
+            dtw.dtw_numeric(x, y, window=-1)
+        with self.assertRaises(ValueError):
+            dtw.dtw_numeric(np.zeros(10), np.zeros(2), slope=2.0)
+
+    def test_fastdtw(self):
+        rng = np.random.RandomState(1)
+
+        def abs_delta(a, b):
+            return abs(a - b)
+
+        for _ in range(20):
+            m, n = rng.randint(1, 50, size=2)
+            x = np.cumsum(rng.randn(m))
+            y = np.cumsum(rng.randn(n))
+            expected = dtw.dtw_numeric(x, y)
+            for radius in [0, 1, 3]:
+                # FastDTW yields an upper bound, which is the cost of the
+                # returned warping path
+                actual, alignment = dtw.dtw_numeric(
+                    x, y, radius=radius, return_alignment=True
+                )
+                self.assertTrue(actual >= expected - 1e-8)
+                self.assertAlmostEqual(actual, alignment.cost(x, y, abs_delta))
+            # with a large radius, FastDTW is exact
+            self.assertAlmostEqual(expected, dtw.dtw_numeric(x, y, radius=50))
+            X = np.stack([x, x**2], axis=1)
+            Y = np.stack([y, y**2], axis=1)
+            self.assertAlmostEqual(
+                dtw.dtw_euclidean(X, Y), dtw.dtw_euclidean(X, Y, radius=50)
+            )
+            self.assertTrue(
+                dtw.dtw_manhattan(X, Y, radius=1) >= dtw.dtw_manhattan(X, Y) - 1e-8
+            )
+        with self.assertRaises(ValueError):
+            dtw.dtw_numeric(x, y, window=2, radius=1)
+
+    def test_lower_bounds(self):
+        rng = np.random.RandomState(2)
+        for _ in range(50):
+            m, n = rng.randint(1, 30, size=2)
+            x = np.cumsum(rng.randn(m))
+            y = np.cumsum(rng.randn(n))
+            for window in [None, 0, 2, 10]:
+                if window is None:
+                    expected = dtw.dtw_numeric(x, y)
+                else:
+                    expected = dtw.dtw_numeric(x, y, window=window)
+                kim = dtw.lb_kim(x, y)
+                keogh = dtw.lb_keogh(x, y, window)
+                improved = dtw.lb_improved(x, y, window)
+                self.assertTrue(kim <= expected + 1e-8)
+                self.assertTrue(keogh <= improved + 1e-8)
+                self.assertTrue(improved <= expected + 1e-8)
+                # check that precomputed envelopes yield the same bounds
+                env = dtw.envelope(y, window, m)
+                self.assertAlmostEqual(keogh, dtw.lb_keogh(x, y, window, env))
+                self.assertAlmostEqual(improved, dtw.lb_improved(x, y, window, env))
+        # check the envelope against a brute force computation
+        y = rng.randn(20)
+        U, L = dtw.envelope(y, 3)
+        for i in range(20):
+            np.testing.assert_almost_equal(np.max(y[max(0, i - 3) : i + 4]), U[i])
+            np.testing.assert_almost_equal(np.min(y[max(0, i - 3) : i + 4]), L[i])
+
+    def test_dtw_knn(self):
+        rng = np.random.RandomState(3)
+        corpus = [np.cumsum(rng.randn(rng.choice([20, 25]))) for _ in range(40)]
+        queries = [np.cumsum(rng.randn(20)) for _ in range(5)]
+        for window in [None, 3]:
+            distances, indices = dtw.dtw_knn(queries, corpus, window, k=3)
+            self.assertEqual((5, 3), distances.shape)
+            for q in range(len(queries)):
+                if window is None:
+                    expected = [dtw.dtw_numeric(queries[q], y) for y in corpus]
+                else:
+                    expected = [
+                        dtw.dtw_numeric(queries[q], y, window=window) for y in corpus
+                    ]
+                np.testing.assert_almost_equal(np.sort(expected)[:3], distances[q])
+                np.testing.assert_almost_equal(
+                    np.array(expected)[indices[q]], distances[q]
+                )
+        # copies of the nearest neighbor tie with it and should all be found
+        d, c = dtw.dtw_knn(queries[:1], corpus, k=1)
+        copies = corpus + [np.copy(corpus[c[0, 0]]) for _ in range(3)]
+        distances, indices = dtw.dtw_knn(queries[:1], copies, k=4)
+        np.testing.assert_almost_equal(np.full(4, d[0, 0]), distances[0])
+        self.assertEqual({c[0, 0], 40, 41, 42}, set(indices[0]))
+        with self.assertRaises(ValueError):
+            dtw.dtw_knn(queries, corpus, k=41)
+
+    def test_dtw_fused(self):
+        # the numeric variants compute element-wise distances on the fly,
+        # which should yield exactly the same result as the generic
+        # implementation
+        rng = np.random.RandomState(4)
+        for _ in range(20):
+            m, n = rng.randint(1, 30, size=2)
+            x = rng.randn(m, 3)
+            y = rng.randn(n, 3)
+            for window in [None, 2]:
+                expected = dtw.dtw(
+                    x[:, 0], y[:, 0], lambda a, b: abs(a - b), window=window
+                )
+                actual = dtw.dtw_numeric(x[:, 0], y[:, 0], window=window)
+                self.assertEqual(expected, actual)
+                expected = dtw.dtw(
+                    x, y, lambda a, b: np.sum(np.abs(a - b)), window=window
+                )
+                actual = dtw.dtw_manhattan(x, y, window=window)
+                self.assertAlmostEqual(expected, actual)
+                expected = dtw.dtw(
+                    x, y, lambda a, b: np.sqrt(np.sum((a - b) ** 2)), window=window
+                )
+                actual = dtw.dtw_euclidean(x, y, window=window)
+                self.assertAlmostEqual(expected, actual)
+
+    def test_dtw_cutoff(self):
+        # the result should be the exact distance if it is at most the
+        # cutoff and infinity otherwise
+        rng = np.random.RandomState(6)
+        for _ in range(30):
+            m, n = rng.randint(1, 20, size=2)
+            x = rng.randn(m, 2)
+            y = rng.randn(n, 2)
+            for window in [None, 2]:
+                for fun, a, b in [
+                    (dtw.dtw_numeric, x[:, 0], y[:, 0]),
+                    (dtw.dtw_manhattan, x, y),
+                    (dtw.dtw_euclidean, x, y),
+                ]:
+                    d = fun(a, b, window=window)
+                    self.assertEqual(d, fun(a, b, window=window, cutoff=d))
+                    self.assertEqual(
+                        np.inf, fun(a, b, window=window, cutoff=0.99 * d)
+                    )
+                delta = lambda a, b: np.sum(np.abs(a - b))
+                d = dtw.dtw(x, y, delta, window=window)
+                self.assertEqual(d, dtw.dtw(x, y, delta, window=window, cutoff=d))
+                self.assertEqual(
+                    np.inf, dtw.dtw(x, y, delta, window=window, cutoff=0.99 * d)
+                )
+                s = "".join(rng.choice(list("ab"), size=m))
+                t = "".join(rng.choice(list("ab"), size=n))
+                d = dtw.dtw_string(s, t, window=window)
+                self.assertEqual(d, dtw.dtw_string(s, t, window=window, cutoff=d))
+                self.assertEqual(
+                    np.inf, dtw.dtw_string(s, t, window=window, cutoff=d - 0.5)
+                )
+        with self.assertRaises(ValueError):
+            dtw.dtw_numeric(x[:, 0], y[:, 0], radius=1, cutoff=1.0)
+
+    def test_dtw_dtype(self):
+        # single precision should yield the same distances up to rounding
+        rng = np.random.RandomState(2)
+        delta = lambda a, b: np.sum(np.abs(a - b))
+        for _ in range(10):
+            m, n = rng.randint(1, 20, size=2)
+            x = rng.randn(m, 2)
+            y = rng.randn(n, 2)
+            for window in [None, 2]:
+                d = dtw.dtw(x, y, delta, window=window)
+                self.assertAlmostEqual(
+                    d, dtw.dtw(x, y, delta, window=window, dtype=np.float32), 4
+                )
+                s = "".join(rng.choice(list("ab"), size=m))
+                t = "".join(rng.choice(list("ab"), size=n))
+                self.assertEqual(
+                    dtw.dtw_string(s, t, window=window),
+                    dtw.dtw_string(s, t, window=window, dtype=np.float32),
+                )
+        # single precision with a cutoff at the exact distance should still
+        # return the distance, even if it rounds above the cutoff
+        delta = lambda a, b: abs(a - b)
+        for _ in range(10):
+            x = rng.rand(rng.randint(20, 60))
+            y = rng.rand(rng.randint(20, 60))
+            for window in [None, 100]:
+                d = dtw.dtw(x, y, delta, window=window)
+                self.assertAlmostEqual(
+                    d, dtw.dtw(x, y, delta, window=window, cutoff=d, dtype=np.float32), 4
+                )
+        with self.assertRaises(ValueError):
+            dtw.dtw_string("ab", "b", dtype=np.int32)
+
+    def test_dtw_subsequence(self):
+        x = np.array([1.0, 2.0, 3.0])
+        y = np.array([0.0, 5.0, 1.0, 2.0, 2.0, 3.0, 7.0])
+        self.assertEqual((0.0, 2, 6), dtw.dtw_subsequence(x, y))
+        # compare to a brute-force search over all windows
+        rng = np.random.RandomState(7)
+        for _ in range(20):
+            x = rng.randn(rng.randint(1, 5), 2)
+            y = rng.randn(rng.randint(1, 15), 2)
+            n = len(y)
+            expected = min(
+                dtw.dtw_manhattan(x, y[a:b]) for a in range(n) for b in range(a + 1, n + 1)
+            )
+            d, start, end = dtw.dtw_subsequence(x, y)
+            self.assertAlmostEqual(expected, d)
+            self.assertAlmostEqual(d, dtw.dtw_manhattan(x, y[start:end]))
+            delta = lambda a, b: np.sum(np.abs(a - b))
+            self.assertAlmostEqual(d, dtw.dtw_subsequence(x, y, delta)[0])
+            # the streaming variant should find the same match in one of
+            # the chunks
+            chunks = np.split(y, sorted(rng.randint(0, n + 1, size=2)))
+            matches = list(dtw.dtw_subsequence_stream(x, chunks))
+            self.assertEqual(len(chunks), len(matches))
+            self.assertAlmostEqual(d, min(match[0] for match in matches))
+            for d, start, end in matches:
+                if start >= 0:
+                    self.assertAlmostEqual(d, dtw.dtw_manhattan(x, y[start:end]))
+        with self.assertRaises(ValueError):
+            dtw.dtw_subsequence(x, [])
+
+    def test_dtw_euclidean_many(self):
+        rng = np.random.RandomState(5)
+        query = rng.randn(15, 3)
+        corpus = [rng.randn(n, 3) for n in rng.randint(1, 30, size=25)]
+        expected = [dtw.dtw_euclidean(query, y) for y in corpus]
+        actual = dtw.dtw_euclidean_many(query, corpus)
+        np.testing.assert_allclose(expected, actual, atol=1e-6)
+        # check the pairwise variant, including self-comparisons
+        D = dtw.dtw_euclidean_pairwise(corpus[:8])
+        self.assertEqual((8, 8), D.shape)
+        for k in range(8):
+            for l in range(8):
+                expected = dtw.dtw_euclidean(corpus[k], corpus[l])
+                self.assertAlmostEqual(expected, D[k, l], places=6)
+        np.testing.assert_array_equal(np.zeros(8), np.diag(D))
+        # self-comparisons stay exactly zero even for large values
+        D = dtw.dtw_euclidean_pairwise([1e4 + query, 1e4 + corpus[0]])
+        self.assertEqual(0., D[0, 0])
+        self.assertEqual(0., D[1, 1])
+        D = dtw.dtw_euclidean_pairwise([query], corpus)
+        np.testing.assert_allclose(actual, D[0])
+        # check one-dimensional and empty inputs
+        np.testing.assert_allclose(
+            [3.0, 1.0], dtw.dtw_euclidean_many([1.0, 2.0], [[3.0], [2.0, 2.0]])
+        )
+        self.assertEqual((0,), dtw.dtw_euclidean_many(query, []).shape)
+        with self.assertRaises(ValueError):
+            dtw.dtw_euclidean_many(query, [rng.randn(5, 2)])
+        with self.assertRaises(ValueError):
+            dtw.dtw_euclidean_many(query, [np.zeros((0, 3))])
+
 if __name__ == "__main__":
     unittest.main()
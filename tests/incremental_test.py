@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+"""
+Tests the incremental dynamic time warping and sequence edit distance
+implementation.
+
+"""
+# Copyright (C) 2019-2021
+# Benjamin Paaßen
+# AG Machine Learning
+# Bielefeld University
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import numpy as np
+import edist.dtw as dtw
+import edist.sed as sed
+from edist.incremental import IncrementalAligner
+
+__author__ = "Benjamin Paaßen"
+__copyright__ = "Copyright (C) 2019-2021, Benjamin Paaßen"
+__license__ = "GPLv3"
+__maintainer__ = "Benjamin Paaßen"
+__email__ = "bpaassen@techfak.uni-bielefeld.de"
+
+
+class TestIncremental(unittest.TestCase):
+
+    def test_dtw(self):
+        rng = np.random.RandomState(0)
+        x = rng.randn(5, 2)
+        y = rng.randn(12, 2)
+        aligner = IncrementalAligner(x)
+        self.assertEqual(np.inf, aligner.distance)
+        for j in range(len(y)):
+            aligner.append(y[j])
+            actual = aligner.distance
+            expected = dtw.dtw_manhattan(x, y[: j + 1])
+            self.assertAlmostEqual(expected, actual)
+        self.assertEqual(len(y), len(aligner))
+        # check a custom distance
+        delta = lambda a, b: np.sqrt(np.sum((a - b) ** 2))
+        aligner = IncrementalAligner(x, delta=delta)
+        actual = aligner.extend(y)
+        self.assertAlmostEqual(dtw.dtw_euclidean(x, y), actual)
+
+    def test_sed(self):
+        x = "kitten"
+        y = "sitting"
+        aligner = IncrementalAligner(x, "sed")
+        self.assertEqual(6.0, aligner.distance)
+        for j in range(len(y)):
+            aligner.append(y[j])
+            self.assertEqual(sed.sed_string(x, y[: j + 1]), aligner.distance)
+        # check a custom distance
+        delta = lambda a, b: 0.0 if a == b else (0.7 if a is None or b is None else 1.3)
+        aligner = IncrementalAligner(x, "sed", delta)
+        self.assertAlmostEqual(sed.sed(x, y, delta), aligner.extend(y))
+
+    def test_window(self):
+        rng = np.random.RandomState(1)
+        x = rng.randn(4)
+        y = rng.randn(20)
+        xs = "abcab"
+        ys = "".join(rng.choice(list("abc"), size=20))
+        for window in [1, 3, 8]:
+            dtw_aligner = IncrementalAligner(x, window=window)
+            sed_aligner = IncrementalAligner(xs, "sed", window=window)
+            for j in range(len(y)):
+                start = max(0, j + 1 - window)
+                dtw_aligner.append(y[j])
+                sed_aligner.append(ys[j])
+                self.assertAlmostEqual(
+                    dtw.dtw_numeric(x, y[start : j + 1]), dtw_aligner.distance
+                )
+                self.assertEqual(
+                    sed.sed_string(xs, ys[start : j + 1]), sed_aligner.distance
+                )
+                self.assertEqual(j + 1 - start, len(dtw_aligner))
+            # extending by many elements should recompute only once at the end
+            dtw_aligner.extend(y[:7])
+            self.assertAlmostEqual(
+                dtw.dtw_numeric(x, np.concatenate((y, y[:11]))[-window:]),
+                dtw_aligner.extend(y[7:11]),
+            )
+            self.assertEqual(
+                sed.sed_string(xs, (ys + ys[:11])[-window:]), sed_aligner.extend(ys[:11])
+            )
+        # check invalid inputs
+        with self.assertRaises(ValueError):
+            IncrementalAligner(x, window=0)
+        with self.assertRaises(ValueError):
+            IncrementalAligner(x, "ted")
+        with self.assertRaises(ValueError):
+            IncrementalAligner([])
+        with self.assertRaises(ValueError):
+            IncrementalAligner(x).append([1.0, 2.0])
+        with self.assertRaises(ValueError):
+            IncrementalAligner(rng.randn(4, 2)).append(1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
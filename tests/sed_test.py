@@ -181,6 +181,40 @@ class TestSED(unittest.TestCase):
         np.testing.assert_almost_equal(K, expected_K, 2)
         self.assertEqual(expected_k, k)
 
+    def test_sed_indexed(self):
+        # set up a random symbol embedding, where the last row is the
+        # origin for deletions and insertions
+        rng = np.random.RandomState(0)
+        E = np.concatenate([rng.randn(4, 2), np.zeros((1, 2))], axis=0)
+        Delta = np.sqrt(np.sum(np.square(E[:, None, :] - E[None, :, :]), axis=2))
+
+        def delta(x, y):
+            if x is None:
+                x = -1
+            if y is None:
+                y = -1
+            return Delta[x, y]
+
+        Xs = [[0, 1, 2], [], [3, 3, 0, 1], [2]]
+        Ys = [[1, 2], [0, 0, 3, 2, 1], []]
+        D = sed.sed_indexed_pairwise(Xs, Ys, Delta)
+        self.assertEqual((len(Xs), len(Ys)), D.shape)
+        for k in range(len(Xs)):
+            for l in range(len(Ys)):
+                expected = sed.sed(Xs[k], Ys[l], delta)
+                self.assertAlmostEqual(expected, D[k, l])
+                self.assertAlmostEqual(expected, sed.sed_indexed(Xs[k], Ys[l], Delta))
+        # the symmetric version should compute the same matrix
+        np.testing.assert_allclose(
+            sed.sed_indexed_pairwise(Xs, Xs, Delta),
+            sed.sed_indexed_pairwise_symmetric(Xs, Delta),
+        )
+        # check invalid inputs
+        with self.assertRaises(ValueError):
+            sed.sed_indexed([0, 4], [1], Delta)
+        with self.assertRaises(ValueError):
+            sed.sed_indexed([0], [1], Delta[:, :4])
+
     def test_standard_sed(self):
         x = "aabbccdd"
         y = "aaabcccde"
@@ -191,6 +225,102 @@ class TestSED(unittest.TestCase):
         actual = sed.standard_sed(x, y)
         self.assertEqual(float(expected), actual)
 
+    def test_encode_labels(self):
+        # equal elements should receive equal labels
+        x_labels, y_labels = sed.encode_labels("abca", "cb")
+        np.testing.assert_array_equal([97, 98, 99, 97], x_labels)
+        np.testing.assert_array_equal([99, 98], y_labels)
+        x_labels, y_labels = sed.encode_labels([3, "a", 3], ["a", 4])
+        np.testing.assert_array_equal([0, 1, 0], x_labels)
+        np.testing.assert_array_equal([1, 2], y_labels)
+        # unhashable elements should be supported as well
+        x = [[1, 2], [3], [1, 2]]
+        y = [[3], (1, 2)]
+        x_labels, y_labels = sed.encode_labels(x, y)
+        np.testing.assert_array_equal([0, 1, 0], x_labels)
+        np.testing.assert_array_equal([1, 2], y_labels)
+        # the label-based distance should agree with the Delta-based one
+        _, D = sed._standard_sed(x, y)
+        self.assertEqual(D[0, 0], sed.standard_sed(x, y))
+
+    def test_sed_cutoff(self):
+        # the result should be the exact distance if it is at most the
+        # cutoff and infinity otherwise
+        rng = np.random.RandomState(0)
+        delta = lambda a, b: 0.0 if a == b else (0.7 if a is None or b is None else 1.3)
+        for _ in range(30):
+            m, n = rng.randint(0, 12, size=2)
+            x = "".join(rng.choice(list("abc"), size=m))
+            y = "".join(rng.choice(list("abc"), size=n))
+            d = sed.sed_string(x, y)
+            for cutoff in [d, d - 1]:
+                expected = d if d <= cutoff else np.inf
+                self.assertEqual(expected, sed.sed_string(x, y, cutoff=cutoff))
+                self.assertEqual(
+                    expected, sed.standard_sed(list(x), list(y), cutoff=cutoff)
+                )
+                self.assertEqual(expected, sed.sed(x, y, cutoff=cutoff))
+            d = sed.sed(x, y, delta)
+            self.assertEqual(d, sed.sed(x, y, delta, cutoff=d))
+            self.assertEqual(np.inf, sed.sed(x, y, delta, cutoff=d - 0.01))
+
+    def test_sed_dtype(self):
+        # all supported precisions should yield the same distances
+        rng = np.random.RandomState(1)
+        delta = lambda a, b: 0.0 if a == b else (0.5 if a is None or b is None else 1.0)
+        for _ in range(10):
+            m, n = rng.randint(0, 12, size=2)
+            x = "".join(rng.choice(list("abc"), size=m))
+            y = "".join(rng.choice(list("abc"), size=n))
+            d = sed.sed_string(x, y)
+            for dtype in [np.int16, np.int32]:
+                self.assertEqual(d, sed.sed_string(x, y, dtype=dtype))
+                self.assertEqual(d, sed.standard_sed(x, y, dtype=dtype))
+                self.assertEqual(d, sed.sed(x, y, dtype=dtype))
+            d = sed.sed(x, y, delta)
+            self.assertEqual(d, sed.sed(x, y, delta, dtype=np.float32))
+        # single precision with a cutoff at the exact distance should still
+        # return the distance, even if it rounds above the cutoff
+        num_delta = lambda a, b: abs(a - b) if a is not None and b is not None else 0.7
+        for _ in range(10):
+            x = rng.rand(rng.randint(20, 60))
+            y = rng.rand(rng.randint(20, 60))
+            d = sed.sed(x, y, num_delta)
+            self.assertAlmostEqual(d, sed.sed(x, y, num_delta, cutoff=d, dtype=np.float32), 4)
+        # unsupported types or too long inputs should raise an error
+        with self.assertRaises(ValueError):
+            sed.sed("ab", "b", delta, dtype=np.int32)
+        with self.assertRaises(ValueError):
+            sed.standard_sed("ab", "b", dtype=np.float32)
+        with self.assertRaises(ValueError):
+            sed.sed_string("a" * 20000, "b" * 20000, dtype=np.int16)
+
+    def test_sed_subsequence(self):
+        x = "bcd"
+        y = "aabxdeebcdaa"
+        self.assertEqual((0.0, 7, 10), sed.sed_subsequence(x, y))
+        # compare to a brute-force search over all windows
+        rng = np.random.RandomState(1)
+        delta = lambda a, b: 0.0 if a == b else (0.7 if a is None or b is None else 1.3)
+        for _ in range(20):
+            x = "".join(rng.choice(list("abc"), size=rng.randint(1, 5)))
+            y = "".join(rng.choice(list("abc"), size=rng.randint(0, 12)))
+            n = len(y)
+            expected = min(
+                sed.sed(x, y[a:b], delta) for a in range(n + 1) for b in range(a, n + 1)
+            )
+            d, start, end = sed.sed_subsequence(x, y, delta)
+            self.assertAlmostEqual(expected, d)
+            self.assertAlmostEqual(d, sed.sed(x, y[start:end], delta))
+        # check the streaming variant
+        chunks = ["aab", "", "xdeeb", "cdaa"]
+        matches = list(sed.sed_subsequence_stream("bcd", chunks))
+        self.assertEqual(4, len(matches))
+        self.assertEqual((np.inf, -1, -1), matches[1])
+        self.assertEqual((0.0, 7, 10), matches[3])
+        for d, start, end in [matches[0], matches[2]]:
+            self.assertEqual(d, sed.sed_string("bcd", "aabxdeebcdaa"[start:end]))
+
     def test_standard_sed_backtrace(self):
         x = "abcde"
         y = "bdef"
@@ -23,6 +23,7 @@ Tests the set edit distance implementation.
 
 import unittest
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from edist.alignment import Alignment
 import edist.seted as seted
 
@@ -139,6 +140,73 @@ class TestSetED(unittest.TestCase):
         actual_ali = seted.seted_backtrace(x, y, custom_delta)
         self.assertEqual(expected_ali, actual_ali)
 
+    def test_seted_matrix(self):
+        # compare the rectangular assignment to the classic reduction to an
+        # (m + n) x (m + n) assignment problem
+        rng = np.random.RandomState(1)
+        for _ in range(30):
+            m = rng.randint(0, 10)
+            n = rng.randint(0, 10)
+            Delta = rng.rand(m + 1, n + 1) * 2.0
+            C = np.full((m + n, m + n), np.inf)
+            C[:m, :n] = Delta[:m, :n]
+            for i in range(m):
+                C[i, n + i] = Delta[i, n]
+            for j in range(n):
+                C[m + j, j] = Delta[m, j]
+            C[m:, n:] = 0.0
+            I, J = linear_sum_assignment(C)
+            expected = np.sum(C[I, J])
+            actual, J = seted._seted_matrix(Delta)
+            self.assertAlmostEqual(expected, actual)
+            # check that J is consistent with the distance
+            alignment = seted._to_alignment(J, m, n)
+            cost = 0.0
+            for tpl in alignment:
+                cost += Delta[tpl._left, tpl._right]
+            self.assertAlmostEqual(expected, cost)
+
+    def test_seted_infinite_gaps(self):
+        # forbidding deletions makes the reduced costs undefined, such that
+        # we need to fall back to the padded assignment problem
+        delta = lambda a, b: np.inf if b is None else (0.0 if a == b else 1.0)
+        self.assertEqual(1.0, seted.seted([1], [1, 2], delta))
+        expected = Alignment()
+        expected.append_tuple(0, 0)
+        expected.append_tuple(-1, 1)
+        self.assertEqual(expected, seted.seted_backtrace([1], [1, 2], delta))
+        self.assertEqual((1.0, 1.0), seted.seted([1], [1, 2], delta, approx="greedy"))
+
+    def test_seted_approx(self):
+        rng = np.random.RandomState(0)
+
+        def delta(x, y):
+            if x is None or y is None:
+                return 1.0
+            return abs(x - y)
+
+        for _ in range(30):
+            x = (rng.rand(rng.randint(0, 20)) * 3).tolist()
+            y = (rng.rand(rng.randint(0, 20)) * 3).tolist()
+            expected = seted.seted(x, y, delta)
+            x_sym = rng.choice(["a", "b", "c"], size=len(x)).tolist()
+            y_sym = rng.choice(["a", "b", "d"], size=len(y)).tolist()
+            expected_sym = seted.seted(x_sym, y_sym)
+            for approx in ["greedy", "sorted", "sinkhorn"]:
+                upper, lower = seted.seted(x, y, delta, approx=approx)
+                self.assertLessEqual(lower, expected + 1e-8)
+                self.assertGreaterEqual(upper, expected - 1e-8)
+                upper, lower = seted.seted(x_sym, y_sym, approx=approx)
+                self.assertLessEqual(lower, expected_sym + 1e-8)
+                self.assertGreaterEqual(upper, expected_sym - 1e-8)
+        # for equal sets, all heuristics should be exact
+        x = ["a", "b", "c", "d"]
+        for approx in ["greedy", "sorted", "sinkhorn"]:
+            upper, lower = seted.seted(x, x[::-1], approx=approx)
+            self.assertAlmostEqual(0.0, upper)
+        with self.assertRaises(ValueError):
+            seted.seted(x, x, approx="random")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -99,6 +99,27 @@ class TestTED(unittest.TestCase):
 
         np.testing.assert_array_equal(D_expected, D_actual)
 
+    def test_ted_dtype(self):
+        # the tree a(b(c, d), e)
+        x = ["a", "b", "c", "d", "e"]
+        x_adj = [[1, 4], [2, 3], [], [], []]
+        # the tree a(c, f(e))
+        y = ["a", "c", "f", "e"]
+        y_adj = [[1, 2], [], [3], []]
+        # all supported precisions should yield the same distances
+        delta = lambda a, b: 0.0 if a == b else (0.5 if a is None or b is None else 1.0)
+        d = ted.ted(x, x_adj, y, y_adj, delta)
+        self.assertEqual(d, ted.ted(x, x_adj, y, y_adj, delta, dtype=np.float32))
+        d = ted.standard_ted(x, x_adj, y, y_adj)
+        for dtype in [np.int16, np.int32]:
+            self.assertEqual(d, ted.standard_ted(x, x_adj, y, y_adj, dtype=dtype))
+            self.assertEqual(float(d), ted.ted(x, x_adj, y, y_adj, dtype=dtype))
+        # unsupported types should raise an error
+        with self.assertRaises(ValueError):
+            ted.ted(x, x_adj, y, y_adj, delta, dtype=np.int32)
+        with self.assertRaises(ValueError):
+            ted.standard_ted(x, x_adj, y, y_adj, dtype=np.int8)
+
     def test_ted_backtrace(self):
         # consider two example trees
         # the tree a(b(c, d), e)
@@ -275,6 +296,18 @@ class TestTED(unittest.TestCase):
 
         np.testing.assert_array_equal(D_expected, D_actual)
 
+    def test_standard_ted_labels(self):
+        # the tree [1](2, [3]) with unhashable nodes
+        x = [[1], 2, [3]]
+        x_adj = [[1, 2], [], []]
+        # the tree [3]([1])
+        y = [[3], [1]]
+        y_adj = [[1], []]
+        # the label-based distance should agree with the Delta-based one
+        D_tree = ted._standard_ted(x, x_adj, y, y_adj)[-1]
+        self.assertEqual(D_tree[0, 0], ted.standard_ted(x, x_adj, y, y_adj))
+        self.assertEqual(3, ted.standard_ted(x, x_adj, y, y_adj))
+
     def test_standard_ted_backtrace(self):
         # consider two example trees
         # the tree a(b(c, d), e)
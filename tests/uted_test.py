@@ -22,7 +22,9 @@ Tests the unordered tree edit distance implementation.
 
 import unittest
 import edist.uted as uted
+import edist.seted as seted
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from edist.alignment import Alignment
 from edist import tree_utils
 
@@ -33,6 +35,22 @@ __maintainer__ = "Benjamin Paaßen"
 __email__ = "benjamin.paassen@hu-berlin.de"
 
 
+def random_tree(rng, size, max_degree=None):
+    """ Generates a random tree with the given number of nodes, labels from
+    'a', 'b', and 'c', and at most max_degree children per node, where every
+    new node becomes a child of some node on the path to the previous one.
+    """
+    nodes = rng.choice(["a", "b", "c"], size=size).tolist()
+    adj = [[] for _ in range(size)]
+    path = [0]
+    for i in range(1, size):
+        candidates = [p for p in path if max_degree is None or len(adj[p]) < max_degree]
+        p = candidates[rng.randint(len(candidates))]
+        path = path[: path.index(p) + 1] + [i]
+        adj[p].append(i)
+    return nodes, adj
+
+
 class TestUTED(unittest.TestCase):
 
     def test_uted(self):
@@ -271,6 +289,108 @@ class TestUTED(unittest.TestCase):
         pi = uted.munkres(C)
         np.testing.assert_array_equal([2, 1, 0, 4, 3], pi)
 
+    def test_lapjv(self):
+        # compare against scipy on random matrices, including ties and
+        # infinite entries as in the forest assignments of uted
+        rng = np.random.RandomState(0)
+        for K in [1, 2, 3, 5, 10]:
+            for _ in range(10):
+                C = np.round(rng.rand(K, K) * 3)
+                pi = uted.lapjv(C)
+                np.testing.assert_array_equal(np.arange(K), np.sort(pi))
+                rows, cols = linear_sum_assignment(C)
+                self.assertAlmostEqual(np.sum(C[rows, cols]), np.sum(C[np.arange(K), pi]))
+        C = np.array(
+            [
+                [1.0, 2.0, 1.0, np.inf, np.inf],
+                [0.0, 2.0, np.inf, 2.0, np.inf],
+                [0.0, 2.0, np.inf, np.inf, 2.0],
+                [2.0, np.inf, 0.0, 0.0, 0.0],
+                [np.inf, 3.0, 0.0, 0.0, 0.0],
+            ]
+        )
+        pi = uted.lapjv(C)
+        self.assertEqual(3.0, np.sum(C[np.arange(5), pi]))
+
+    def test_uted_solver(self):
+        # generate random trees with up to four children per node
+        rng = np.random.RandomState(1)
+        kron = lambda x, y: 0.0 if x == y else 1.0
+        delta = lambda x, y: 0.0 if x == y else (1.0 if x is None or y is None else 0.7)
+        for _ in range(30):
+            x_nodes, x_adj = random_tree(rng, rng.randint(1, 20), max_degree=4)
+            y_nodes, y_adj = random_tree(rng, rng.randint(1, 20), max_degree=4)
+            for d in [None, delta]:
+                expected = uted.uted(x_nodes, x_adj, y_nodes, y_adj, d)
+                actual = uted.uted(x_nodes, x_adj, y_nodes, y_adj, d, solver="jv")
+                self.assertAlmostEqual(expected, actual)
+                alignment = uted.uted_backtrace(x_nodes, x_adj, y_nodes, y_adj, d, solver="jv")
+                cost = alignment.cost(x_nodes, y_nodes, kron if d is None else d)
+                self.assertAlmostEqual(expected, cost)
+        with self.assertRaises(ValueError):
+            uted.uted(x_nodes, x_adj, y_nodes, y_adj, solver="auction")
+
+    def test_uted_high_degree(self):
+        # flat trees whose roots have more children than fit into the dense
+        # assignment problem
+        rng = np.random.RandomState(2)
+        kron = lambda x, y: 0.0 if x == y else 1.0
+        for m, n in [(100, 80), (70, 3), (2, 90)]:
+            x_nodes = ["a"] + rng.choice(["a", "b", "c"], size=m).tolist()
+            x_adj = [list(range(1, m + 1))] + [[] for _ in range(m)]
+            y_nodes = ["a"] + rng.choice(["a", "b", "d"], size=n).tolist()
+            y_adj = [list(range(1, n + 1))] + [[] for _ in range(n)]
+            # for flat trees, the distance is the set edit distance between
+            # the children
+            expected = seted.standard_seted(x_nodes[1:], y_nodes[1:])
+            for solver in ["munkres", "jv"]:
+                actual = uted.uted(x_nodes, x_adj, y_nodes, y_adj, solver=solver)
+                alignment = uted.uted_backtrace(
+                    x_nodes, x_adj, y_nodes, y_adj, solver=solver
+                )
+                self.assertAlmostEqual(
+                    actual, alignment.cost(x_nodes, y_nodes, kron)
+                )
+                self.assertAlmostEqual(expected, actual)
+
+    def test_approximate_assignment(self):
+        rng = np.random.RandomState(3)
+        for _ in range(30):
+            R = rng.randn(rng.randint(1, 15), rng.randint(1, 15))
+            # compute the optimal assignment, where rows and columns may
+            # remain unassigned at zero cost
+            R_neg = np.minimum(R, 0.0)
+            rows, cols = linear_sum_assignment(R_neg)
+            expected = np.sum(R_neg[rows, cols])
+            for approx in ["greedy", "sorted", "sinkhorn"]:
+                upper, lower, pi = uted.approximate_assignment(R, approx)
+                self.assertLessEqual(lower, expected + 1e-8)
+                self.assertGreaterEqual(upper, expected - 1e-8)
+                # check that pi is a valid assignment with cost upper
+                assigned = pi[pi >= 0]
+                self.assertEqual(len(assigned), len(np.unique(assigned)))
+                self.assertAlmostEqual(
+                    upper, np.sum(R_neg[np.where(pi >= 0)[0], assigned])
+                )
+
+    def test_uted_approx(self):
+        rng = np.random.RandomState(4)
+        for _ in range(30):
+            x_nodes, x_adj = random_tree(rng, rng.randint(1, 30))
+            y_nodes, y_adj = random_tree(rng, rng.randint(1, 30))
+            expected = uted.uted(x_nodes, x_adj, y_nodes, y_adj)
+            for approx in ["greedy", "sorted", "sinkhorn"]:
+                upper, lower = uted.uted(x_nodes, x_adj, y_nodes, y_adj, approx=approx)
+                self.assertLessEqual(lower, expected + 1e-8)
+                self.assertGreaterEqual(upper, expected - 1e-8)
+        self.assertEqual((3, 3), uted.uted([], [], x_nodes[:3], [[1], [2], []], approx="greedy"))
+        # unit costs for an empty tree should return the integer size
+        d = uted.uted([], [], x_nodes[:3], [[1], [2], []])
+        self.assertEqual(3, d)
+        self.assertIsInstance(d, int)
+        with self.assertRaises(ValueError):
+            uted.uted(x_nodes, x_adj, y_nodes, y_adj, approx="random")
+
 
 if __name__ == "__main__":
     unittest.main()